@@ -0,0 +1,54 @@
+"""
+Benchmark: clean_currency_string (pro Zelle) vs. clean_currency_series (vektorisiert).
+
+Aufruf:  python benchmarks/bench_currency.py [ANZAHL_ZEILEN]
+Standard sind 5 Mio. Zeilen einer synthetischen SAP-Betragsspalte.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from db_importer import clean_currency_string, clean_currency_series
+
+
+def make_column(n_rows, seed=42):
+    """Mischung wie in echten CJI3/CJI5-Exporten: überwiegend deutsche Beträge, etwas Rest."""
+    rng = np.random.default_rng(seed)
+    betraege = rng.uniform(-1_000_000, 1_000_000, n_rows).round(2)
+
+    german = pd.Series(betraege).map('{:,.2f}'.format)
+    german = german.str.replace(',', 'X').str.replace('.', ',').str.replace('X', '.')
+    english = pd.Series(betraege).astype(str)
+
+    kind = rng.choice(4, size=n_rows, p=[0.85, 0.10, 0.03, 0.02])
+    col = german.astype(object).where(kind == 0, english.astype(object))
+    col[kind == 2] = None
+    col[kind == 3] = 'n.v.'
+    return col.astype(str).where(kind != 2, None)
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    print(f"Erzeuge {n_rows:,} Zeilen ...")
+    col = make_column(n_rows)
+
+    start = time.perf_counter()
+    expected = col.apply(clean_currency_string)
+    t_scalar = time.perf_counter() - start
+    print(f"apply(clean_currency_string): {t_scalar:8.2f} s")
+
+    start = time.perf_counter()
+    result = clean_currency_series(col)
+    t_vector = time.perf_counter() - start
+    print(f"clean_currency_series:        {t_vector:8.2f} s")
+
+    assert np.array_equal(expected.to_numpy(), result.to_numpy(), equal_nan=True), "Ergebnisse weichen ab!"
+    print(f"Identische Ergebnisse, Faktor {t_scalar / t_vector:.1f}x schneller.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: viele Cockpit-Sitzungen gleichzeitig, je Sitzung eigene Abfragen (bisher) vs. gemeinsamer
+Datenspeicher (data_service.py). Jede Sitzung ist ein Thread, öffnet die Projektliste und dieselben
+Projekte und behält die Frames (wie eine offene Browser-Sitzung).
+
+Aufruf:  python benchmarks/bench_data_service.py [SITZUNGEN] [PROJEKTE_JE_SITZUNG] [ZEILEN]
+Standard: 30 Sitzungen, je 20 Projekte, 500.000 Ist-Zeilen über 200 Projekte.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import queries
+from data_service import DataService
+from db_importer import run_import
+from sap_generator import generate_exports
+
+
+def run_sessions(n_sessions, load_projects, load_project):
+    """Alle Sitzungen gleichzeitig; Rückgabe: Sekunden, gehaltene Frames je Sitzung."""
+    held = [None] * n_sessions
+
+    def session(i):
+        projects = load_projects()['hauptprojekt'].tolist()
+        held[i] = [load_project(p) for p in projects]
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(n_sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, held
+
+
+def held_mb(held):
+    """Speicher der gehaltenen Frames: eine Sitzung, mal Zahl der Sitzungen, wenn jede eigene Daten hat."""
+    one = sum(df.memory_usage(deep=True).sum() for data in held[0] for df in data.values()) / 1e6
+    shared = np.shares_memory(held[0][0]['psp']['wert'].to_numpy(), held[1][0]['psp']['wert'].to_numpy())
+    return one if shared else one * len(held)
+
+
+def main():
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    per_session = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    n_rows = int(sys.argv[3]) if len(sys.argv) > 3 else 500_000
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        db_path = os.path.join(work_dir, 'bench.db')
+        generate_exports(data_dir, ist_rows=n_rows, n_projects=200)
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_import(data_dir, db_path)
+        print(f"{n_sessions} Sitzungen x {per_session} Projekte, {n_rows:,} Ist-Zeilen")
+
+        # Bisher: jede Sitzung fragt selbst und hält eine eigene Kopie (wie st.cache_data)
+        service = DataService(db_path)
+        engine = service.engine
+        first = lambda: queries.load_projects(engine).head(per_session)
+        seconds, held = run_sessions(n_sessions, first, lambda p: queries.load_project_data(engine, p))
+        print(f"  je Sitzung:   {seconds:6.2f} s  {n_sessions * (per_session + 1):>5} Abfragen  {held_mb(held):6.2f} MB")
+
+        generation = service.generation()
+        projects = lambda: service.get(generation, 'projekte', None, first)
+        project = lambda p: service.get(generation, 'projektdaten', p, lambda: queries.load_project_data(engine, p))
+        seconds, held = run_sessions(n_sessions, projects, project)
+        print(f"  gemeinsam:    {seconds:6.2f} s  {service.stats['berechnet']:>5} Abfragen  {held_mb(held):6.2f} MB")
+        # Gleiche Daten wie ohne gemeinsamen Speicher
+        pd.testing.assert_frame_equal(held[0][0]['psp'],
+                                      queries.load_project_data(engine, first()['hauptprojekt'].iloc[0])['psp'])
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
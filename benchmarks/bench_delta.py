@@ -0,0 +1,65 @@
+"""
+Benchmark: Delta-Import von Monatslieferungen. Je Monat kommt eine neue CJI3-Datei dazu, die alten
+bleiben im Ordner; gemessen wird jeder Import-Lauf, getrennt nach Rohtabelle (nur die neue Periode)
+und dem Rest (Summen der berührten Projekte, ANALYZE).
+
+Aufruf:  python benchmarks/bench_delta.py [ZEILEN_JE_MONAT] [MONATE] [LAUFZEIT]
+Standard sind 24 Monate mit je 100.000 Zeilen; jedes der 200 Projekte bucht LAUFZEIT (6) Monate lang,
+je Monat also nur die laufenden Projekte. Ziel: die Dauer je Monat bleibt gleich, egal wie lang die Historie ist.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from db_importer import run_import
+from sap_generator import TEXTE, german_number, make_projects, make_psp, write_csv
+
+
+def write_month(data_dir, year, month, n_rows, rng, projects):
+    df = pd.DataFrame({
+        'Objekt': make_psp(projects, rng, n_rows),
+        'Wert/BWähr': german_number(rng.normal(2_500, 8_000, n_rows).round(2)),
+        'Periode': str(month),
+        'Geschäftsjahr': str(year),
+        'Einkaufsbeleg': pd.Series(rng.integers(4500000000, 4500005000, n_rows)).astype(str),
+        'Bezeichnung': rng.choice(TEXTE, n_rows),
+    })
+    write_csv(df, os.path.join(data_dir, f'CJI3_{year}_{month:02d}.csv'))
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_months = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    duration = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+    rng = np.random.default_rng(42)
+    projects = make_projects(200)
+    starts = rng.integers(-duration + 1, n_months, len(projects))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        os.makedirs(data_dir)
+        db_path = os.path.join(work_dir, 'bench.db')
+        print(f"{n_months} Monate x {n_rows:,} Zeilen CJI3")
+        print(f"  {'Monat':<8} {'Projekte':>8} {'Historie':>10} {'Rohtabelle':>11} {'Summen usw.':>12}")
+        for i in range(n_months):
+            year, month = 2024 + i // 12, i % 12 + 1
+            running = projects[(starts <= i) & (i < starts + duration)]
+            write_month(data_dir, year, month, n_rows, rng, running)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = run_import(data_dir, db_path)
+            total = time.perf_counter() - start
+            table = stats['ist_kosten']['sekunden']
+            print(f"  {year}-{month:02d}  {len(running):>8} {(i + 1) * n_rows:>10,} {table:>9.2f} s {total - table:>10.2f} s")
+
+
+if __name__ == '__main__':
+    main()
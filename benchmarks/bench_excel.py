@@ -0,0 +1,88 @@
+"""
+Benchmark: Excel-Import bisher (pd.read_excel, dtype=str) vs. excel_reader (gestreamt, nur benötigte
+Spalten) und Wiederholung aus dem Parquet-Zwischenspeicher.
+
+Aufruf:  python benchmarks/bench_excel.py [ZEILEN] [ZUSATZSPALTEN]
+Standard ist eine LV-Übersicht mit 50.000 Zeilen, den 5 benötigten und 20 weiteren Spalten
+(Titelzeile, Kopfzeile in Zeile 2 wie der echte Export).
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+import excel_reader
+from db_importer import SOURCE_SCHEMAS
+
+HEADER_ROW = 1
+
+
+def make_workbook(path, n_rows, n_extra, seed=42):
+    """LV-Übersicht mit Titelzeile; Zusatzspalten abwechselnd Text, Betrag und Datum."""
+    rng = np.random.default_rng(seed)
+    projects = np.array([f'G.0118{i:05d}' for i in range(2_000)])
+    lv_projekt = rng.choice(projects, n_rows)
+    df = pd.DataFrame({
+        'LV-Nummer': [f'LV {i:06d}' for i in range(n_rows)],
+        'Bezeichnung': rng.choice(['Bauleistung', 'Planung', 'Gutachten', 'Vermessung'], n_rows),
+        'Planungelement': pd.Series(lv_projekt) + pd.Series(rng.integers(1, 6, n_rows)).map('.{:02d}'.format),
+        'Projektnummer': lv_projekt,
+        'Betrag': rng.uniform(50_000, 2_000_000, n_rows).round(2),
+    })
+    for i in range(n_extra):
+        kind = i % 3
+        if kind == 0:
+            df[f'Info {i}'] = rng.choice(['offen', 'abgeschlossen', 'in Prüfung', None], n_rows)
+        elif kind == 1:
+            df[f'Wert {i}'] = rng.normal(10_000, 3_000, n_rows).round(2)
+        else:
+            df[f'Datum {i}'] = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), unit='D')
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame([['LV-Übersicht (synthetisch)']]).to_excel(writer, index=False, header=False)
+        df.to_excel(writer, index=False, startrow=HEADER_ROW)
+
+
+def timed(label, func, baseline=None):
+    start = time.perf_counter()
+    result = func()
+    duration = time.perf_counter() - start
+    speedup = f"  ({baseline / duration:5.1f}x)" if baseline else ""
+    print(f"  {label:<38} {duration:7.2f} s{speedup}")
+    return result, duration
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    n_extra = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    columns = list(SOURCE_SCHEMAS['vertraege_uebersicht'])
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'LV-Übersicht_2025.xlsx')
+        make_workbook(path, n_rows, n_extra)
+        print(f"LV-Übersicht: {n_rows:,} Zeilen x {5 + n_extra} Spalten, "
+              f"{os.path.getsize(path) / 1e6:.1f} MB")
+
+        def read_all(**kwargs):
+            return pd.concat(list(excel_reader.read_workbook(path, HEADER_ROW, **kwargs)), ignore_index=True)
+
+        expected, t_old = timed("bisher: pd.read_excel(dtype=str)",
+                                lambda: pd.read_excel(path, header=HEADER_ROW, dtype=str))
+        expected.columns = [str(c) for c in expected.columns]
+        result, _ = timed("gestreamt, alle Spalten", read_all, t_old)
+        pd.testing.assert_frame_equal(result, expected)
+
+        cache_base = os.path.join(work_dir, excel_reader.CACHE_DIR_NAME)
+        result, _ = timed("gestreamt, nur benötigte Spalten", lambda: read_all(columns=columns, cache_base=cache_base), t_old)
+        wanted = [c for c in expected.columns if excel_reader.column_key(c) in columns]
+        pd.testing.assert_frame_equal(result, expected[wanted])
+        result, _ = timed("erneut: aus dem Parquet-Zwischenspeicher", lambda: read_all(columns=columns, cache_base=cache_base), t_old)
+        pd.testing.assert_frame_equal(result, expected[wanted])
+        print("Ergebnisse identisch.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: Bestell-Matrix bisher (pivot_table + merge + apply pro Zeile) vs. order_matrix.build_order_matrix.
+
+Aufruf:  python benchmarks/bench_order_matrix.py [BESTELLUNGEN] [PERIODEN]
+Standard sind 100.000 Bestellungen x 24 Perioden.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from order_matrix import build_order_matrix
+
+
+def legacy_order_matrix(df_orders_ist, df_orders_obligo):
+    """Die Matrix-Logik, wie sie bis zur Vektorisierung in app.py stand (Referenz für Tests)."""
+    pivot_ist = df_orders_ist.pivot_table(index='bestellung', columns='periode', values='wert', aggfunc='sum', fill_value=0)
+    pivot_ist['Summe Ist'] = pivot_ist.sum(axis=1)
+    pivot_ist = pivot_ist.reset_index()
+
+    text_map = df_orders_ist.groupby('bestellung')['text'].first()
+    pivot_ist['text'] = pivot_ist['bestellung'].map(text_map)
+
+    final_df = pd.merge(pivot_ist, df_orders_obligo, on='bestellung', how='outer')
+    final_df = final_df.fillna(0)
+    if 'text' not in final_df.columns: final_df['text'] = ""
+    if 'text_obligo' in final_df.columns:
+        final_df['text'] = final_df.apply(lambda row: row['text_obligo'] if (row['text'] == 0 or row['text'] == "") else row['text'], axis=1)
+
+    final_df['Auftragswert (Kalk.)'] = final_df['Summe Ist'] + final_df['obligo_wert']
+    final_df['sort_helper'] = final_df['bestellung'].apply(lambda x: 'ZZZ' if 'Sonstiges' in x else x)
+    final_df = final_df.sort_values('sort_helper').drop(columns=['sort_helper'])
+
+    display_df = final_df.rename(columns={'obligo_wert': 'Rest-Obligo'})
+    month_cols = sorted([c for c in display_df.columns if str(c).isdigit()], key=lambda x: int(x))
+    cols_order = ['bestellung', 'text'] + month_cols + ['Summe Ist', 'Rest-Obligo', 'Auftragswert (Kalk.)']
+    return display_df[[c for c in cols_order if c in display_df.columns]]
+
+
+def make_orders(n_orders, n_periods, seed=42, fill=0.5):
+    """Summen je Bestellung und Periode (Form von agg_bestellung_ist / agg_bestellung_obligo)."""
+    rng = np.random.default_rng(seed)
+    orders = np.array([f'45{i:08d}' for i in range(n_orders)] + ['Sonstiges / Ohne Bestellung'])
+    cells = rng.random((len(orders), n_periods)) < fill
+    order_idx, period_idx = np.nonzero(cells)
+    texts = pd.Series(rng.choice(['Bau', 'Planung', 'Gutachten', 'Unbekannt'], len(orders)), index=orders)
+    ist = pd.DataFrame({
+        'bestellung': orders[order_idx],
+        'periode': (period_idx + 1).astype(str),
+        'wert': rng.normal(1_000, 5_000, len(order_idx)).round(2),
+    })
+    ist['text'] = texts.reindex(ist['bestellung']).to_numpy()
+
+    obligo_orders = rng.choice(np.concatenate([orders[:-1], [f'46{i:08d}' for i in range(n_orders // 10)]]),
+                               n_orders // 2, replace=False)
+    obligo = pd.DataFrame({
+        'bestellung': obligo_orders,
+        'obligo_wert': rng.uniform(0, 50_000, len(obligo_orders)).round(2),
+        'text_obligo': rng.choice(np.array(['Rahmenvertrag', 'Nachtrag', None], dtype=object), len(obligo_orders)),
+    })
+    return ist, obligo
+
+
+def main():
+    n_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_periods = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    ist, obligo = make_orders(n_orders, n_periods)
+    print(f"{n_orders:,} Bestellungen x {n_periods} Perioden ({len(ist):,} Ist-Summen, {len(obligo):,} Obligo)")
+
+    start = time.perf_counter()
+    expected = legacy_order_matrix(ist, obligo)
+    t_old = time.perf_counter() - start
+    print(f"bisher (pivot/merge/apply): {t_old:6.2f} s")
+
+    start = time.perf_counter()
+    result = build_order_matrix(ist, obligo)
+    t_new = time.perf_counter() - start
+    print(f"build_order_matrix:         {t_new:6.2f} s  ({t_old / t_new:.1f}x)")
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_column_type=False)
+    print("Ergebnis identisch.")
+
+
+if __name__ == '__main__':
+    main()
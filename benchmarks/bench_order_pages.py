@@ -0,0 +1,89 @@
+"""
+Benchmark: Seitenwechsel in der Bestell-Matrix (SQL-Seite laden, Matrix der Seite bauen, formatieren).
+
+Aufruf:  python benchmarks/bench_order_pages.py [BESTELLUNGEN] [PERIODEN]
+Standard sind 100.000 Bestellungen x 24 Perioden in einem einzigen Projekt.
+Ziel: jeder Seitenwechsel unter 100 ms, egal auf welcher Seite und mit welcher Sortierung.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import queries
+from bench_order_matrix import make_orders
+from db_importer import create_db_engine, write_chunks, create_indexes, build_aggregates
+from order_matrix import build_order_matrix
+
+PROJECT = 'G.011803001'
+TARGET_MS = 100
+
+
+def build_db(db_path, n_orders, n_periods):
+    """Ein Projekt mit n_orders Bestellungen als Roh-Tabellen, dann die Summen-Tabellen wie im Import."""
+    ist, obligo = make_orders(n_orders, n_periods, fill=0.1)
+    ist_raw = pd.DataFrame({
+        'objekt': PROJECT + '.01.01', 'wert/bwähr': ist['wert'], 'periode': ist['periode'],
+        'einkaufsbeleg': ist['bestellung'].where(~ist['bestellung'].str.startswith('Sonstiges'), None),
+        'bezeichnung': ist['text'], 'hauptprojekt': PROJECT,
+    })
+    obligo_raw = pd.DataFrame({
+        'objekt': PROJECT + '.01.01', 'wert/bwähr': obligo['obligo_wert'], 'nr_referenzbeleg': obligo['bestellung'],
+        'bezeichnung': obligo['text_obligo'], 'hauptprojekt': PROJECT,
+    })
+    engine = create_db_engine(db_path)
+    with engine.begin() as conn:
+        write_chunks(conn, 'ist_kosten', [ist_raw])
+        write_chunks(conn, 'obligo_cji5', [obligo_raw])
+        create_indexes(conn, 'ist_kosten')
+        create_indexes(conn, 'obligo_cji5')
+        build_aggregates(conn)
+        conn.exec_driver_sql("ANALYZE")
+    return engine
+
+
+def switch_page(conn, page, sort, search, periods):
+    start = time.perf_counter()
+    data = queries.load_order_page(conn, PROJECT, page, queries.ORDER_PAGE_SIZE, sort, search)
+    matrix = build_order_matrix(data['orders_ist'], data['orders_obligo'], order=data['orders'], periods=periods)
+    matrix.style.format(precision=2, thousands=".", decimal=",").to_html()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    n_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_periods = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    logging.getLogger('queries').setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        engine = build_db(os.path.join(work_dir, 'bench.db'), n_orders, n_periods)
+        print(f"{n_orders:,} Bestellungen x {n_periods} Perioden, Datenbank in {time.perf_counter() - start:.1f} s")
+
+        periods = [str(p) for p in range(1, n_periods + 1)]
+        with engine.connect() as conn:
+            switch_page(conn, 0, 'Bestellnummer', '', periods)  # Aufwärmen (Styler-Template laden, wie beim App-Start)
+            worst = 0.0
+            for sort in queries.ORDER_SORTS:
+                for search in ['', '4500']:
+                    n_pages = -(-queries.count_orders(conn, PROJECT, search) // queries.ORDER_PAGE_SIZE)
+                    times = [switch_page(conn, page, sort, search, periods)
+                             for page in sorted({0, 1, n_pages // 2, n_pages - 1})]
+                    worst = max(worst, max(times))
+                    print(f"  {sort:<22} Suche {search!r:<7} {n_pages:>5} Seiten: "
+                          f"{' / '.join(f'{t:5.1f}' for t in times)} ms")
+            start = time.perf_counter()
+            queries.count_orders(conn, PROJECT, '')
+            print(f"  Zählen aller Bestellungen: {(time.perf_counter() - start) * 1000:.1f} ms")
+        engine.dispose()
+
+    print(f"Langsamster Seitenwechsel: {worst:.1f} ms ({'OK' if worst < TARGET_MS else 'über'} Ziel {TARGET_MS} ms)")
+
+
+if __name__ == '__main__':
+    main()
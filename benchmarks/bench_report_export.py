@@ -0,0 +1,58 @@
+"""
+Benchmark: Monatsabschluss-Export (report_export.py), ein Bericht je Projekt.
+Gemessen werden ein kompletter Lauf und ein fortgesetzter Lauf, nachdem ein Teil der Berichte
+fehlt (wie nach einem Abbruch); Ziel ist ein Lauf über 2.000 Projekte in wenigen Minuten.
+
+Aufruf:  python benchmarks/bench_report_export.py [PROJEKTE] [ZEILEN] [WORKERS] [FORMAT]
+Standard: 2.000 Projekte, 400.000 Ist-Zeilen (200 je Projekt), ein Worker je CPU-Kern, xlsx.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from db_importer import run_import
+from report_export import EXPORT_WORKERS, run_export
+from sap_generator import generate_exports
+
+
+def timed_export(db_path, out_dir, fmt, workers):
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = run_export(db_path, out_dir, fmt, workers=workers)
+    return stats
+
+
+def main():
+    n_projects = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    n_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 400_000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else EXPORT_WORKERS
+    fmt = sys.argv[4] if len(sys.argv) > 4 else 'xlsx'
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        db_path = os.path.join(work_dir, 'bench.db')
+        out_dir = os.path.join(work_dir, 'berichte')
+        generate_exports(data_dir, ist_rows=n_rows, n_projects=n_projects)
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_import(data_dir, db_path)
+        print(f"{n_projects:,} Projekte, {n_rows:,} Ist-Zeilen, {workers} Worker, Format {fmt}")
+
+        stats = timed_export(db_path, out_dir, fmt, workers)
+        per_project = stats['sekunden'] / max(stats['erstellt'], 1) * 1000
+        size = sum(os.path.getsize(os.path.join(stats['ordner'], f)) for f in os.listdir(stats['ordner'])) / 1e6
+        print(f"  komplett:     {stats['sekunden']:7.1f} s  {stats['erstellt']:>6} Berichte  "
+              f"{per_project:6.1f} ms/Projekt  {size:.0f} MB")
+
+        # Abbruch nach der Hälfte nachstellen: jeder zweite Bericht fehlt
+        for name in sorted(os.listdir(stats['ordner']))[::2]:
+            os.remove(os.path.join(stats['ordner'], name))
+        stats = timed_export(db_path, out_dir, fmt, workers)
+        print(f"  fortgesetzt:  {stats['sekunden']:7.1f} s  {stats['erstellt']:>6} Berichte neu, "
+              f"{stats['uebersprungen']} übersprungen")
+
+
+if __name__ == '__main__':
+    main()
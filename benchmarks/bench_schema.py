@@ -0,0 +1,48 @@
+"""
+Benchmark: Speicherbedarf und Dauer eines CJI3-Exports im Importer, bisher (alle Spalten als Text,
+Beträge über FINANCE_KEYWORDS) vs. mit Spalten-Schema (nur benötigte Spalten, Kategorien, float64).
+
+Aufruf:  python benchmarks/bench_schema.py [ZEILEN]
+Standard ist ein CJI3-Export mit 500.000 Zeilen aus sap_generator (eine Datei, ein Block).
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from db_importer import SOURCE_SCHEMAS, iter_clean_chunks
+from sap_generator import generate_exports
+
+
+def measure(label, path, schema, baseline=None):
+    start = time.perf_counter()
+    (df,) = iter_clean_chunks(path, 0, chunksize=0, schema=schema)
+    duration = time.perf_counter() - start
+    size = df.memory_usage(deep=True).sum() / 1e6
+    ratio = f"  ({baseline / size:4.1f}x kleiner)" if baseline else ""
+    print(f"  {label:<22} {duration:6.2f} s  {size:8.1f} MB{ratio}")
+    print(f"  {'':<22} {', '.join(f'{col}: {dtype}' for col, dtype in df.dtypes.items())}")
+    return df, size
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        generate_exports(work_dir, ist_rows=n_rows, n_projects=200, n_periods=24)
+        path = os.path.join(work_dir, 'CJI3_2024.csv')
+        print(f"CJI3: {n_rows:,} Zeilen, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        old, old_size = measure("bisher: alles Text", path, None)
+        new, _ = measure("Schema", path, SOURCE_SCHEMAS['ist_kosten'], old_size)
+
+        # Gleiche Werte in den gemeinsamen Spalten
+        for col in new.columns:
+            assert new[col].astype(object).equals(old[col].astype(object)), col
+        print(f"Gleiche Werte, {len(old.columns) - len(new.columns)} ungenutzte Spalten nicht gelesen.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: Projektwechsel aus SQLite (Summen-Tabellen) vs. Parquet (partitioniert nach Hauptprojekt).
+
+Aufruf:  python benchmarks/bench_storage.py [ZEILEN ...] [--projekte N] [--wechsel N]
+Standard sind 1 Mio., 10 Mio. und 50 Mio. Ist-Zeilen (Obligo jeweils 1/5 davon).
+Gemessen werden Importdauer bis zur fertigen DB, Parquet-Export, Plattengröße und die
+Dauer eines Projektwechsels (ohne Streamlit-Cache) für beide Varianten.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+import columnar_store
+import queries
+from db_importer import create_db_engine, write_chunks, create_indexes, build_aggregates
+
+BLOCK_SIZE = 1_000_000
+
+
+def make_block(n_rows, n_projects, rng, obligo=False):
+    """Synthetische, bereits bereinigte CJI3/CJI5-Zeilen (so wie sie nach clean_frame aussehen)."""
+    projekt = rng.integers(0, n_projects, n_rows)
+    hauptprojekt = pd.Series(projekt).map('G.{:09d}'.format)
+    psp = hauptprojekt + pd.Series(rng.integers(1, 30, n_rows)).map('.{:02d}'.format)
+    beleg = pd.Series(rng.integers(4500000000, 4500000000 + 20 * n_projects, n_rows)).astype(str)
+    df = pd.DataFrame({
+        'objekt': psp,
+        'wert/bwähr': rng.uniform(-5_000, 50_000, n_rows).round(2),
+        'bezeichnung': 'Position ' + pd.Series(rng.integers(0, 500, n_rows)).astype(str),
+        'hauptprojekt': hauptprojekt,
+    })
+    if obligo:
+        df.insert(2, 'nr_referenzbeleg', beleg)
+    else:
+        df.insert(2, 'periode', rng.integers(1, 13, n_rows).astype(float))
+        df.insert(3, 'einkaufsbeleg', beleg.where(rng.random(n_rows) > 0.1, None))
+    return df
+
+
+def build_db(db_path, n_rows, n_projects, seed=42):
+    rng = np.random.default_rng(seed)
+    engine = create_db_engine(db_path)
+
+    def blocks(total, obligo):
+        for start in range(0, total, BLOCK_SIZE):
+            yield make_block(min(BLOCK_SIZE, total - start), n_projects, rng, obligo)
+
+    with engine.begin() as conn:
+        write_chunks(conn, 'ist_kosten', blocks(n_rows, obligo=False))
+        write_chunks(conn, 'obligo_cji5', blocks(n_rows // 5, obligo=True))
+        create_indexes(conn, 'ist_kosten')
+        create_indexes(conn, 'obligo_cji5')
+        build_aggregates(conn)
+        conn.exec_driver_sql("ANALYZE")
+    return engine
+
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def time_switches(load, projects):
+    times = []
+    for project in projects:
+        start = time.perf_counter()
+        load(project)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 95)
+
+
+def run(n_rows, n_projects, n_switches, work_dir):
+    db_path = os.path.join(work_dir, 'bench.db')
+    root = columnar_store.parquet_dir(work_dir)
+    print(f"\n=== {n_rows:,} Ist-Zeilen, {n_projects} Projekte ===")
+
+    start = time.perf_counter()
+    engine = build_db(db_path, n_rows, n_projects)
+    print(f"SQLite inkl. Summen:   {time.perf_counter() - start:8.1f} s   {dir_size(db_path) / 1e6:9.1f} MB")
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        columnar_store.export_from_sqlite(conn, root)
+    print(f"Parquet-Export:        {time.perf_counter() - start:8.1f} s   {dir_size(root) / 1e6:9.1f} MB")
+
+    rng = np.random.default_rng(7)
+    projects = [f'G.{p:09d}' for p in rng.integers(0, n_projects, n_switches)]
+    with engine.connect() as conn:
+        p50, p95 = time_switches(lambda p: queries.load_project_data(conn, p), projects)
+    print(f"Projektwechsel SQLite:  p50 {p50:7.1f} ms   p95 {p95:7.1f} ms")
+    p50, p95 = time_switches(lambda p: columnar_store.load_project_data(root, p), projects)
+    print(f"Projektwechsel Parquet: p50 {p50:7.1f} ms   p95 {p95:7.1f} ms")
+
+    engine.dispose()
+    os.remove(db_path)
+    shutil.rmtree(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rows', nargs='*', type=int, default=[1_000_000, 10_000_000, 50_000_000])
+    parser.add_argument('--projekte', type=int, default=500)
+    parser.add_argument('--wechsel', type=int, default=50)
+    args = parser.parse_args()
+
+    logging.getLogger('queries').setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_rows in args.rows:
+            run(n_rows, args.projekte, args.wechsel, work_dir)
+
+
+if __name__ == '__main__':
+    main()
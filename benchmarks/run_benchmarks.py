@@ -0,0 +1,197 @@
+"""
+Benchmark-Suite für Import und Cockpit-Datenpfad auf synthetischen SAP-Exporten.
+
+Misst je Größe:
+  - run_import: Dauer gesamt und Zeilen/s je Tabelle
+  - Projektwechsel (queries.load_project_data): kalt (neue Verbindung) und warm (wiederholt), p50/p95
+  - Portfolio-Übersicht (queries.load_portfolio, alle Projekte): kalt, p50/p95
+  - Spitzen-Speicher (max. RSS) von Import und Projektwechseln, jeweils in einem eigenen Prozess
+
+Ergebnisse landen als JSON in benchmarks/results/, damit Versionen verglichen werden können.
+
+Aufruf:  python benchmarks/run_benchmarks.py [--groesse klein|mittel|gross] [--zeilen N ...]
+                                            [--ausgabe DATEI] [--vergleich ALT.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.append(BENCH_DIR)
+
+from sap_generator import generate_exports
+
+# Ist-Zeilen (CJI3) je Stufe; die übrigen Exporte wachsen proportional mit
+GROESSEN = {
+    'klein': [50_000],
+    'mittel': [50_000, 500_000],
+    'gross': [50_000, 500_000, 2_000_000],
+}
+PROJEKTE = 200
+PERIODEN = 24
+WECHSEL = 30
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def peak_memory_mb():
+    """Maximaler Speicher (RSS) dieses Prozesses; None, wo das Modul 'resource' fehlt (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux liefert KB, macOS Bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentiles(times_ms):
+    return {'p50_ms': round(float(np.percentile(times_ms, 50)), 2),
+            'p95_ms': round(float(np.percentile(times_ms, 95)), 2)}
+
+
+def bench_import(data_dir, db_path, workers):
+    """Läuft in einem eigenen Prozess, damit der Spitzen-Speicher nur den Import zeigt."""
+    from db_importer import run_import
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = run_import(data_dir, db_path, force=True, workers=workers, storage='sqlite')
+    total = time.perf_counter() - start
+
+    tabellen = {name: {**s, 'sekunden': round(s['sekunden'], 3),
+                       'zeilen_pro_s': round(s['zeilen'] / max(s['sekunden'], 1e-9))}
+                for name, s in stats.items()}
+    return {'sekunden': round(total, 3), 'tabellen': tabellen, 'peak_mb': peak_memory_mb()}
+
+
+def bench_switch(db_path, projects):
+    """
+    Projektwechsel über den Datenpfad des Cockpits (queries.load_project_data).
+    Kalt: erste Abfrage auf einer frischen Verbindung. Warm: dieselbe Abfrage noch einmal.
+    """
+    import queries
+    from sqlalchemy import create_engine
+
+    logging.getLogger('queries').setLevel(logging.WARNING)
+    cold, warm = [], []
+    for project in projects:
+        engine = create_engine(f'sqlite:///{db_path}')
+        start = time.perf_counter()
+        queries.load_project_data(engine, project)
+        cold.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        queries.load_project_data(engine, project)
+        warm.append((time.perf_counter() - start) * 1000)
+        engine.dispose()
+
+    portfolio = []
+    for _ in range(WECHSEL):
+        engine = create_engine(f'sqlite:///{db_path}')
+        start = time.perf_counter()
+        queries.load_portfolio(engine)
+        portfolio.append((time.perf_counter() - start) * 1000)
+        engine.dispose()
+    return {'kalt': percentiles(cold), 'warm': percentiles(warm), 'portfolio': percentiles(portfolio),
+            'peak_mb': peak_memory_mb()}
+
+
+def in_subprocess(func, *args):
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(func, *args).result()
+
+
+def run_size(ist_rows, workers, work_dir):
+    data_dir = os.path.join(work_dir, f'data_{ist_rows}')
+    db_path = os.path.join(work_dir, f'bench_{ist_rows}.db')
+
+    start = time.perf_counter()
+    info = generate_exports(data_dir, ist_rows, PROJEKTE, PERIODEN)
+    print(f"\n=== {ist_rows:,} Ist-Zeilen (erzeugt in {time.perf_counter() - start:.1f} s) ===")
+
+    result = {'zeilen': info['zeilen'], 'import': in_subprocess(bench_import, data_dir, db_path, workers)}
+    for name, s in result['import']['tabellen'].items():
+        print(f"  {name:<22} {s['zeilen']:>10,} Zeilen  {s['zeilen_pro_s']:>10,} Zeilen/s")
+    print(f"  Import gesamt {result['import']['sekunden']:.1f} s, Spitze {result['import']['peak_mb']} MB")
+
+    rng = np.random.default_rng(7)
+    projects = [str(p) for p in rng.choice(info['projekte'], WECHSEL)]
+    result['projektwechsel'] = in_subprocess(bench_switch, db_path, projects)
+    switch = result['projektwechsel']
+    print(f"  Projektwechsel kalt p50 {switch['kalt']['p50_ms']} ms / p95 {switch['kalt']['p95_ms']} ms, "
+          f"warm p50 {switch['warm']['p50_ms']} ms / p95 {switch['warm']['p95_ms']} ms")
+    print(f"  Portfolio ({len(info['projekte'])} Projekte) p50 {switch['portfolio']['p50_ms']} ms "
+          f"/ p95 {switch['portfolio']['p95_ms']} ms")
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """Druckt die Änderung der wichtigsten Kennzahlen gegenüber einem älteren Lauf."""
+    print(f"\nVergleich mit {old['meta'].get('commit')} ({old['meta']['zeitpunkt']}):")
+    for size, res in new['ergebnisse'].items():
+        if size not in old['ergebnisse']:
+            continue
+        alt = old['ergebnisse'][size]
+        werte = [('Import s', alt['import']['sekunden'], res['import']['sekunden']),
+                 ('Wechsel kalt p95 ms', alt['projektwechsel']['kalt']['p95_ms'], res['projektwechsel']['kalt']['p95_ms']),
+                 ('Wechsel warm p95 ms', alt['projektwechsel']['warm']['p95_ms'], res['projektwechsel']['warm']['p95_ms']),
+                 ('Import Spitze MB', alt['import']['peak_mb'], res['import']['peak_mb'])]
+        for label, a, b in werte:
+            if a and b is not None:
+                print(f"  {size:>10} {label:<20} {a:>10} -> {b:>10}  ({(b - a) / a:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--groesse', choices=GROESSEN, default='klein')
+    parser.add_argument('--zeilen', type=int, nargs='+', help="Eigene Ist-Zeilenzahlen statt --groesse")
+    parser.add_argument('--workers', type=int, default=1, help="Parser-Prozesse für run_import")
+    parser.add_argument('--ausgabe', help="JSON-Datei (Standard: benchmarks/results/bench_<commit>_<zeit>.json)")
+    parser.add_argument('--vergleich', help="Älteres Ergebnis-JSON, gegen das verglichen wird")
+    args = parser.parse_args()
+
+    import pandas as pd
+    import sqlalchemy
+    meta = {'zeitpunkt': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+            'python': platform.python_version(), 'pandas': pd.__version__, 'sqlalchemy': sqlalchemy.__version__,
+            'plattform': platform.platform(), 'projekte': PROJEKTE, 'perioden': PERIODEN,
+            'wechsel': WECHSEL, 'workers': args.workers}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = {str(n): run_size(n, args.workers, work_dir) for n in (args.zeilen or GROESSEN[args.groesse])}
+    output = {'meta': meta, 'ergebnisse': results}
+
+    path = args.ausgabe or os.path.join(
+        RESULTS_DIR, f"bench_{meta['commit'] or 'lokal'}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Ergebnisse gespeichert: {path}")
+
+    if args.vergleich:
+        with open(args.vergleich, encoding='utf-8') as f:
+            compare(json.load(f), output)
+
+
+if __name__ == '__main__':
+    main()
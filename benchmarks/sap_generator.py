@@ -0,0 +1,141 @@
+"""
+Erzeugt synthetische SAP-Exporte in der Form, wie sie in 'data/' landen:
+  CJI3_*.csv            Ist-Kosten (Einzelposten mit Periode, Bestellung, Text)
+  CJI5_*.csv            Obligo (Referenzbeleg)
+  CNB1_*.csv            Obligo aus Bestellanforderungen
+  CNB2_*.csv            Obligo aus Bestellungen
+  LV-Übersicht_*.xlsx   Leistungsverzeichnisse / Budget (Titelzeile + Kopfzeile in Zeile 2)
+
+CSVs wie aus SAP: Strichpunkt, Latin-1, deutsche Zahlenformate ("1.234,56", "-12,00").
+PSP-Elemente hängen an Hauptprojekten (G.011803001 -> G.011803001.02.02).
+
+Aufruf:  python benchmarks/sap_generator.py ZIELORDNER [--zeilen N] [--projekte N] [--perioden N]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+TEXTE = ['Bauleistung', 'Planung', 'Gutachten', 'Vermessung', 'Baustelleneinrichtung',
+         'Elektroinstallation', 'Prüfstatik', 'Reisekosten', 'Material', 'Fremdleistung']
+
+
+def german_number(values):
+    """Beträge als SAP-Text: Tausenderpunkt, Dezimalkomma, Minus vorne."""
+    text = pd.Series(values).map('{:,.2f}'.format)
+    return text.str.replace(',', 'X').str.replace('.', ',').str.replace('X', '.')
+
+
+def make_projects(n_projects):
+    return np.array([f'G.{11803001 + i * 37:09d}' for i in range(n_projects)])
+
+
+def make_psp(projects, rng, n_rows):
+    """PSP-Elemente mit zwei Hierarchieebenen unter dem Hauptprojekt."""
+    projekt = projects[rng.integers(0, len(projects), n_rows)]
+    ebene1 = rng.integers(1, 6, n_rows)
+    ebene2 = rng.integers(1, 5, n_rows)
+    return pd.Series(projekt) + pd.Series(ebene1).map('.{:02d}'.format) + pd.Series(ebene2).map('.{:02d}'.format)
+
+
+def make_periods(rng, n_rows, n_periods, start_year):
+    """Periode 1..12 plus Geschäftsjahr, über n_periods Monate verteilt."""
+    monat = rng.integers(0, n_periods, n_rows)
+    return (monat % 12 + 1).astype(str), (start_year + monat // 12).astype(str)
+
+
+def make_orders(rng, n_rows, n_orders, empty_share):
+    bestellung = pd.Series(rng.integers(4500000000, 4500000000 + n_orders, n_rows)).astype(str)
+    return bestellung.where(rng.random(n_rows) >= empty_share, '')
+
+
+def write_csv(df, path):
+    df.to_csv(path, sep=';', index=False, encoding='latin1')
+
+
+def generate_exports(out_dir, ist_rows=100_000, n_projects=50, n_periods=24, start_year=2024, seed=42):
+    """
+    Schreibt einen vollständigen Satz Exporte nach out_dir.
+    Obligo/CNB/LV wachsen proportional zu ist_rows. Rückgabe: Kennzahlen zum Abgleich
+    (Dateien, Zeilen je Export, Summe der Ist-Werte, Projekte).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    projects = make_projects(n_projects)
+    n_orders = max(ist_rows // 20, 1)
+    rows = {'CJI3': ist_rows, 'CJI5': max(ist_rows // 4, 1), 'CNB1': max(ist_rows // 20, 1),
+            'CNB2': max(ist_rows // 10, 1), 'LV-Übersicht': n_projects * 5}
+
+    # CJI3: Ist-Kosten
+    werte = rng.normal(2_500, 8_000, rows['CJI3']).round(2)
+    periode, jahr = make_periods(rng, rows['CJI3'], n_periods, start_year)
+    cji3 = pd.DataFrame({
+        'Objekt': make_psp(projects, rng, rows['CJI3']),
+        'Kostenart': rng.integers(600000, 600100, rows['CJI3']).astype(str),
+        'Wert/BWähr': german_number(werte),
+        'BWähr': 'EUR',
+        'Periode': periode,
+        'Geschäftsjahr': jahr,
+        'Einkaufsbeleg': make_orders(rng, rows['CJI3'], n_orders, empty_share=0.15),
+        'Bezeichnung': rng.choice(TEXTE, rows['CJI3']),
+    })
+    write_csv(cji3, os.path.join(out_dir, f'CJI3_{start_year}.csv'))
+
+    # CJI5: Obligo mit Referenzbeleg
+    cji5 = pd.DataFrame({
+        'Objekt': make_psp(projects, rng, rows['CJI5']),
+        'Nr. Referenzbeleg': make_orders(rng, rows['CJI5'], n_orders, empty_share=0.05),
+        'Wert/BWähr': german_number(rng.uniform(0, 60_000, rows['CJI5']).round(2)),
+        'Bezeichnung': rng.choice(TEXTE + [''], rows['CJI5']),
+    })
+    write_csv(cji5, os.path.join(out_dir, f'CJI5_{start_year}.csv'))
+
+    # CNB1 / CNB2: Bestellanforderungen und Bestellungen
+    for name, beleg in [('CNB1', 'Bestellanforderung'), ('CNB2', 'Einkaufsbeleg')]:
+        n = rows[name]
+        periode, jahr = make_periods(rng, n, n_periods, start_year)
+        cnb = pd.DataFrame({
+            'Objekt': make_psp(projects, rng, n),
+            beleg: pd.Series(rng.integers(1000000, 1000000 + n_orders, n)).astype(str),
+            'Position': (rng.integers(1, 20, n) * 10).astype(str),
+            'Wert/BWähr': german_number(rng.uniform(100, 80_000, n).round(2)),
+            'Periode': periode,
+            'Geschäftsjahr': jahr,
+            'Kurztext': rng.choice(TEXTE, n),
+        })
+        write_csv(cnb, os.path.join(out_dir, f'{name}_{start_year}.csv'))
+
+    # LV-Übersicht: Excel mit Titelzeile, Kopfzeile in Zeile 2 (header_row=1)
+    n = rows['LV-Übersicht']
+    lv_projekt = projects[rng.integers(0, n_projects, n)]
+    lv = pd.DataFrame({
+        'LV-Nummer': [f'LV {i:05d}' for i in range(n)],
+        'Bezeichnung': rng.choice(TEXTE, n),
+        'Planungelement': pd.Series(lv_projekt) + pd.Series(rng.integers(1, 6, n)).map('.{:02d}'.format),
+        'Projektnummer': lv_projekt,
+        'Betrag': german_number(rng.uniform(50_000, 2_000_000, n).round(2)),
+    })
+    with pd.ExcelWriter(os.path.join(out_dir, f'LV-Übersicht_{start_year}.xlsx')) as writer:
+        pd.DataFrame([['LV-Übersicht (synthetisch)']]).to_excel(writer, index=False, header=False)
+        lv.to_excel(writer, index=False, startrow=1)
+
+    return {'dateien': sorted(os.listdir(out_dir)), 'zeilen': rows,
+            'ist_summe': float(werte.sum()), 'projekte': projects.tolist()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('ziel')
+    parser.add_argument('--zeilen', type=int, default=100_000, help="Zeilen im CJI3-Export")
+    parser.add_argument('--projekte', type=int, default=50)
+    parser.add_argument('--perioden', type=int, default=24, help="Anzahl Monate (über Geschäftsjahre verteilt)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    info = generate_exports(args.ziel, args.zeilen, args.projekte, args.perioden, seed=args.seed)
+    for name, n in info['zeilen'].items():
+        print(f"{name:<14} {n:>12,} Zeilen")
+
+
+if __name__ == '__main__':
+    main()
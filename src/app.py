@@ -1,15 +1,22 @@
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine
 import os
 import plotly.graph_objects as go
 import sentry_sdk 
+import logging
+
+import columnar_store
+import data_service
+import metrics
+import queries
+from order_matrix import build_order_matrix
 
 # --- SENTRY MONITORING ---
 # Für Abgabe via ZIP ist der Key hardcodiert
 sentry_sdk.init(
     dsn="https://b9a777fa97d28f7260385b4052a44486@o4510688530137088.ingest.de.sentry.io/4510688535576656",
-    traces_sample_rate=1.0, # Erfasst 100% der Transaktionen für Debugging
+    # Nur Fehler melden; Laufzeiten werden lokal gemessen (metrics.py). Tracing bei Bedarf per Umgebungsvariable.
+    traces_sample_rate=float(os.environ.get('SENTRY_TRACES_SAMPLE_RATE', '0')),
 )
 
 # --- KONFIGURATION ---
@@ -18,7 +25,93 @@ st.set_page_config(page_title=APP_NAME, layout="wide", page_icon="🚄")
 
 # Datenbank-Verbindung
 db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'finanzdaten.db')
-engine = create_engine(f'sqlite:///{db_path}')
+parquet_dir = columnar_store.parquet_dir(os.path.dirname(db_path))
+
+# Wie viele Projekte pro Datenbank-Stand im gemeinsamen Speicher gehalten werden
+CACHE_MAX_PROJECTS = 50
+
+# Zeilen pro Seite in Bestell-Matrix und PSP-Tabelle (nur die sichtbare Seite wird formatiert und gesendet)
+PAGE_SIZE = 50
+# Wie viele Matrix-Seiten und Suchergebnisse im Speicher bleiben (Zurückblättern ohne Datenbank-Abfrage)
+CACHE_MAX_PAGES = 200
+
+# Sortierung der Portfolio-Übersicht: Anzeige -> (Spalte, aufsteigend)
+PORTFOLIO_SORTS = {
+    'Auslastung %': ('auslastung', False),
+    'Verfügbar': ('verfuegbar', True),
+    'Budget': ('budget', False),
+    'Ist-Kosten': ('ist', False),
+    'Obligo': ('obligo', False),
+    'Projekt': ('hauptprojekt', True),
+}
+
+# Wie oft (Sekunden) auf einen neuen Import geprüft wird, z.B. vom Watch-Modus des Importers
+AUTO_REFRESH_SECONDS = 5
+
+# Laufzeit jeder SQL-Abfrage im Terminal protokollieren (siehe queries.run_query)
+logging.basicConfig(format="%(asctime)s %(name)s: %(message)s")
+logging.getLogger(queries.__name__).setLevel(logging.INFO)
+
+# --- DATENZUGRIFF (GEMEINSAM FÜR ALLE SITZUNGEN, siehe data_service.py) ---
+
+@st.cache_resource
+def get_data_service(path):
+    """Ein Datendienst pro Prozess: Engine und geladene Frames teilen sich alle Sitzungen."""
+    return data_service.DataService(path, max_entries={
+        'projektdaten': CACHE_MAX_PROJECTS, 'suche': CACHE_MAX_PAGES,
+        'bestellanzahl': CACHE_MAX_PAGES, 'bestellseite': CACHE_MAX_PAGES})
+
+service = get_data_service(db_path)
+engine = service.engine
+
+def get_db_version():
+    """
+    Import-Generation der Datenbank (PRAGMA user_version, vom Importer hochgezählt).
+    Gehört zu jedem Eintrag im Datendienst: nach einem neuen Import passen alte Einträge nicht mehr.
+    """
+    return service.generation()
+
+@st.fragment(run_every=AUTO_REFRESH_SECONDS)
+def refresh_on_new_import(loaded_version):
+    """Lädt die Seite neu, sobald der Importer eine neue Generation geschrieben hat (ohne Klick)."""
+    if get_db_version() != loaded_version:
+        st.rerun()
+
+def load_projects(db_version):
+    """Projekt-Liste (aus der vorberechneten Summen-Tabelle des Importers)"""
+    return service.get(db_version, 'projekte', None, lambda: queries.load_projects(engine))
+
+def search_projects(search, db_version):
+    """Beste Treffer der Projektsuche (Suchindex des Importers, siehe queries.search_projects)"""
+    return service.get(db_version, 'suche', search, lambda: queries.search_projects(engine, search))
+
+def load_portfolio(db_version):
+    """Kennzahlen und Ampel aller Hauptprojekte (eine Zeile je Projekt aus agg_projekt)"""
+    with st.spinner("Lade Portfolio..."):
+        return service.get(db_version, 'portfolio', None, lambda: queries.load_portfolio(engine))
+
+def load_project_data(project, db_version):
+    """
+    Alle Summen eines Projekts aus den Aggregat-Tabellen des Importers
+    (KPI, PSP, Zeitverlauf; SQL siehe queries.py) oder, mit
+    COCKPIT_STORAGE=parquet, aus der Projekt-Partition des Parquet-Datasets.
+    """
+    def load():
+        if columnar_store.STORAGE_BACKEND == 'parquet':
+            return columnar_store.load_project_data(parquet_dir, project)
+        return queries.load_project_data(engine, project)
+    with st.spinner("Lade Projektdaten..."):
+        return service.get(db_version, 'projektdaten', project, load)
+
+def count_orders(project, search, db_version):
+    """Anzahl Bestellungen (nach Suchfilter) für die Seitenauswahl der Matrix"""
+    return service.get(db_version, 'bestellanzahl', (project, search),
+                       lambda: queries.count_orders(engine, project, search))
+
+def load_order_page(project, page, sort, search, db_version):
+    """Eine Seite der Bestell-Matrix (Filter, Sortierung und Blättern in SQL, siehe queries.py)"""
+    return service.get(db_version, 'bestellseite', (project, page, sort, search),
+                       lambda: queries.load_order_page(engine, project, page, PAGE_SIZE, sort, search))
 
 # --- HILFSFUNKTIONEN ---
 
@@ -36,6 +129,21 @@ def get_bereich_from_psp(psp):
         return f".{parts[2]}"  # z.B. .01, .02, .03
     return psp
 
+def open_project(df_view):
+    """Klick auf eine Zeile der Portfolio-Übersicht: Projekt in der Einzelansicht öffnen."""
+    rows = st.session_state['portfolio_tabelle'].selection.rows
+    if rows:
+        st.session_state['projekt'] = df_view['hauptprojekt'].iloc[rows[0]]
+        st.session_state['ansicht'] = "Einzelprojekt"
+
+def page_selector(n_rows, key):
+    """Seitenauswahl für lange Tabellen; liefert die Seite ab 0 (ohne Auswahl, wenn alles auf eine Seite passt)."""
+    n_pages = max(1, -(-n_rows // PAGE_SIZE))
+    if n_pages == 1:
+        return 0
+    page = st.number_input(f"Seite (von {n_pages})", min_value=1, max_value=n_pages, value=1, step=1, key=key)
+    return int(page) - 1
+
 # --- SEITENLEISTE ---
 
 logo_path = os.path.join(os.path.dirname(__file__), 'logo.png')
@@ -44,103 +152,127 @@ if os.path.exists(logo_path):
 
 st.sidebar.header("Filter & Navigation")
 
-# 1. Projekt-Liste laden (NEU: Nutzt die optimierte Spalte 'hauptprojekt')
+# 1. Projekt-Liste laden
 try:
-    # Wir laden direkt die Hauptprojekte aus der DB
-    query_all = """
-    SELECT DISTINCT hauptprojekt FROM ist_kosten WHERE hauptprojekt IS NOT NULL
-    UNION
-    SELECT DISTINCT hauptprojekt FROM obligo_cji5 WHERE hauptprojekt IS NOT NULL
-    """
-    df_projects = pd.read_sql(query_all, engine)
-    
-    if not df_projects.empty:
-        all_projects = sorted(df_projects['hauptprojekt'].dropna().unique().tolist())
-    else:
-        all_projects = []
+    db_version = get_db_version()
+    refresh_on_new_import(db_version)
+    df_projects = load_projects(db_version)
+    all_projects = df_projects['hauptprojekt'].tolist()
 
 except Exception as e:
     st.sidebar.error(f"Datenbank-Fehler (bitte Importer prüfen): {e}")
     all_projects = []
 
+ansicht = st.sidebar.radio("Ansicht:", ["Einzelprojekt", "Portfolio"], key="ansicht", horizontal=True)
+
 if all_projects:
-    selected_project = st.sidebar.selectbox("Projekt wählen:", all_projects)
+    # Nur die besten Treffer gehen an den Browser, nicht alle Projekte
+    project_search = st.sidebar.text_input("🔍 Projekt suchen:", key="projekt_suche",
+                                   placeholder="Projektnummer oder LV-Bezeichnung")
+    df_matches = search_projects(project_search, db_version)
+    descriptions = dict(zip(df_matches['hauptprojekt'], df_matches['beschreibung'].fillna('')))
+    options = list(descriptions)
+    # Aktuelle Auswahl (auch aus der Portfolio-Übersicht) bleibt wählbar, solange es das Projekt gibt
+    current = st.session_state.get('projekt')
+    if current in all_projects and current not in descriptions:
+        options.insert(0, current)
+    if not options:
+        st.sidebar.warning("Kein Projekt passt zur Suche.")
+    st.sidebar.caption(f"{len(df_matches)} Treffer angezeigt, {len(all_projects)} Projekte insgesamt")
+    selected_project = st.sidebar.selectbox(
+        "Projekt wählen:", options, key="projekt",
+        format_func=lambda p: f"{p} – {descriptions[p][:40]}" if descriptions.get(p) else p)
 else:
     st.sidebar.warning("Keine Projekte gefunden.")
     selected_project = None
 
+# Verstecktes Performance-Panel: nur mit "?perf=1" in der Adresse
+if st.query_params.get('perf') == '1':
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        df_perf = metrics.summary(os.path.dirname(db_path))
+        bereich = st.radio("Bereich:", ["Cockpit", "Import"], horizontal=True)
+        is_import = df_perf['stufe'].str.startswith('import.')
+        df_perf = df_perf[is_import if bereich == "Import" else ~is_import]
+        st.caption(f"Messrate {metrics.SAMPLE_RATE:.0%}, je Stufe die letzten {metrics.SUMMARY_WINDOW} Messungen")
+        st.caption(f"Gemeinsamer Datenspeicher: {sum(service.size().values())} Einträge, "
+                   f"{service.stats['treffer']} Treffer, {service.stats['berechnet']} berechnet")
+        st.dataframe(df_perf.style.format({'p50_ms': "{:,.1f}", 'p95_ms': "{:,.1f}", 'zeilen_median': "{:,.0f}"}),
+                     hide_index=True, use_container_width=True)
+
 # --- HAUPTBEREICH ---
 
 st.title(f"🚄 {APP_NAME}")
 
-if selected_project:
-    
-    st.markdown(f"### Analyse für Projekt: `{selected_project}`")
+if ansicht == "Portfolio" and all_projects:
 
     # ---------------------------------------------------------
-    # 1. DATEN LADEN (NEU: Filtert auf Hauptprojekt)
+    # PORTFOLIO: ALLE PROJEKTE (eine Zeile je Hauptprojekt)
     # ---------------------------------------------------------
+    st.markdown("### Portfolio-Übersicht")
+
+    with metrics.stage('cockpit.portfolio') as m:
+        df_portfolio = load_portfolio(db_version)
+        m['zeilen'] = len(df_portfolio)
+
+    c_search, c_status, c_sort = st.columns([2, 2, 1])
+    search = c_search.text_input("🔍 Projektnummer enthält:", key="portfolio_suche")
+    status = c_status.multiselect("Ampel:", queries.AMPEL_STATUS, default=queries.AMPEL_STATUS, key="portfolio_status")
+    sort = c_sort.selectbox("Sortierung:", list(PORTFOLIO_SORTS), key="portfolio_sort")
+
+    df_view = df_portfolio[df_portfolio['status'].isin(status)]
+    if search.strip():
+        df_view = df_view[df_view['hauptprojekt'].str.contains(search.strip(), regex=False)]
+    sort_col, ascending = PORTFOLIO_SORTS[sort]
+    df_view = df_view.sort_values(sort_col, ascending=ascending, na_position='last', kind='stable').reset_index(drop=True)
+
+    # Summen über die gefilterten Projekte
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Projekte", f"{len(df_view)} von {len(df_portfolio)}")
+    c2.metric("Gesamt-Budget", format_currency(df_view['budget'].sum()))
+    c3.metric("Ist + Obligo", format_currency(df_view['ist'].sum() + df_view['obligo'].sum()))
+    c4.metric("Überschritten", int((df_view['status'] == queries.AMPEL_STATUS[0]).sum()))
+
+    st.caption("Zeile anklicken, um das Projekt in der Einzelansicht zu öffnen.")
+    st.dataframe(
+        df_view[['status', 'hauptprojekt', 'budget', 'ist', 'obligo', 'verfuegbar', 'auslastung']].rename(columns={
+            'status': 'Ampel', 'hauptprojekt': 'Projekt', 'budget': 'Budget', 'ist': 'Ist',
+            'obligo': 'Obligo', 'verfuegbar': 'Verfügbar', 'auslastung': 'Auslastung %'}),
+        column_config={
+            'Budget': st.column_config.NumberColumn(format="%.2f €"),
+            'Ist': st.column_config.NumberColumn(format="%.2f €"),
+            'Obligo': st.column_config.NumberColumn(format="%.2f €"),
+            'Verfügbar': st.column_config.NumberColumn(format="%.2f €"),
+            'Auslastung %': st.column_config.NumberColumn(format="%.1f %%"),
+        },
+        key="portfolio_tabelle",
+        on_select=lambda: open_project(df_view),
+        selection_mode="single-row",
+        height=600,
+        use_container_width=True,
+        hide_index=True
+    )
+
+elif selected_project:
     
-    # A) IST-KOSTEN
-    # Wir suchen exakt nach dem Hauptprojekt oder allem was damit anfängt
-    query_ist = f"""
-    SELECT objekt as psp, einkaufsbeleg as bestellung, bezeichnung as text, "wert/bwähr" as wert, periode
-    FROM ist_kosten 
-    WHERE hauptprojekt = '{selected_project}' OR objekt LIKE '{selected_project}%'
-    """
-    df_ist = pd.read_sql(query_ist, engine)
-
-    # B) OBLIGO
-    try:
-        query_obligo = f"""
-        SELECT objekt as psp, "nr_referenzbeleg" as bestellung, bezeichnung as text_obligo, "wert/bwähr" as obligo_wert
-        FROM obligo_cji5 
-        WHERE hauptprojekt = '{selected_project}' OR objekt LIKE '{selected_project}%'
-        """
-        df_obligo = pd.read_sql(query_obligo, engine)
-    except:
-        # Fallback falls Bezeichnung fehlt
-        query_obligo = f"""
-        SELECT objekt as psp, "nr_referenzbeleg" as bestellung, '' as text_obligo, "wert/bwähr" as obligo_wert
-        FROM obligo_cji5 
-        WHERE hauptprojekt = '{selected_project}' OR objekt LIKE '{selected_project}%'
-        """
-        df_obligo = pd.read_sql(query_obligo, engine)
-
-    # C) BUDGET
-    try:
-        query_budget = f"""
-        SELECT betrag, bezeichnung, "planungelement" as psp_budget
-        FROM vertraege_uebersicht 
-        WHERE "planungelement" LIKE '%{selected_project}%' OR "projektnummer" LIKE '%{selected_project}%'
-        """
-        df_budget = pd.read_sql(query_budget, engine)
-    except:
-        df_budget = pd.DataFrame()
+    st.markdown(f"### Analyse für Projekt: `{selected_project}`")
 
     # ---------------------------------------------------------
-    # 2. KEINE BEREINIGUNG MEHR NÖTIG
+    # 1. DATEN LADEN (gecacht je Projekt und Datenbank-Stand)
     # ---------------------------------------------------------
-    # Da der Importer jetzt Floats liefert, müssen wir hier nichts mehr cleansen.
-    # Zur Sicherheit stellen wir nur sicher, dass es Zahlen sind (falls DB leer war)
-    
-    if not df_ist.empty:
-        df_ist['wert'] = pd.to_numeric(df_ist['wert'], errors='coerce').fillna(0)
-    
-    if not df_obligo.empty:
-        df_obligo['obligo_wert'] = pd.to_numeric(df_obligo['obligo_wert'], errors='coerce').fillna(0)
-    
-    if not df_budget.empty:
-        df_budget['betrag'] = pd.to_numeric(df_budget['betrag'], errors='coerce').fillna(0)
+    with metrics.stage('cockpit.projektdaten', selected_project) as m:
+        data = load_project_data(selected_project, db_version)
+        m['zeilen'] = sum(len(df) for df in data.values())
+    df_kpi = data['kpi']
+    df_psp_stats = data['psp']
+    df_timeline = data['timeline']
 
     # ---------------------------------------------------------
-    # 3. KPI DASHBOARD (GESAMTSUMMEN)
+    # 2. KPI DASHBOARD (GESAMTSUMMEN)
     # ---------------------------------------------------------
 
-    total_ist = df_ist['wert'].sum() if not df_ist.empty else 0.0
-    total_obligo = df_obligo['obligo_wert'].sum() if not df_obligo.empty else 0.0
-    total_budget = df_budget['betrag'].sum() if not df_budget.empty else 0.0
-    verfuegbar = total_budget - (total_ist + total_obligo)
+    totals = queries.project_totals(df_kpi)
+    total_ist, total_obligo, total_budget = totals['ist'], totals['obligo'], totals['budget']
+    verfuegbar = totals['verfuegbar']
 
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Gesamt-Budget", format_currency(total_budget))
@@ -153,29 +285,18 @@ if selected_project:
     st.divider()
 
     # ---------------------------------------------------------
-    # 4. PSP-STRUKTUR ÜBERSICHT
+    # 3. PSP-STRUKTUR ÜBERSICHT
     # ---------------------------------------------------------
     st.subheader("📑 PSP-Elemente im Projekt")
     
-    # Aggregation
-    if not df_ist.empty:
-        psp_ist = df_ist.groupby('psp')['wert'].sum().reset_index()
-    else:
-        psp_ist = pd.DataFrame(columns=['psp', 'wert'])
-        
-    if not df_obligo.empty:
-        psp_obligo = df_obligo.groupby('psp')['obligo_wert'].sum().reset_index()
-    else:
-        psp_obligo = pd.DataFrame(columns=['psp', 'obligo_wert'])
-
-    # Merge
-    df_psp_stats = pd.merge(psp_ist, psp_obligo, on='psp', how='outer').fillna(0)
     df_psp_stats['Gesamtaufwand'] = df_psp_stats['wert'] + df_psp_stats['obligo_wert']
     
-    # Tabelle anzeigen
+    # Tabelle anzeigen (seitenweise, formatiert wird nur die sichtbare Seite)
     if not df_psp_stats.empty:
+        psp_page = page_selector(len(df_psp_stats), key=f"psp_page_{selected_project}")
+        df_psp_page = df_psp_stats.iloc[psp_page * PAGE_SIZE:(psp_page + 1) * PAGE_SIZE]
         st.dataframe(
-            df_psp_stats.rename(columns={'wert': 'Ist', 'obligo_wert': 'Obligo'}).style.format({
+            df_psp_page.rename(columns={'wert': 'Ist', 'obligo_wert': 'Obligo'}).style.format({
                 'Ist': "{:,.2f}", 
                 'Obligo': "{:,.2f}", 
                 'Gesamtaufwand': "{:,.2f}"
@@ -188,156 +309,142 @@ if selected_project:
     st.divider()
 
     # ---------------------------------------------------------
-    # 5. DIAGRAMME & VISUALISIERUNGEN
+    # 4. DIAGRAMME & VISUALISIERUNGEN
     # ---------------------------------------------------------
 
-    # 5A. BUDGET-AMPEL
+    # 4A. BUDGET-AMPEL
     st.subheader("🚥 Budget-Ampel pro PSP-Element")
     
     if not df_psp_stats.empty and total_budget > 0:
-        df_ampel = df_psp_stats.copy()
-        df_ampel['Auslastung %'] = (df_ampel['Gesamtaufwand'] / total_budget * 100)
-        df_ampel = df_ampel.sort_values('Auslastung %', ascending=False)
-        
-        def get_color(prozent):
-            if prozent > 100: return '#d32f2f'  # Rot
-            elif prozent > 80: return '#ffa726'  # Orange
-            else: return '#66bb6a'  # Grün
-        
-        df_ampel['color'] = df_ampel['Auslastung %'].apply(get_color)
-        
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            y=df_ampel['psp'],
-            x=df_ampel['Auslastung %'],
-            orientation='h',
-            marker=dict(color=df_ampel['color']),
-            text=df_ampel['Auslastung %'].apply(lambda x: f"{x:.1f}%"),
-            textposition='outside'
-        ))
-        
-        fig.add_vline(x=100, line_dash="dash", line_color="red")
-        fig.update_layout(title="Budget-Auslastung", height=max(300, len(df_ampel) * 50))
-        st.plotly_chart(fig, use_container_width=True)
+        with metrics.stage('diagramm.ampel') as m:
+            df_ampel = df_psp_stats.copy()
+            df_ampel['Auslastung %'] = (df_ampel['Gesamtaufwand'] / total_budget * 100)
+            df_ampel = df_ampel.sort_values('Auslastung %', ascending=False)
+
+            def get_color(prozent):
+                if prozent > queries.AMPEL_ROT: return '#d32f2f'  # Rot
+                elif prozent > queries.AMPEL_GELB: return '#ffa726'  # Orange
+                else: return '#66bb6a'  # Grün
+
+            df_ampel['color'] = df_ampel['Auslastung %'].apply(get_color)
+
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                y=df_ampel['psp'],
+                x=df_ampel['Auslastung %'],
+                orientation='h',
+                marker=dict(color=df_ampel['color']),
+                text=df_ampel['Auslastung %'].apply(lambda x: f"{x:.1f}%"),
+                textposition='outside'
+            ))
+
+            fig.add_vline(x=100, line_dash="dash", line_color="red")
+            fig.update_layout(title="Budget-Auslastung", height=max(300, len(df_ampel) * 50))
+            st.plotly_chart(fig, use_container_width=True)
+            m['zeilen'] = len(df_ampel)
     else:
         st.info("Keine Budget-Daten für Ampel verfügbar (oder Budget ist 0).")
 
     st.divider()
 
-    # 5B. ZEITVERLAUF
+    # 4B. ZEITVERLAUF
     st.subheader("📈 Kostenentwicklung über Zeit")
     
-    if not df_ist.empty and 'periode' in df_ist.columns:
-        df_timeline = df_ist.groupby('periode')['wert'].sum().reset_index()
-        df_timeline['periode_num'] = pd.to_numeric(df_timeline['periode'], errors='coerce')
-        df_timeline = df_timeline.sort_values('periode_num')
-        df_timeline['Kumuliert'] = df_timeline['wert'].cumsum()
-        
-        fig = go.Figure()
-        fig.add_trace(go.Bar(x=df_timeline['periode'], y=df_timeline['wert'], name='Monatlich', marker_color='lightblue'))
-        fig.add_trace(go.Scatter(x=df_timeline['periode'], y=df_timeline['Kumuliert'], name='Kumuliert', line=dict(color='darkblue', width=3), yaxis='y2'))
-        
-        fig.update_layout(
-            yaxis=dict(title="Monatlich (€)"),
-            yaxis2=dict(title="Kumuliert (€)", overlaying='y', side='right'),
-            hovermode='x unified'
-        )
-        st.plotly_chart(fig, use_container_width=True)
+    if not df_timeline.empty:
+        with metrics.stage('diagramm.zeitverlauf') as m:
+            df_timeline['periode_num'] = pd.to_numeric(df_timeline['periode'], errors='coerce')
+            df_timeline = df_timeline.sort_values('periode_num')
+            df_timeline['Kumuliert'] = df_timeline['wert'].cumsum()
+
+            fig = go.Figure()
+            fig.add_trace(go.Bar(x=df_timeline['periode'], y=df_timeline['wert'], name='Monatlich', marker_color='lightblue'))
+            fig.add_trace(go.Scatter(x=df_timeline['periode'], y=df_timeline['Kumuliert'], name='Kumuliert', line=dict(color='darkblue', width=3), yaxis='y2'))
+
+            fig.update_layout(
+                yaxis=dict(title="Monatlich (€)"),
+                yaxis2=dict(title="Kumuliert (€)", overlaying='y', side='right'),
+                hovermode='x unified'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            m['zeilen'] = len(df_timeline)
     else:
         st.info("Keine Zeitverlaufsdaten verfügbar.")
 
     st.divider()
 
-    # 5C. IST VS OBLIGO
+    # 4C. IST VS OBLIGO
     st.subheader("⚖️ Ist vs. Obligo")
     if total_ist > 0 or total_obligo > 0:
-        fig = go.Figure(data=[go.Pie(
-            labels=['Ist (Bezahlt)', 'Obligo (Offen)'], 
-            values=[total_ist, total_obligo], 
-            hole=0.4,
-            marker=dict(colors=['#1f77b4', '#ff7f0e'])
-        )])
-        st.plotly_chart(fig, use_container_width=True)
+        with metrics.stage('diagramm.ist_obligo'):
+            fig = go.Figure(data=[go.Pie(
+                labels=['Ist (Bezahlt)', 'Obligo (Offen)'], 
+                values=[total_ist, total_obligo], 
+                hole=0.4,
+                marker=dict(colors=['#1f77b4', '#ff7f0e'])
+            )])
+            st.plotly_chart(fig, use_container_width=True)
 
     st.divider()
 
-    # 5D. KOSTENVERTEILUNG PRO BEREICH
+    # 4D. KOSTENVERTEILUNG PRO BEREICH
     st.subheader("📊 Kostenverteilung pro PSP-Bereich")
     if not df_psp_stats.empty:
-        df_psp_viz = df_psp_stats.copy()
-        df_psp_viz['bereich'] = df_psp_viz['psp'].apply(get_bereich_from_psp)
-        
-        df_bereiche = df_psp_viz.groupby('bereich').agg({'wert': 'sum', 'obligo_wert': 'sum'}).reset_index()
-        df_bereiche['Gesamt'] = df_bereiche['wert'] + df_bereiche['obligo_wert']
-        df_bereiche = df_bereiche.sort_values('Gesamt')
-
-        fig = go.Figure()
-        fig.add_trace(go.Bar(y=df_bereiche['bereich'], x=df_bereiche['wert'], name='Ist', orientation='h', marker_color='#1f77b4'))
-        fig.add_trace(go.Bar(y=df_bereiche['bereich'], x=df_bereiche['obligo_wert'], name='Obligo', orientation='h', marker_color='#ff7f0e'))
-        
-        fig.update_layout(barmode='stack', title="Kosten pro Bereich", height=max(300, len(df_bereiche) * 60))
-        st.plotly_chart(fig, use_container_width=True)
+        with metrics.stage('diagramm.bereiche') as m:
+            df_psp_viz = df_psp_stats.copy()
+            df_psp_viz['bereich'] = df_psp_viz['psp'].apply(get_bereich_from_psp)
+
+            df_bereiche = df_psp_viz.groupby('bereich').agg({'wert': 'sum', 'obligo_wert': 'sum'}).reset_index()
+            df_bereiche['Gesamt'] = df_bereiche['wert'] + df_bereiche['obligo_wert']
+            df_bereiche = df_bereiche.sort_values('Gesamt')
+
+            fig = go.Figure()
+            fig.add_trace(go.Bar(y=df_bereiche['bereich'], x=df_bereiche['wert'], name='Ist', orientation='h', marker_color='#1f77b4'))
+            fig.add_trace(go.Bar(y=df_bereiche['bereich'], x=df_bereiche['obligo_wert'], name='Obligo', orientation='h', marker_color='#ff7f0e'))
+
+            fig.update_layout(barmode='stack', title="Kosten pro Bereich", height=max(300, len(df_bereiche) * 60))
+            st.plotly_chart(fig, use_container_width=True)
+            m['zeilen'] = len(df_psp_viz)
 
     st.divider()
 
     # ---------------------------------------------------------
-    # 6. MATRIX (ZUSAMMENGEFASST)
+    # 5. MATRIX (ZUSAMMENGEFASST)
     # ---------------------------------------------------------
     st.subheader("📋 Bestell-Matrix (Zusammengefasst)")
 
-    if not df_ist.empty:
-        # Daten vorbereiten
-        df_ist['bestellung'] = df_ist['bestellung'].fillna('').astype(str).str.strip().replace(['', 'nan', 'None'], 'Sonstiges / Ohne Bestellung')
-        df_ist['text'] = df_ist['text'].fillna('Unbekannt')
-
-        # Pivot Tabelle
-        pivot_ist = df_ist.pivot_table(index='bestellung', columns='periode', values='wert', aggfunc='sum', fill_value=0)
-        pivot_ist['Summe Ist'] = pivot_ist.sum(axis=1)
-        pivot_ist = pivot_ist.reset_index()
-        
-        # Text mapping
-        text_map = df_ist.groupby('bestellung')['text'].first()
-        pivot_ist['text'] = pivot_ist['bestellung'].map(text_map)
-        
-        # Obligo dazu holen
-        if not df_obligo.empty:
-            df_obligo['bestellung'] = df_obligo['bestellung'].fillna('').astype(str).str.strip()
-            grp_obligo = df_obligo.groupby('bestellung').agg({'obligo_wert': 'sum', 'text_obligo': 'first'}).reset_index()
+    if count_orders(selected_project, '', db_version) > 0:
+        # Suche, Sortierung und Blättern laufen in SQL; geladen und formatiert wird nur die sichtbare Seite
+        c_search, c_sort = st.columns([2, 1])
+        search = c_search.text_input("🔍 Bestellung oder Text enthält:", key=f"order_search_{selected_project}")
+        sort = c_sort.selectbox("Sortierung:", list(queries.ORDER_SORTS), key="order_sort")
+
+        n_orders = count_orders(selected_project, search, db_version)
+        if n_orders == 0:
+            st.info("Keine Bestellung passt zum Suchbegriff.")
         else:
-            grp_obligo = pd.DataFrame(columns=['bestellung', 'obligo_wert', 'text_obligo'])
-
-        # Merge
-        final_df = pd.merge(pivot_ist, grp_obligo, on='bestellung', how='outer')
-        final_df = final_df.fillna(0)
-        
-        # Text korrigieren (Falls Ist leer war, nimm Obligo-Text)
-        if 'text' not in final_df.columns: final_df['text'] = ""
-        # Wir müssen sicherstellen, dass 'text_obligo' existiert bevor wir darauf zugreifen
-        if 'text_obligo' in final_df.columns:
-             # Einfacher Weg: Wenn Text 0 oder leer ist, nimm text_obligo
-             final_df['text'] = final_df.apply(lambda row: row['text_obligo'] if (row['text'] == 0 or row['text'] == "") else row['text'], axis=1)
-
-        # Auftragswert
-        final_df['Auftragswert (Kalk.)'] = final_df['Summe Ist'] + final_df['obligo_wert']
-
-        # Sortieren ("Sonstiges" nach unten)
-        final_df['sort_helper'] = final_df['bestellung'].apply(lambda x: 'ZZZ' if 'Sonstiges' in x else x)
-        final_df = final_df.sort_values('sort_helper').drop(columns=['sort_helper'])
-
-        # Spalten für Anzeige
-        display_df = final_df.rename(columns={'obligo_wert': 'Rest-Obligo'})
-        month_cols = sorted([c for c in display_df.columns if str(c).isdigit()], key=lambda x: int(x))
-        cols_order = ['bestellung', 'text'] + month_cols + ['Summe Ist', 'Rest-Obligo', 'Auftragswert (Kalk.)']
-        final_cols = [c for c in cols_order if c in display_df.columns]
-        
-        st.dataframe(
-            display_df[final_cols].style.format(precision=2, thousands=".", decimal=","),
-            height=600,
-            use_container_width=True 
-        )
+            page = page_selector(n_orders, key=f"order_page_{selected_project}_{search}_{sort}")
+            with metrics.stage('matrix.seite', selected_project) as m:
+                page_data = load_order_page(selected_project, page, sort, search, db_version)
+
+                # Matrix nur für die Bestellungen dieser Seite, Monatsspalten wie im ganzen Projekt
+                display_df = build_order_matrix(page_data['orders_ist'], page_data['orders_obligo'],
+                                                order=page_data['orders'], periods=df_timeline['periode'])
+                m['zeilen'] = len(display_df)
+
+            first_row = page * PAGE_SIZE + 1
+            st.caption(f"Bestellungen {first_row}–{first_row + len(display_df) - 1} von {n_orders}")
+            st.dataframe(
+                display_df.style.format(precision=2, thousands=".", decimal=","),
+                height=600,
+                use_container_width=True,
+                hide_index=True
+            )
 
     else:
         st.info("Bitte wählen Sie ein Projekt aus (oder keine Daten vorhanden).")
 
 else:
-    st.info("👈 Bitte wählen Sie ein Projekt in der Seitenleiste aus.")
\ No newline at end of file
+    st.info("👈 Bitte wählen Sie ein Projekt in der Seitenleiste aus.")
+
+# Messwerte dieses Durchlaufs lokal speichern (siehe metrics.py)
+metrics.flush(os.path.dirname(db_path))
\ No newline at end of file
@@ -0,0 +1,147 @@
+import os
+import shutil
+
+import pandas as pd
+
+# --- SPALTENORIENTIERTER SPEICHER (OPTIONAL) ---
+# Neben finanzdaten.db kann der Importer Ist- und Obligo-Zeilen zusätzlich als Parquet-Dataset
+# ablegen, partitioniert nach 'hauptprojekt'. Das Cockpit liest dann pro Projektwechsel nur die
+# Partition des Projekts und nur die benötigten Spalten (statt ganzer Zeilen breiter SAP-Tabellen).
+#
+# Auswahl über die Umgebungsvariable COCKPIT_STORAGE:
+#   sqlite  (Standard)  Dashboard liest die Summen-Tabellen aus finanzdaten.db
+#   parquet             Importer schreibt zusätzlich 'finanzdaten_parquet/', Dashboard liest daraus
+# Benötigt pyarrow (kommt mit Streamlit mit).
+
+STORAGE_BACKEND = os.environ.get('COCKPIT_STORAGE', 'sqlite').lower()
+PARQUET_DIR_NAME = 'finanzdaten_parquet'
+
+# Welche Tabellen mit welchen Spalten exportiert werden (nur was das Cockpit braucht)
+EXPORT_COLUMNS = {
+    'ist_kosten': ['objekt', 'wert/bwähr', 'periode'],
+    'obligo_cji5': ['objekt', 'wert/bwähr'],
+}
+PARTITION_COLUMN = 'hauptprojekt'
+VALUE_COLUMN = 'wert/bwähr'
+EXPORT_CHUNK_SIZE = 500_000
+
+def parquet_dir(base_dir):
+    return os.path.join(base_dir, PARQUET_DIR_NAME)
+
+
+def export_from_sqlite(conn, out_dir):
+    """
+    Schreibt Ist/Obligo aus SQLite als Parquet-Dataset (Hive-Partitionen je Hauptprojekt)
+    plus die kleine Projekt-Summentabelle. Es wird erst in ein Nachbarverzeichnis geschrieben
+    und dann umbenannt, das Cockpit sieht also nie ein halb geschriebenes Dataset.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    tmp_dir = out_dir + '.neu'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table_name, wanted in EXPORT_COLUMNS.items():
+        if table_name not in existing:
+            continue
+        table_cols = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table_name}")')}
+        # rowid als 'rid' mitnehmen: damit bleibt die Zeilenreihenfolge der Datenbank erhalten
+        select_cols = ['rowid AS rid', f'"{PARTITION_COLUMN}"'] + [
+            f'"{c}"' if c in table_cols else f'NULL AS "{c}"' for c in wanted
+        ]
+        # Nach Projekt sortiert (Index auf hauptprojekt): so wird jede Partition am Stück und in genau
+        # eine Datei geschrieben, statt je Block eine weitere kleine Datei in jedes Projekt zu legen
+        sql = (f'SELECT {", ".join(select_cols)} FROM "{table_name}" WHERE "{PARTITION_COLUMN}" IS NOT NULL '
+               f'ORDER BY "{PARTITION_COLUMN}", rowid')
+
+        # Feste Typen, damit Blöcke mit lauter leeren Werten das Schema nicht verändern
+        schema = pa.schema([('rid', pa.int64()), (PARTITION_COLUMN, pa.string())] + [
+            (c, pa.float64() if c == VALUE_COLUMN else pa.string()) for c in wanted
+        ])
+
+        def batches():
+            for chunk in pd.read_sql(sql, conn, chunksize=EXPORT_CHUNK_SIZE):
+                for col in wanted:
+                    if col != VALUE_COLUMN:
+                        chunk[col] = chunk[col].astype('str')  # leere Werte bleiben leer
+                yield from pa.Table.from_pandas(chunk, schema=schema, preserve_index=False).to_batches()
+
+        ds.write_dataset(
+            batches(),
+            os.path.join(tmp_dir, table_name),
+            schema=schema,
+            format='parquet',
+            partitioning=_partitioning(),
+            basename_template='teil-{i}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+        )
+
+    # Projekt-Summen (Liste + Budget) sind klein -> eine Datei
+    if 'agg_projekt' in existing:
+        pd.read_sql('SELECT * FROM agg_projekt', conn).to_parquet(os.path.join(tmp_dir, 'agg_projekt.parquet'), index=False)
+
+    old_dir = out_dir + '.alt'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    # Projektnummern immer als Text (sonst würde "12345" als Zahl erkannt)
+    return ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor='hive')
+
+
+def _read_partition(root, table_name, project, columns):
+    """Liest nur die Partition eines Projekts und nur die angegebenen Spalten."""
+    import pyarrow.dataset as ds
+
+    path = os.path.join(root, table_name)
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=['rid'] + columns)
+    dataset = ds.dataset(path, format='parquet', partitioning=_partitioning())
+    table = dataset.to_table(columns=['rid'] + columns, filter=ds.field(PARTITION_COLUMN) == project)
+    return table.to_pandas().sort_values('rid', kind='stable')
+
+
+def load_project_data(root, project):
+    """
+    Gleiche Rückgabe wie queries.load_project_data, aber aus dem Parquet-Dataset:
+    Ist/Obligo-Zeilen des Projekts lesen und die Summen direkt spaltenweise bilden.
+    (Die Bestell-Matrix blättert immer seitenweise in SQLite, siehe queries.load_order_page.)
+    """
+    ist = _read_partition(root, 'ist_kosten', project, EXPORT_COLUMNS['ist_kosten'])
+    obligo = _read_partition(root, 'obligo_cji5', project, EXPORT_COLUMNS['obligo_cji5'])
+    ist_wert = pd.to_numeric(ist[VALUE_COLUMN], errors='coerce').fillna(0.0).astype(float)
+    obligo_wert = pd.to_numeric(obligo[VALUE_COLUMN], errors='coerce').fillna(0.0).astype(float)
+
+    data = {}
+
+    # A) KPI-SUMMEN (Budget kommt aus der Projekt-Summentabelle des Importers)
+    budget = 0.0
+    agg_path = os.path.join(root, 'agg_projekt.parquet')
+    if os.path.exists(agg_path):
+        agg = pd.read_parquet(agg_path, columns=['hauptprojekt', 'budget'], filters=[('hauptprojekt', '==', project)])
+        budget = float(agg['budget'].sum())
+    if ist.empty and obligo.empty:
+        data['kpi'] = pd.DataFrame(columns=['ist', 'obligo', 'budget'])
+    else:
+        data['kpi'] = pd.DataFrame({'ist': [ist_wert.sum()], 'obligo': [obligo_wert.sum()], 'budget': [budget]})
+
+    # B) PSP-ELEMENTE
+    psp = pd.concat([
+        pd.DataFrame({'psp': ist['objekt'], 'wert': ist_wert, 'obligo_wert': 0.0}),
+        pd.DataFrame({'psp': obligo['objekt'], 'wert': 0.0, 'obligo_wert': obligo_wert}),
+    ])
+    data['psp'] = psp.groupby('psp', sort=True)[['wert', 'obligo_wert']].sum().reset_index()
+
+    # C) ZEITVERLAUF
+    data['timeline'] = (pd.DataFrame({'periode': ist['periode'], 'wert': ist_wert})
+                        .groupby('periode', sort=False)['wert'].sum().reset_index())
+
+    return data
@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+import metrics
+
+# --- GEMEINSAMER DATENSPEICHER FÜR ALLE COCKPIT-SITZUNGEN ---
+# Jede Browser-Sitzung führt app.py für sich aus. Ohne gemeinsamen Speicher liefen Engine,
+# Projektliste und Projekt-Summen je Sitzung neu, und st.cache_data gibt jeder Sitzung eine
+# eigene Kopie (Pickle) der DataFrames: 30 Sitzungen = 30 Kopien.
+# Der DataService gibt es einmal pro Prozess (st.cache_resource in app.py):
+# - Einträge gelten für eine Import-Generation (PRAGMA user_version). Sieht der Dienst eine neuere,
+#   verwirft er alle alten Einträge; Anfragen mit einer älteren werden berechnet, aber nicht gespeichert.
+# - Sitzungen bekommen Sichten (DataFrame.copy(deep=False)) auf dieselben Daten. Mit Copy-on-Write
+#   (ab pandas 3 immer aktiv, daher pandas>=3 in requirements.txt) kopiert erst ein Schreibzugriff,
+#   und nur in der Sicht der schreibenden Sitzung. Ohne CoW würden Schreibzugriffe den Cache ändern.
+# - Je Schlüssel ein Lock: fragen mehrere Sitzungen gleichzeitig dasselbe Projekt an, rechnet
+#   nur die erste, die anderen warten und bekommen ihr Ergebnis.
+
+# Höchstzahl Einträge je Art (älteste zuerst raus), nicht genannte Arten: DEFAULT_MAX_ENTRIES
+MAX_ENTRIES = {
+    'projekte': 1,
+    'portfolio': 1,
+    'projektdaten': 50,
+}
+DEFAULT_MAX_ENTRIES = 200
+
+
+def read_only_view(value):
+    """Sicht ohne Kopie: DataFrames/Series flach kopiert (gemeinsame Daten), dicts/Listen neu verpackt."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, dict):
+        return {name: read_only_view(item) for name, item in value.items()}
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+class DataService:
+    """Engine und geladene Frames eines Prozesses, geteilt über alle Sitzungen."""
+
+    def __init__(self, db_path, max_entries=None):
+        self.db_path = db_path
+        self.engine = create_engine(f'sqlite:///{db_path}')
+        self.max_entries = {**MAX_ENTRIES, **(max_entries or {})}
+        self._lock = threading.Lock()
+        self._generation = None
+        self._entries = {}    # Art -> OrderedDict(Schlüssel -> Wert), zuletzt benutzt hinten
+        self._key_locks = {}  # (Art, Schlüssel) -> Lock für die Berechnung
+        self.stats = {'treffer': 0, 'berechnet': 0}
+
+    def generation(self):
+        """Import-Generation der Datenbank (PRAGMA user_version), -1 ohne Datenbank."""
+        if not os.path.exists(self.db_path):
+            return -1
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+    def _lookup(self, generation, kind, key):
+        """Gespeicherten Wert holen (None = fehlt); eine neuere Generation leert vorher alles."""
+        if self._generation is None or generation > self._generation:
+            self._generation = generation
+            self._entries.clear()
+            self._key_locks.clear()
+        entries = self._entries.get(kind)
+        if generation != self._generation or entries is None or key not in entries:
+            return None
+        entries.move_to_end(key)
+        return entries[key]
+
+    def get(self, generation, kind, key, loader):
+        """
+        Wert für (Art, Schlüssel) der Generation; beim ersten Zugriff berechnet loader() ihn genau
+        einmal, auch wenn mehrere Sitzungen gleichzeitig fragen. Rückgabe ist immer eine Sicht.
+        """
+        with self._lock:
+            value = self._lookup(generation, kind, key)
+            if value is not None:
+                self.stats['treffer'] += 1
+                return read_only_view(value)
+            key_lock = self._key_locks.setdefault((kind, key), threading.Lock())
+
+        with key_lock:
+            # Während des Wartens hat evtl. eine andere Sitzung fertig gerechnet
+            with self._lock:
+                value = self._lookup(generation, kind, key)
+                if value is not None:
+                    self.stats['treffer'] += 1
+                    return read_only_view(value)
+            with metrics.stage(f'dienst.{kind}'):
+                value = loader()
+            with self._lock:
+                self.stats['berechnet'] += 1
+                if generation == self._generation:
+                    entries = self._entries.setdefault(kind, OrderedDict())
+                    entries[key] = value
+                    while len(entries) > self.max_entries.get(kind, DEFAULT_MAX_ENTRIES):
+                        entries.popitem(last=False)
+                    self._key_locks.pop((kind, key), None)
+        return read_only_view(value)
+
+    def size(self):
+        """Anzahl gespeicherter Einträge je Art (für das Performance-Panel)."""
+        with self._lock:
+            return {kind: len(entries) for kind, entries in self._entries.items()}
@@ -1,32 +1,34 @@
 import pandas as pd
-from sqlalchemy import create_engine
+import numpy as np
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
 import os
 import glob
+import hashlib
+import re
+import sqlite3
+import argparse
+import time
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 import sentry_sdk 
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+import columnar_store
+import excel_reader
+import metrics
 
 # --- SENTRY MONITORING ---
 # Für Abgabe via ZIP ist der Key hardcodiert
 sentry_sdk.init(
     dsn="https://b9a777fa97d28f7260385b4052a44486@o4510688530137088.ingest.de.sentry.io/4510688535576656",
-    traces_sample_rate=1.0, # Erfasst 100% der Transaktionen für Debugging
+    # Nur Fehler melden; Laufzeiten werden lokal gemessen (metrics.py). Tracing bei Bedarf per Umgebungsvariable.
+    traces_sample_rate=float(os.environ.get('SENTRY_TRACES_SAMPLE_RATE', '0')),
 )
 
-def run_import():
-        base_dir = os.path.dirname(os.path.dirname(__file__))
-        db_path = os.path.join(base_dir, DB_NAME)
-        
-        # --- ALTE DATENBANK LÖSCHEN ---
-        if os.path.exists(db_path):
-            try:
-                os.remove(db_path)
-                print(f"🗑️  Alte Datenbank gelöscht: {db_path}")
-            except PermissionError:
-                print("❌ FEHLER: Die Datenbank ist noch geöffnet! Bitte schließe Streamlit/VS Code.")
-                return
-        # -------------------------------
-
-        engine = create_engine(f'sqlite:///{db_path}')
-
 # --- 1. Hilfsfunktion (Wichtig: Repariert deutsche Zahlenformate) ---
 def clean_currency_string(value):
     """
@@ -54,6 +56,65 @@ def clean_currency_string(value):
     except ValueError:
         return 0.0
 
+# Syntax, die float() ohne Sonderfälle versteht (ASCII-Ziffern, optional Exponent).
+_PLAIN_NUMBER_PATTERN = r'[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?'
+# Zeichen, die float() darüber hinaus akzeptiert (z.B. "1_000", "nan", "١٢٣").
+# Nur solche Zellen laufen noch über die langsame Einzelzellen-Funktion.
+_SCALAR_FALLBACK_PATTERN = '[_\u0080-\U0010ffff]|nan|inf'
+# ASCII-Leerraum, den float() am Rand ignoriert (\x1c-\x1f entfernt str.strip(), float() aber nicht)
+_FLOAT_WHITESPACE = ' \t\n\r\x0b\x0c'
+
+def clean_currency_series(series):
+    """
+    Spaltenweise Variante von clean_currency_string (gleiche Ergebnisse, aber vektorisiert).
+    Statt eines Python-Aufrufs pro Zelle arbeiten Pandas-String-Operationen auf der ganzen Spalte.
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype(float).fillna(0.0)
+
+    result = np.zeros(len(series))
+
+    missing = series.isna().to_numpy(dtype=bool)
+    if missing.all():
+        return pd.Series(result, index=series.index, name=series.name)
+    positions = np.flatnonzero(~missing)
+    present = series.iloc[positions].reset_index(drop=True)
+
+    # Nicht-Strings (int/float aus Excel) sind selten -> direkt skalar umrechnen
+    if not isinstance(present.dtype, pd.StringDtype) and pd.api.types.infer_dtype(present, skipna=False) != 'string':
+        is_str = present.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        result[positions[~is_str]] = [clean_currency_string(v) for v in present[~is_str]]
+        positions = positions[is_str]
+        present = present[is_str].reset_index(drop=True)
+
+    # String-Dtype statt object: die .str-Operationen laufen dann in C statt pro Zelle in Python
+    text = present.astype(pd.StringDtype()).str.strip()
+
+    # Deutsches Format: 1.000,00 -> Tausender-Punkte weg, Komma zu Punkt
+    has_comma = text.str.contains(',', regex=False).to_numpy(dtype=bool)
+    if has_comma.any():
+        german = text[has_comma].str.replace('.', '', regex=False).str.replace(',', '.', regex=False).str.strip(_FLOAT_WHITESPACE)
+        text = text.where(~has_comma, german)
+
+    # Gültige Zahlen werden in einem Rutsch gecastet (gleiche Rundung wie float()),
+    # alles andere ist Müll -> 0.0
+    parsed = np.zeros(len(text))
+    plain = text.str.fullmatch(_PLAIN_NUMBER_PATTERN).to_numpy(dtype=bool)
+    if plain.any():
+        parsed[plain] = text[plain].astype('float64').to_numpy()
+
+    # Sonderfälle, die float() trotzdem versteht -> Einzelzellen-Fallback, mit dem Original-Wert
+    # (nicht dem schon umgeformten Text, sonst weicht das Ergebnis von clean_currency_string ab)
+    rest = np.flatnonzero(~plain)
+    if len(rest):
+        suspicious = text.iloc[rest].str.contains(_SCALAR_FALLBACK_PATTERN, case=False, regex=True).to_numpy(dtype=bool)
+        retry = rest[suspicious]
+        if len(retry):
+            parsed[retry] = [clean_currency_string(v) for v in present.iloc[retry]]
+
+    result[positions] = parsed
+    return pd.Series(result, index=series.index, name=series.name)
+
 # --- 2. Konfiguration ---
 DB_NAME = 'finanzdaten.db'
 
@@ -71,69 +132,888 @@ FILE_MAPPING = [
     ('Plausi-Check', 'plausi_ref', 7)
 ]
 
-# --- 3. Hauptlogik ---
-def run_import():
-    # Pfade bestimmen
-    base_dir = os.path.dirname(os.path.dirname(__file__))
-    db_path = os.path.join(base_dir, DB_NAME)
-    data_dir = os.path.join(base_dir, 'data')
+MANIFEST_TABLE = 'import_manifest'
+
+# Zeilen pro Block beim Einlesen großer CSVs (0 = ganze Datei auf einmal)
+CHUNK_SIZE = 200_000
 
+# Spalten-Schema je Quelle (Tabellenname aus FILE_MAPPING): {Spalte wie in der Datenbank: Typ}
+#   'betrag'     Geldbetrag, deutsches Zahlenformat   -> float64 / REAL
+#   'kategorie'  wiederkehrende Werte (PSP, Periode)  -> category (jeder Wert einmal im Speicher) / TEXT
+#   'text'       freier Text                          -> str / TEXT
+# Gelesen werden nur diese Spalten (CSV: usecols, Excel: nur diese Zellen); fehlt eine in der Datei,
+# bleibt sie einfach weg. Quellen ohne Schema: alle Spalten als Text, Beträge über FINANCE_KEYWORDS.
+SOURCE_SCHEMAS = {
+    'ist_kosten': {
+        'objekt': 'kategorie', 'periode': 'kategorie', 'geschäftsjahr': 'kategorie',
+        'einkaufsbeleg': 'kategorie', 'bezeichnung': 'kategorie', 'wert/bwähr': 'betrag',
+    },
+    'obligo_cji5': {
+        'objekt': 'kategorie', 'nr_referenzbeleg': 'kategorie', 'bezeichnung': 'kategorie',
+        'wert/bwähr': 'betrag',
+    },
+    # Die LV-Übersicht wird nur für Budget und Projektsuche gebraucht (build_aggregates)
+    'vertraege_uebersicht': {
+        'lv-nummer': 'text', 'bezeichnung': 'text', 'planungelement': 'text', 'projektnummer': 'text',
+        'betrag': 'betrag',
+    },
+}
+# Eingelesene Excel-Dateien als Parquet neben der Datenbank zwischenspeichern (siehe excel_reader)
+EXCEL_CACHE = True
+
+# Perioden-Lieferungen (eine Datei je Monat): statt die Tabelle zu ersetzen, werden nur die Zeilen
+# der gelieferten Datei ersetzt, frühere Lieferungen bleiben stehen (auch wenn ihre Datei fehlt).
+# Jede Datei hat eine Lieferperiode: aus dem Dateinamen (PERIOD_PATTERNS, z.B. 'CON_per_2025_03.csv'),
+# sonst die häufigste Periode ihrer Zeilen laut {Tabelle: Spalten, die zusammen die Periode ergeben}.
+# Nachbuchungen für frühere Perioden gehören zu der Lieferung, in der sie kommen. Hat eine Datei der
+# Tabelle weder das eine noch das andere, wird die Tabelle wie früher komplett aus allen Dateien neu
+# aufgebaut (Zeilen ohne Lieferperiode), ebenso bei --force: dann fallen auch Perioden weg, deren Datei fehlt.
+PERIOD_SOURCES = {
+    'ist_kosten': ['geschäftsjahr', 'periode'],
+    'journal_con': ['geschäftsjahr', 'periode'],
+    'journal_sobj': ['geschäftsjahr', 'periode'],
+}
+PERIOD_COLUMN = 'lieferperiode'
+SOURCE_FILE_COLUMN = 'lieferdatei'
+# Temporäre Tabelle mit den Projekten, die ein Delta-Import berührt hat (nur deren Summen werden neu berechnet)
+DELTA_PROJECTS_TABLE = 'delta_projekte'
+PERIOD_PATTERNS = [
+    r'(?<!\d)(?P<jahr>20\d{2})[-_.]?(?P<monat>0[1-9]|1[0-2])(?!\d)',  # 2025_03, 2025-03, 202503
+    r'(?<!\d)(?P<monat>0[1-9]|1[0-2])[-_.]?(?P<jahr>20\d{2})(?!\d)',  # 03_2025, per03.2025
+]
+
+# Spalten, auf die das Dashboard filtert (Hauptprojekt, PSP, Periode, Bestell-Referenzen)
+# und die Lieferung (Ersetzen einer Lieferung beim Delta-Import)
+INDEX_COLUMNS = ['hauptprojekt', 'objekt', 'periode', 'einkaufsbeleg', 'nr_referenzbeleg',
+                 PERIOD_COLUMN, SOURCE_FILE_COLUMN]
+
+# Betragsspalte in CJI3/CJI5 und Sammel-Bestellung für Ist ohne Bestellbezug
+VALUE_COLUMN = 'wert/bwähr'
+NO_ORDER_LABEL = 'Sonstiges / Ohne Bestellung'
+
+# Vorberechnete Summen, aus denen das Dashboard liest (siehe build_aggregates)
+AGGREGATE_TABLES = ['agg_projekt', 'agg_psp', 'agg_periode', 'agg_bestellung_ist', 'agg_bestellung_obligo',
+                    'agg_bestellung']
+# Volltext-Index (FTS5, Trigramme) für die Projektsuche der Seitenleiste
+PROJECT_SEARCH_TABLE = 'projekt_suche'
+# Beschreibung eines Projekts = seine LV-Bezeichnungen, gekürzt auf diese Länge
+DESCRIPTION_LENGTH = 200
+# Zusätzliche Indizes für die seitenweise Bestell-Matrix: je Sortierung ein abdeckender Index
+# in genau der ORDER-BY-Reihenfolge (inkl. bestellung/text für die Suche), damit auch die
+# letzte Seite ohne Sortieren und ohne Tabellenzugriff gefunden wird
+AGGREGATE_INDEXES = {
+    'agg_bestellung_ist': {'bestellung': 'hauptprojekt, bestellung'},
+    'agg_bestellung_obligo': {'bestellung': 'hauptprojekt, bestellung'},
+    'agg_bestellung': {
+        'sortierung': 'hauptprojekt, sortierung, bestellung, text',
+        'ist': 'hauptprojekt, ist DESC, sortierung, bestellung, text',
+        'obligo': 'hauptprojekt, obligo DESC, sortierung, bestellung, text',
+        'auftragswert': 'hauptprojekt, auftragswert DESC, sortierung, bestellung, text',
+    },
+}
+AGGREGATE_SOURCES = ['ist_kosten', 'obligo_cji5', 'vertraege_uebersicht']
+
+# Anzahl paralleler Parser-Prozesse (1 = alles nacheinander im Hauptprozess)
+IMPORT_WORKERS = 1
+
+# ANALYZE liest je Index nur so viele Einträge (Näherung statt voller Scan, Dauer unabhängig von der Historie)
+ANALYSIS_LIMIT = 1000
+
+# Journal-Modus: mit WAL liest das Cockpit während eines Imports ungestört weiter und sieht
+# bis zum Commit den alten Stand. Liegt die DB auf einem Netzlaufwerk, 'DELETE' verwenden.
+JOURNAL_MODE = 'WAL'
+
+# Watch-Modus (--watch): so viele Sekunden Ruhe in 'data/', bevor importiert wird
+WATCH_DEBOUNCE = 3.0
+WATCH_POLL = 0.5
+# Nur Ereignisse, die eine Datei verändern (Lesen löst unter Linux 'opened'/'closed_no_write' aus)
+WATCH_EVENTS = {'created', 'modified', 'moved', 'deleted', 'closed'}
+
+# Spalten, die als Geldbeträge bereinigt werden
+FINANCE_KEYWORDS = ['wert', 'betrag', 'kosten', 'obligo', 'budget', 'auftragswert']
+
+# --- 3. Bausteine ---
+def create_db_engine(db_path):
+    """
+    SQLite-Engine, bei der auch DROP/CREATE TABLE Teil der Transaktion sind.
+    (pysqlite startet Transaktionen sonst erst beim ersten INSERT.)
+    Schaltet außerdem den Journal-Modus um (WAL bleibt in der Datei gespeichert, gilt also auch fürs Cockpit).
+    """
     engine = create_engine(f'sqlite:///{db_path}')
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        try:
+            dbapi_connection.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+        except sqlite3.OperationalError:
+            pass  # Umschalten braucht kurz exklusiven Zugriff; klappt dann beim nächsten Verbinden
+
+    @event.listens_for(engine, "begin")
+    def _begin_transaction(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return engine
+
+def find_source(filename):
+    """Liefert (Tabellenname, Header-Zeile) für eine Datei oder None, wenn sie nicht importiert wird."""
+    for pattern, table_name, header_row in FILE_MAPPING:
+        if pattern.lower() in filename.lower() and filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+            return table_name, header_row
+    return None
+
+# Lese-Typ je Schema-Typ (Beträge kommen als Text und werden in clean_frame umgerechnet)
+_READ_DTYPES = {'betrag': 'str', 'kategorie': 'category', 'text': 'str'}
+
+def read_source(filepath, header_row, chunksize=None, schema=None, cache_base=None, file_hash=None):
+    """
+    Datei einlesen (CSV mit Strichpunkt, Excel normal) und als Folge von DataFrames liefern.
+    CSVs werden bei gesetzter chunksize stückweise gelesen, damit der Speicher begrenzt bleibt.
+    Mit 'schema' (siehe SOURCE_SCHEMAS) nur dessen Spalten, Kategorie-Spalten einer CSV gleich als category.
+    .xlsx wird zeilenweise gestreamt (siehe excel_reader) und in cache_base zwischengespeichert
+    (Schlüssel: file_hash aus dem Manifest, ohne ihn wird die Datei dafür gehasht).
+    """
+    wanted = (lambda name: excel_reader.column_key(name) in schema) if schema else None
+    if filepath.lower().endswith('.xlsx'):
+        yield from excel_reader.read_workbook(filepath, header_row, list(schema) if schema else None,
+                                              chunksize, cache_base, file_hash)
+        return
+    if filepath.lower().endswith('.xls'):
+        # Altes Excel-Format: openpyxl kann es nicht lesen
+        yield pd.read_excel(filepath, header=header_row, dtype=str, usecols=wanted)
+        return
+    # WICHTIG: thousands=None verhindert, dass Pandas Punkte falsch interpretiert
+    options = dict(header=header_row, sep=';', encoding='latin1', thousands=None)
+    usecols, dtype = None, str
+    if schema:
+        # Die Original-Spaltennamen stehen erst in der Kopfzeile
+        header = pd.read_csv(filepath, nrows=0, **options).columns
+        usecols = [name for name in header if wanted(name)]
+        dtype = {name: _READ_DTYPES[schema[excel_reader.column_key(name)]] for name in usecols}
+    reader = pd.read_csv(filepath, usecols=usecols, dtype=dtype, chunksize=chunksize or None, **options)
+    if not chunksize:
+        yield reader
+        return
+    with reader:
+        yield from reader
+
+def main_project(objekt):
+    """
+    Hauptprojekt aus dem PSP-Element: "G.011803001.02.02" -> "G.011803001".
+    Bei einer category-Spalte wird nur jede verschiedene Kategorie gekürzt, das Ergebnis ist wieder category.
+    """
+    if not isinstance(objekt.dtype, pd.CategoricalDtype):
+        return objekt.astype(str).str[:11]
+    prefix_codes, prefixes = pd.factorize(objekt.cat.categories.astype(str).str[:11])
+    codes = objekt.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, prefix_codes[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, prefixes), index=objekt.index)
+
+def clean_frame(df, filename=None, schema=None):
+    """Spalten normalisieren, Typen laut Schema setzen, Finanz-Spalten bereinigen und 'hauptprojekt' ableiten."""
+    with metrics.stage('import.normalisieren', filename) as m:
+        # Spaltennamen normalisieren (alles klein, keine Leerzeichen)
+        df.columns = [excel_reader.column_key(c) for c in df.columns]
+        if schema:
+            for col in df.columns:
+                if schema.get(col) == 'kategorie':
+                    df[col] = df[col].astype('category')
+
+        # Hauptprojekt-Spalte erzeugen (für die Gruppierung im Dashboard)
+        if 'objekt' in df.columns:
+            df['hauptprojekt'] = main_project(df['objekt'])
+        m['zeilen'] = len(df)
+
+    # Finanz-Spalten bereinigen (laut Schema, sonst nach Spaltennamen)
+    with metrics.stage('import.waehrung', filename) as m:
+        for col in df.columns:
+            if (schema.get(col) == 'betrag') if schema else any(kw in col for kw in FINANCE_KEYWORDS):
+                df[col] = clean_currency_series(df[col])
+        m['zeilen'] = len(df)
+    return df
+
+def file_fingerprint(filepath, known=None):
+    """
+    Größe, mtime und SHA-256 einer Datei.
+    Stimmen Größe und mtime mit dem bekannten Eintrag überein, wird der Hash nicht neu berechnet.
+    """
+    stat = os.stat(filepath)
+    if known is not None and known['groesse'] == stat.st_size and known['mtime'] == stat.st_mtime:
+        return {'groesse': stat.st_size, 'mtime': stat.st_mtime, 'hash': known['hash']}
+
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(block)
+    return {'groesse': stat.st_size, 'mtime': stat.st_mtime, 'hash': sha.hexdigest()}
+
+def load_manifest(conn):
+    """Liest das Import-Manifest: {Dateiname: {'tabelle', 'groesse', 'mtime', 'hash'}}"""
+    conn.exec_driver_sql(f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            datei TEXT PRIMARY KEY,
+            tabelle TEXT NOT NULL,
+            groesse INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            hash TEXT NOT NULL,
+            importiert_am TEXT NOT NULL
+        )
+    """)
+    rows = conn.exec_driver_sql(f"SELECT datei, tabelle, groesse, mtime, hash FROM {MANIFEST_TABLE}").fetchall()
+    return {r[0]: {'tabelle': r[1], 'groesse': r[2], 'mtime': r[3], 'hash': r[4]} for r in rows}
+
+def save_manifest_entry(conn, filename, table_name, fingerprint):
+    conn.exec_driver_sql(
+        f"INSERT OR REPLACE INTO {MANIFEST_TABLE} (datei, tabelle, groesse, mtime, hash, importiert_am) "
+        "VALUES (?, ?, ?, ?, ?, datetime('now'))",
+        (filename, table_name, fingerprint['groesse'], fingerprint['mtime'], fingerprint['hash'])
+    )
+
+# --- 4. Aggregat-Tabellen für das Dashboard ---
+def _table_columns(conn, table_name):
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({_quote(table_name)})")}
+
+def _column_or(columns, name, default='NULL'):
+    return _quote(name) if name in columns else default
+
+def _aggregate_sources(conn, scope=''):
+    """
+    SELECTs auf Ist- und Obligo-Zeilen in einheitlicher Form (wie sie app.py bisher geladen hat).
+    Fehlende Tabellen/Spalten werden zu leeren Ergebnissen bzw. NULL, statt den Import abzubrechen.
+    'scope' schränkt auf Projekte ein (WHERE-Bedingung auf hauptprojekt, siehe build_aggregates).
+    """
+    ist_cols = _table_columns(conn, 'ist_kosten')
+    if ist_cols:
+        bestellung = f"TRIM(COALESCE(CAST({_column_or(ist_cols, 'einkaufsbeleg')} AS TEXT), ''))"
+        ist_src = f"""
+            SELECT hauptprojekt, objekt AS psp,
+                   CASE WHEN {bestellung} IN ('', 'nan', 'None') THEN '{NO_ORDER_LABEL}' ELSE {bestellung} END AS bestellung,
+                   COALESCE({_column_or(ist_cols, 'bezeichnung')}, 'Unbekannt') AS text,
+                   {_column_or(ist_cols, 'periode')} AS periode,
+                   {_column_or(ist_cols, VALUE_COLUMN, '0.0')} AS wert,
+                   rowid AS rid
+            FROM ist_kosten {scope}"""
+    else:
+        ist_src = "SELECT NULL AS hauptprojekt, NULL AS psp, NULL AS bestellung, NULL AS text, NULL AS periode, 0.0 AS wert, 0 AS rid WHERE 0"
+
+    obligo_cols = _table_columns(conn, 'obligo_cji5')
+    if obligo_cols:
+        obligo_src = f"""
+            SELECT hauptprojekt, objekt AS psp,
+                   TRIM(COALESCE(CAST({_column_or(obligo_cols, 'nr_referenzbeleg')} AS TEXT), '')) AS bestellung,
+                   {_column_or(obligo_cols, 'bezeichnung', "''")} AS text_obligo,
+                   {_column_or(obligo_cols, VALUE_COLUMN, '0.0')} AS wert,
+                   rowid AS rid
+            FROM obligo_cji5 {scope}"""
+    else:
+        obligo_src = "SELECT NULL AS hauptprojekt, NULL AS psp, NULL AS bestellung, NULL AS text_obligo, 0.0 AS wert, 0 AS rid WHERE 0"
+
+    return ist_src, obligo_src
+
+def build_aggregates(conn, projects=None):
+    """
+    Baut die Summen-Tabellen neu auf, aus denen das Dashboard liest:
+      agg_projekt            Ist/Obligo/Budget je Hauptprojekt (+ Beschreibung aus den LV-Bezeichnungen)
+      agg_psp                Ist/Obligo je PSP-Element
+      agg_periode            Ist je Periode
+      agg_bestellung_ist     Ist je Bestellung und Periode (+ Text der Bestellung)
+      agg_bestellung_obligo  Obligo je Bestellung (+ Obligo-Text)
+      agg_bestellung         eine Zeile je Bestellung (Ist, Obligo, Auftragswert, Sortierschlüssel)
+    Läuft in der Import-Transaktion, die Summen passen also immer zu den Rohdaten.
+    Mit 'projects' (Name einer Tabelle mit Spalte hauptprojekt) werden nur die Zeilen dieser Projekte
+    ersetzt, alle anderen bleiben stehen (Delta-Import, siehe write_periods).
+    """
+    scope = f"WHERE hauptprojekt IN (SELECT hauptprojekt FROM {projects})" if projects else ''
+    ist_src, obligo_src = _aggregate_sources(conn, scope)
+    both = f"""
+        SELECT hauptprojekt, psp, wert AS ist, 0.0 AS obligo FROM ({ist_src})
+        UNION ALL
+        SELECT hauptprojekt, psp, 0.0 AS ist, wert AS obligo FROM ({obligo_src})"""
+
+    statements = {
+        'agg_projekt': f"""
+            SELECT hauptprojekt, CAST(NULL AS TEXT) AS beschreibung,
+                   TOTAL(ist) AS ist, TOTAL(obligo) AS obligo, 0.0 AS budget
+            FROM ({both}) WHERE hauptprojekt IS NOT NULL
+            GROUP BY hauptprojekt""",
+        'agg_psp': f"""
+            SELECT hauptprojekt, psp, TOTAL(ist) AS ist, TOTAL(obligo) AS obligo
+            FROM ({both}) WHERE hauptprojekt IS NOT NULL AND psp IS NOT NULL
+            GROUP BY hauptprojekt, psp""",
+        'agg_periode': f"""
+            SELECT hauptprojekt, periode, TOTAL(wert) AS ist
+            FROM ({ist_src}) WHERE hauptprojekt IS NOT NULL AND periode IS NOT NULL
+            GROUP BY hauptprojekt, periode""",
+        # Text = erste Zeile der Bestellung (wie groupby().first() im Dashboard)
+        'agg_bestellung_ist': f"""
+            WITH src AS ({ist_src}),
+                 texte AS (SELECT hauptprojekt, bestellung, text, MIN(rid) FROM src
+                           WHERE hauptprojekt IS NOT NULL GROUP BY hauptprojekt, bestellung)
+            SELECT s.hauptprojekt, s.bestellung, s.periode, TOTAL(s.wert) AS ist, t.text
+            FROM src s JOIN texte t ON t.hauptprojekt = s.hauptprojekt AND t.bestellung = s.bestellung
+            WHERE s.periode IS NOT NULL
+            GROUP BY s.hauptprojekt, s.bestellung, s.periode""",
+        # Obligo-Text = erster nicht-leerer Text der Bestellung
+        'agg_bestellung_obligo': f"""
+            WITH src AS ({obligo_src}),
+                 texte AS (SELECT hauptprojekt, bestellung, text_obligo, MIN(rid) FROM src
+                           WHERE hauptprojekt IS NOT NULL AND text_obligo IS NOT NULL GROUP BY hauptprojekt, bestellung)
+            SELECT s.hauptprojekt, s.bestellung, TOTAL(s.wert) AS obligo, t.text_obligo
+            FROM src s LEFT JOIN texte t ON t.hauptprojekt = s.hauptprojekt AND t.bestellung = s.bestellung
+            WHERE s.hauptprojekt IS NOT NULL
+            GROUP BY s.hauptprojekt, s.bestellung""",
+        # Zeilen der Bestell-Matrix (Text wie in der Matrix: Ist-Text, sonst Obligo-Text; "Sonstiges" unten)
+        'agg_bestellung': f"""
+            WITH ist AS (SELECT hauptprojekt, bestellung, TOTAL(ist) AS ist, MIN(text) AS text
+                         FROM agg_bestellung_ist {scope} GROUP BY hauptprojekt, bestellung),
+                 obligo AS (SELECT * FROM agg_bestellung_obligo {scope}),
+                 alle AS (SELECT hauptprojekt, bestellung FROM ist
+                          UNION SELECT hauptprojekt, bestellung FROM obligo)
+            SELECT a.hauptprojekt, a.bestellung,
+                   CASE WHEN i.text IS NULL OR i.text = '' THEN o.text_obligo ELSE i.text END AS text,
+                   COALESCE(i.ist, 0.0) AS ist, COALESCE(o.obligo, 0.0) AS obligo,
+                   COALESCE(i.ist, 0.0) + COALESCE(o.obligo, 0.0) AS auftragswert,
+                   CASE WHEN instr(a.bestellung, 'Sonstiges') > 0 THEN 'ZZZ' ELSE a.bestellung END AS sortierung
+            FROM alle a
+            LEFT JOIN ist i ON i.hauptprojekt = a.hauptprojekt AND i.bestellung = a.bestellung
+            LEFT JOIN obligo o ON o.hauptprojekt = a.hauptprojekt AND o.bestellung = a.bestellung""",
+    }
+
+    for table_name, select in statements.items():
+        if projects:
+            conn.exec_driver_sql(f"DELETE FROM {table_name} {scope}")
+            conn.exec_driver_sql(f"INSERT INTO {table_name} {select}")
+            continue
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table_name}")
+        conn.exec_driver_sql(f"CREATE TABLE {table_name} AS {select}")
+        conn.exec_driver_sql(f"CREATE INDEX idx_{table_name}_hauptprojekt ON {table_name} (hauptprojekt)")
+        for suffix, columns in AGGREGATE_INDEXES.get(table_name, {}).items():
+            conn.exec_driver_sql(f"CREATE INDEX idx_{table_name}_{suffix} ON {table_name} ({columns})")
+
+    # Budget und Beschreibung: gleiche Zuordnung wie bisher im Dashboard (Projektnummer irgendwo im Planungselement/Projekt).
+    # Statt LIKE '%projekt%' je Projekt über alle Verträge (Projekte x Verträge) ein Durchlauf:
+    # jeder Vertragstext wird in Teilstücke von Projektnummer-Länge zerlegt und per Gleichheit
+    # zugeordnet. upper() auf beiden Seiten = LIKE (Groß/Klein bei ASCII egal); DISTINCT zählt
+    # einen Vertrag je Projekt einmal, auch wenn beide Spalten oder mehrere Stellen passen.
+    budget_cols = _table_columns(conn, 'vertraege_uebersicht')
+    text_cols = [col for col in ('planungelement', 'projektnummer') if col in budget_cols]
+    if 'betrag' in budget_cols and text_cols:
+        vertraege = ' UNION ALL '.join(
+            f"SELECT rowid AS vid, betrag, {_column_or(budget_cols, 'bezeichnung')} AS bezeichnung, "
+            f"CAST({_quote(col)} AS TEXT) AS t FROM vertraege_uebersicht "
+            f"WHERE {_quote(col)} IS NOT NULL" for col in text_cols)
+        conn.exec_driver_sql("CREATE TEMP TABLE budget_projekte AS "
+                             "SELECT hauptprojekt, upper(hauptprojekt) AS schluessel FROM agg_projekt")
+        conn.exec_driver_sql("CREATE INDEX temp.idx_budget_projekte ON budget_projekte (schluessel)")
+        conn.exec_driver_sql(f"""
+            CREATE TEMP TABLE budget_je_projekt AS
+            WITH RECURSIVE
+                vertraege AS ({vertraege}),
+                laengen AS (SELECT DISTINCT length(hauptprojekt) AS n FROM agg_projekt),
+                pos(k) AS (SELECT 1 UNION ALL SELECT k + 1 FROM pos
+                           WHERE k <= (SELECT COALESCE(MAX(length(t)), 0) FROM vertraege)),
+                treffer AS (
+                    SELECT DISTINCT v.vid, p.hauptprojekt, v.betrag, v.bezeichnung
+                    FROM vertraege v
+                    JOIN laengen l
+                    JOIN pos ON pos.k <= length(v.t) - l.n + 1
+                    JOIN budget_projekte p ON p.schluessel = upper(substr(v.t, pos.k, l.n)))
+            SELECT hauptprojekt, TOTAL(betrag) AS budget,
+                   substr(group_concat(DISTINCT bezeichnung), 1, {DESCRIPTION_LENGTH}) AS beschreibung
+            FROM treffer GROUP BY hauptprojekt""")
+        conn.exec_driver_sql("""
+            UPDATE agg_projekt SET
+                budget = COALESCE(
+                    (SELECT b.budget FROM budget_je_projekt b WHERE b.hauptprojekt = agg_projekt.hauptprojekt), 0.0),
+                beschreibung =
+                    (SELECT b.beschreibung FROM budget_je_projekt b WHERE b.hauptprojekt = agg_projekt.hauptprojekt)""")
+        conn.exec_driver_sql("DROP TABLE budget_je_projekt")
+        conn.exec_driver_sql("DROP TABLE budget_projekte")
+
+    build_project_search(conn)
+
+def build_project_search(conn):
+    """
+    Suchindex der Seitenleiste: FTS5-Tabelle mit Trigramm-Tokenizer über Projektnummer und
+    Beschreibung von agg_projekt (nur Index, die Daten selbst bleiben in agg_projekt).
+    Findet Teilstücke ab 3 Zeichen irgendwo im Text. Ohne FTS5 (ältere SQLite-Versionen)
+    fehlt die Tabelle und das Cockpit sucht per LIKE (queries.search_projects).
+    """
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {PROJECT_SEARCH_TABLE}")
+    try:
+        conn.exec_driver_sql(f"""
+            CREATE VIRTUAL TABLE {PROJECT_SEARCH_TABLE} USING fts5(
+                hauptprojekt, beschreibung, content='agg_projekt', tokenize='trigram')""")
+    except OperationalError:
+        print("⚠️  SQLite ohne FTS5/Trigramm: Projektsuche im Cockpit läuft ohne Index (LIKE).")
+        return
+    conn.exec_driver_sql(f"INSERT INTO {PROJECT_SEARCH_TABLE}({PROJECT_SEARCH_TABLE}) VALUES ('rebuild')")
+
+def aggregates_missing(conn):
+    """Summen-Tabellen fehlen oder stammen von einer älteren Version (agg_projekt ohne Beschreibung)."""
+    existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return not set(AGGREGATE_TABLES) <= existing or 'beschreibung' not in _table_columns(conn, 'agg_projekt')
+
+def get_import_generation(conn):
+    """Zähler der abgeschlossenen Importe (PRAGMA user_version), Cache-Schlüssel des Dashboards."""
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def bump_import_generation(conn):
+    conn.exec_driver_sql(f"PRAGMA user_version = {get_import_generation(conn) + 1}")
+
+# --- 5. Parsen & Schreiben ---
+def iter_clean_chunks(filepath, header_row, chunksize=None, schema=None, cache_base=None, file_hash=None):
+    """Liest eine Datei (blockweise) und liefert bereinigte DataFrames."""
+    filename = os.path.basename(filepath)
+    chunks = read_source(filepath, header_row, chunksize, schema, cache_base, file_hash)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        if chunk is None:
+            return
+        if metrics.sampled('import.lesen'):
+            metrics.record('import.lesen', (time.perf_counter() - start) * 1000, len(chunk), filename)
+        yield clean_frame(chunk, filename, schema)
+
+def prepare_file(filepath, header_row, chunksize, out_dir, schema=None, cache_base=None, file_hash=None):
+    """
+    Worker-Funktion für den parallelen Import: parst und bereinigt eine Datei
+    und legt die Blöcke als Pickle in out_dir ab (statt sie im Speicher zurückzuschicken).
+    Liefert (Liste der Block-Dateien, Dauer in Sekunden, Messwerte des Workers).
+    """
+    start = time.perf_counter()
+    stem = os.path.join(out_dir, hashlib.md5(filepath.encode('utf-8')).hexdigest())
+    paths = []
+    for i, chunk in enumerate(iter_clean_chunks(filepath, header_row, chunksize, schema, cache_base, file_hash)):
+        path = f"{stem}_{i}.pkl"
+        chunk.to_pickle(path)
+        paths.append(path)
+    return paths, time.perf_counter() - start, metrics.drain()
+
+def _load_pickled_chunks(paths):
+    for path in paths:
+        chunk = pd.read_pickle(path)
+        os.remove(path)
+        yield chunk
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _sql_type(series):
+    """SQLite-Typ einer bereinigten Spalte: Beträge als REAL, alles andere TEXT (category nach ihren Werten)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.cat.categories
+    if pd.api.types.is_float_dtype(series):
+        return 'REAL'
+    if pd.api.types.is_integer_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return 'INTEGER'
+    return 'TEXT'
+
+def create_table(conn, table_name, df):
+    """Legt die Tabelle mit expliziten Spaltentypen neu an (statt der untypisierten to_sql-Variante)."""
+    columns = ", ".join(f"{_quote(col)} {_sql_type(df[col])}" for col in df.columns)
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+    conn.exec_driver_sql(f"CREATE TABLE {_quote(table_name)} ({columns})")
+
+def create_indexes(conn, table_name):
+    """
+    Indizes auf die Spalten, nach denen das Dashboard filtert/gruppiert.
+    'objekt' mit NOCASE, damit auch "objekt LIKE 'G.0118%'" den Index nutzen kann.
+    """
+    existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({_quote(table_name)})")}
+    for col in INDEX_COLUMNS:
+        if col in existing:
+            collate = " COLLATE NOCASE" if col == 'objekt' else ""
+            index_name = _quote(f"idx_{table_name}_{col}")
+            conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {index_name} ON {_quote(table_name)} ({_quote(col)}{collate})")
+
+def write_chunks(conn, table_name, chunks, filename=None):
+    """Schreibt Blöcke in eine Tabelle: der erste legt sie (typisiert) neu an, weitere werden angehängt."""
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        with metrics.stage('import.schreiben', filename) as m:
+            if i == 0:
+                create_table(conn, table_name, chunk)
+            chunk.to_sql(table_name, conn, if_exists='append', index=False)
+            m['zeilen'] = len(chunk)
+        rows += len(chunk)
+    return rows
+
+def file_period(filename):
+    """Periode aus dem Dateinamen ('2025-03') oder None, wenn der Name keine enthält."""
+    for pattern in PERIOD_PATTERNS:
+        match = re.search(pattern, filename)
+        if match:
+            return f"{match['jahr']}-{match['monat']}"
+    return None
+
+def source_columns(filepath, header_row):
+    """Spaltennamen einer Datei (wie column_key); gelesen wird nur die Kopfzeile."""
+    lower = filepath.lower()
+    if lower.endswith('.xlsx'):
+        names = excel_reader.read_header(filepath, header_row)
+    elif lower.endswith('.xls'):
+        names = pd.read_excel(filepath, header=header_row, nrows=0).columns
+    else:
+        names = pd.read_csv(filepath, header=header_row, nrows=0, sep=';', encoding='latin1').columns
+    return [excel_reader.column_key(name) for name in names]
+
+def has_periods(filepath, header_row, key_columns):
+    """Lässt sich die Lieferperiode bestimmen (Perioden-Spalten oder Periode im Dateinamen)?"""
+    if file_period(os.path.basename(filepath)):
+        return True
+    return set(key_columns) <= set(source_columns(filepath, header_row))
+
+def row_periods(chunk, key_columns):
+    """
+    Periode je Zeile aus den Perioden-Spalten, z.B. Geschäftsjahr 2025 + Periode 3 -> '2025-03'
+    (führende Nullen wie in '003' zählen nicht). Ohne diese Spalten bleibt die Periode leer.
+    """
+    if not all(col in chunk.columns for col in key_columns):
+        return pd.Series(None, index=chunk.index, dtype='str')
+    parts = [chunk[col].astype('str').str.strip().str.lstrip('0').str.zfill(2) for col in key_columns]
+    return parts[0].str.cat(parts[1:], sep='-')
+
+def _add_missing_columns(conn, table_name, source_table):
+    """Spalten, die eine neue Lieferung mitbringt, an die bestehende Tabelle anhängen (gleicher Typ)."""
+    existing = _table_columns(conn, table_name)
+    for row in conn.exec_driver_sql(f"PRAGMA table_info({_quote(source_table)})").fetchall():
+        if row[1] not in existing:
+            conn.exec_driver_sql(f"ALTER TABLE {_quote(table_name)} ADD COLUMN {_quote(row[1])} {row[2]}")
+
+def write_periods(conn, table_name, chunks, key_columns, filename):
+    """
+    Delta-Import einer Perioden-Lieferung: die Datei wird zuerst in eine Zwischentabelle geschrieben,
+    dann werden in der Zieltabelle nur die Zeilen ihrer Lieferung ersetzt: Zeilen aus derselben Datei
+    und, wenn der Dateiname eine Periode nennt, Zeilen derselben Lieferperiode (erneute Lieferung unter
+    neuem Namen). Kosten hängen also nur von der Größe der Lieferung ab, nicht von der Historie.
+    Ohne Periode im Dateinamen ist die Lieferperiode die häufigste Periode der Zeilen (nur zur Info,
+    ersetzt wird dann nur nach Datei); ohne jede Periode (Komplett-Aufbau der Tabelle, siehe run_import)
+    bleibt sie leer.
+    """
+    named_period = file_period(filename)
+    period = named_period
+    staging = f"{table_name}_neu"
+
+    def with_periods():
+        for chunk in chunks:
+            chunk[PERIOD_COLUMN] = row_periods(chunk, key_columns) if period is None else period
+            chunk[SOURCE_FILE_COLUMN] = filename
+            yield chunk
+
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {_quote(staging)}")
+    rows = write_chunks(conn, staging, with_periods(), filename)
+    if rows == 0:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {_quote(staging)}")
+        return 0
+
+    with metrics.stage('import.perioden', filename) as m:
+        if period is None:
+            # Eine Lieferperiode für die ganze Datei: ihre häufigste Periode
+            conn.exec_driver_sql(
+                f"UPDATE {_quote(staging)} SET {PERIOD_COLUMN} = (SELECT {PERIOD_COLUMN} FROM {_quote(staging)} "
+                f"WHERE {PERIOD_COLUMN} IS NOT NULL GROUP BY 1 ORDER BY COUNT(*) DESC, 1 LIMIT 1)")
+            period = conn.exec_driver_sql(f"SELECT {PERIOD_COLUMN} FROM {_quote(staging)} LIMIT 1").scalar()
+        if not _table_columns(conn, table_name):
+            conn.exec_driver_sql(f"CREATE TABLE {_quote(table_name)} AS SELECT * FROM {_quote(staging)} WHERE 0")
+        _add_missing_columns(conn, table_name, staging)
+        # Bisherige Zeilen dieser Lieferung (lieferperiode = NULL trifft nichts)
+        same_delivery = f"({SOURCE_FILE_COLUMN} = ? OR {PERIOD_COLUMN} = ?)"
+        delivery = (filename, named_period)
+        if 'hauptprojekt' in _table_columns(conn, staging):
+            # Projekte der alten und neuen Zeilen merken: nur deren Summen ändern sich
+            conn.exec_driver_sql(f"CREATE TEMP TABLE IF NOT EXISTS {DELTA_PROJECTS_TABLE} (hauptprojekt TEXT PRIMARY KEY)")
+            for source, where in ((table_name, same_delivery), (staging, "1")):
+                if 'hauptprojekt' in _table_columns(conn, source):
+                    conn.exec_driver_sql(
+                        f"INSERT OR IGNORE INTO temp.{DELTA_PROJECTS_TABLE} SELECT DISTINCT hauptprojekt "
+                        f"FROM {_quote(source)} WHERE {where} AND hauptprojekt IS NOT NULL",
+                        delivery if source == table_name else ())
+        columns = ", ".join(_quote(col) for col in _table_columns(conn, staging))
+        replaced = conn.exec_driver_sql(
+            f"DELETE FROM {_quote(table_name)} WHERE {same_delivery}", delivery).rowcount
+        conn.exec_driver_sql(f"INSERT INTO {_quote(table_name)} ({columns}) SELECT {columns} FROM {_quote(staging)}")
+        conn.exec_driver_sql(f"DROP TABLE {_quote(staging)}")
+        m['zeilen'] = rows
+
+    if period is not None:
+        print(f"   📅 Lieferperiode {period}: {replaced} alte Zeilen ersetzt, andere Lieferungen unverändert.")
+    return rows
+
+# --- 6. Hauptlogik ---
+def run_import(data_dir=None, db_path=None, force=False, chunksize=CHUNK_SIZE, workers=IMPORT_WORKERS,
+               storage=columnar_store.STORAGE_BACKEND):
+    """
+    Importiert alle SAP-Exporte aus 'data/' in die SQLite-Datenbank.
+    Unveränderte Dateien (laut Manifest) werden übersprungen, nur betroffene Tabellen neu aufgebaut.
+    Alles läuft in einer Transaktion, das Dashboard sieht also nie einen halben Import.
+    CSVs werden in Blöcken von 'chunksize' Zeilen gestreamt (bereinigt und direkt angehängt).
+    Mit workers > 1 parsen mehrere Prozesse die Dateien parallel, geschrieben wird nur
+    vom Hauptprozess (SQLite erlaubt nur einen Schreiber).
+    Mit storage='parquet' entsteht danach zusätzlich das spaltenorientierte Dataset (columnar_store).
+    Rückgabe: {tabelle: {'dateien', 'zeilen', 'sekunden'}} der neu aufgebauten Tabellen.
+    """
+    # Pfade bestimmen
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    db_path = db_path or os.path.join(base_dir, DB_NAME)
+    data_dir = data_dir or os.path.join(base_dir, 'data')
+    excel_cache = excel_reader.cache_dir(os.path.dirname(os.path.abspath(db_path))) if EXCEL_CACHE else None
+
+    engine = create_db_engine(db_path)
     print(f"🔌 Starte Import in: {db_path}")
 
-    all_files = glob.glob(os.path.join(data_dir, "*.*"))
+    all_files = sorted(glob.glob(os.path.join(data_dir, "*.*")))
     
     if not all_files:
         print("⚠️  Keine Dateien im 'data'-Ordner!")
-        return
+        return {}
 
+    # Dateien ihren Tabellen zuordnen (Reihenfolge bleibt erhalten: spätere Datei gewinnt)
+    sources = {}
     for filepath in all_files:
         filename = os.path.basename(filepath)
-        imported = False
-        
-        for pattern, table_name, header_row in FILE_MAPPING:
-            if pattern.lower() in filename.lower():
+        # '~$...' sind Sperrdateien von Excel, solange ein Export geöffnet ist
+        source = find_source(filename) if not filename.startswith('~$') else None
+        if source is None:
+            print(f"ℹ️  Überspringe: {filename}")
+            continue
+        table_name, header_row = source
+        sources.setdefault(table_name, []).append((filepath, header_row))
+
+    stats = {}
+    with engine.begin() as conn, tempfile.TemporaryDirectory() as tmp_dir, \
+            ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        manifest = load_manifest(conn)
+
+        # A) Planen: welche Tabellen müssen neu aufgebaut werden?
+        rebuild = []
+        # Summen komplett neu (sonst nach reinen Perioden-Lieferungen nur für die berührten Projekte)
+        full_aggregates = force
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS temp.{DELTA_PROJECTS_TABLE}")
+        # Dateien, deren Kopfzeile sich beim Planen nicht lesen ließ: Fehler erst beim Schreiben melden
+        probe_errors = {}
+
+        def periods_known(filepath, header_row, key_columns):
+            try:
+                return has_periods(filepath, header_row, key_columns)
+            except Exception as e:
+                probe_errors[filepath] = e
+                return True  # wird ohnehin nicht geladen, entscheidet also nichts
+        for table_name, files in sources.items():
+            fingerprints = {os.path.basename(fp): file_fingerprint(fp, manifest.get(os.path.basename(fp))) for fp, _ in files}
+            known = {name: entry for name, entry in manifest.items() if entry['tabelle'] == table_name}
+
+            if table_name in PERIOD_SOURCES:
+                # Perioden-Lieferungen: nur neue/geänderte Dateien laden, Historie bleibt stehen
+                existing = _table_columns(conn, table_name)
+                if existing and not {PERIOD_COLUMN, SOURCE_FILE_COLUMN} <= set(existing):
+                    print(f"ℹ️  '{table_name}' noch ohne Lieferperioden je Datei, wird einmal komplett neu aufgebaut.")
+                    conn.exec_driver_sql(f"DROP TABLE {_quote(table_name)}")
+                    existing, known = [], {}
+                    full_aggregates = True
+                new_files = [(fp, header_row) for fp, header_row in files
+                             if force or known.get(os.path.basename(fp), {}).get('hash')
+                             != fingerprints[os.path.basename(fp)]['hash']]
+                removed = set(known) - set(fingerprints)
+                # Zeilen ohne Lieferperiode: die Tabelle wurde zuletzt komplett aus allen Dateien aufgebaut
+                whole_table = bool(existing) and conn.exec_driver_sql(
+                    f"SELECT 1 FROM {_quote(table_name)} WHERE {PERIOD_COLUMN} IS NULL LIMIT 1").first() is not None
+                if not new_files and not (removed and whole_table):
+                    print(f"⏭️  '{table_name}' unverändert ({len(files)} Datei(en)), übersprungen.")
+                    for name, fp in fingerprints.items():
+                        save_manifest_entry(conn, name, table_name, fp)  # mtime nachziehen
+                    continue
+                if not all([periods_known(fp, header_row, PERIOD_SOURCES[table_name]) for fp, header_row in files]):
+                    print(f"ℹ️  '{table_name}': Datei(en) ohne Periode (Spalten oder Dateiname), "
+                          f"Tabelle wird komplett neu aufgebaut.")
+                    whole_table = True
+                if not (force or whole_table):
+                    rebuild.append((table_name, new_files, fingerprints))
+                    continue
+                # Komplett neu aus den vorhandenen Dateien: Perioden weggefallener Dateien verschwinden
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+                for name in removed:
+                    conn.exec_driver_sql(f"DELETE FROM {MANIFEST_TABLE} WHERE datei = ?", (name,))
+                full_aggregates = True
+                rebuild.append((table_name, files, fingerprints))
+                continue
+
+            unchanged = set(known) == set(fingerprints) and all(
+                known[name]['hash'] == fingerprints[name]['hash'] for name in fingerprints
+            )
+            if unchanged and not force:
+                print(f"⏭️  '{table_name}' unverändert ({len(files)} Datei(en)), übersprungen.")
+                # mtime nachziehen, damit beim nächsten Mal nicht erneut gehasht wird
+                for name, fp in fingerprints.items():
+                    save_manifest_entry(conn, name, table_name, fp)
+                continue
+
+            # Weggefallene Dateien aus dem Manifest austragen
+            for name in set(known) - set(fingerprints):
+                conn.exec_driver_sql(f"DELETE FROM {MANIFEST_TABLE} WHERE datei = ?", (name,))
+            rebuild.append((table_name, files, fingerprints))
+
+        # B) Parallel-Modus: alle Dateien gleichzeitig an den Pool geben
+        futures = {}
+        if pool is not None:
+            for table_name, files, fingerprints in rebuild:
+                for filepath, header_row in files:
+                    if filepath in probe_errors:
+                        continue
+                    futures[filepath] = pool.submit(prepare_file, filepath, header_row, chunksize, tmp_dir,
+                                                    SOURCE_SCHEMAS.get(table_name), excel_cache,
+                                                    fingerprints[os.path.basename(filepath)]['hash'])
+
+        # C) Schreiben (nur dieser Prozess, in Datei-Reihenfolge)
+        for table_name, files, fingerprints in rebuild:
+            table_start = time.perf_counter()
+            table_rows = 0
+            for filepath, header_row in files:
+                filename = os.path.basename(filepath)
                 print(f"🔄 Verarbeite '{filename}' -> '{table_name}'...")
-                
+
                 try:
-                    # A) Datei einlesen (CSV mit Strichpunkt, Excel normal)
-                    if filename.lower().endswith(('.xlsx', '.xls')):
-                        df = pd.read_excel(filepath, header=header_row, dtype=str)
-                    elif filename.lower().endswith('.csv'):
-                        # WICHTIG: thousands=None verhindert, dass Pandas Punkte falsch interpretiert
-                        df = pd.read_csv(filepath, header=header_row, dtype=str, sep=';', encoding='latin1', thousands=None)
+                    if filepath in probe_errors:
+                        raise probe_errors.pop(filepath)
+                    if pool is not None:
+                        paths, parse_duration, worker_metrics = futures.pop(filepath).result()
+                        metrics.extend(worker_metrics)
+                        chunks = _load_pickled_chunks(paths)
                     else:
-                        continue
-                    
-                    # Spaltennamen normalisieren (alles klein, keine Leerzeichen)
-                    df.columns = [str(c).strip().replace(' ', '_').replace('.', '').lower() for c in df.columns]
-                    
-                    # B) Finanz-Spalten bereinigen
-                    finance_keywords = ['wert', 'betrag', 'kosten', 'obligo', 'budget', 'auftragswert']
-                    for col in df.columns:
-                        if any(kw in col for kw in finance_keywords):
-                            df[col] = df[col].apply(clean_currency_string)
-                    
-                    # C) Hauptprojekt-Spalte erzeugen (für die Gruppierung im Dashboard)
-                    # Macht aus "G.011803001.02.02" -> "G.011803001"
-                    if 'objekt' in df.columns:
-                        df['hauptprojekt'] = df['objekt'].astype(str).str[:11]
-                    
-                    # Speichern
-                    df.to_sql(table_name, engine, if_exists='replace', index=False)
-                    print(f"   ✅ {len(df)} Zeilen importiert.")
-                    imported = True
-                    break
-                
+                        parse_duration = 0.0  # Parsen passiert beim Schreiben (Generator)
+                        chunks = iter_clean_chunks(filepath, header_row, chunksize, SOURCE_SCHEMAS.get(table_name),
+                                                   excel_cache, fingerprints[filename]['hash'])
+                    start = time.perf_counter()
+
+                    # Savepoint: ein kaputter Export lässt die Tabelle im alten Zustand
+                    with conn.begin_nested():
+                        if table_name in PERIOD_SOURCES:
+                            rows = write_periods(conn, table_name, chunks, PERIOD_SOURCES[table_name], filename)
+                        else:
+                            rows = write_chunks(conn, table_name, chunks, filename)
+                        save_manifest_entry(conn, filename, table_name, fingerprints[filename])
+                    duration = parse_duration + time.perf_counter() - start
+                    print(f"   ✅ {rows} Zeilen importiert ({rows / max(duration, 1e-9):,.0f} Zeilen/s).")
+                    table_rows += rows
+
                 except Exception as e:
                     print(f"   ❌ Fehler: {e}")
-                    imported = True
-                    break
 
-        if not imported:
-            print(f"ℹ️  Überspringe: {filename}")
+            # Indizes erst nach dem Laden anlegen (schneller als bei jedem INSERT pflegen)
+            if conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).first():
+                create_indexes(conn, table_name)
+            stats[table_name] = {'dateien': len(files), 'zeilen': table_rows,
+                                 'sekunden': time.perf_counter() - table_start}
+
+        # Summen-Tabellen passend zu den Rohdaten neu berechnen
+        changed = bool(rebuild)
+        aggregate_sources = {table_name for table_name, _, _ in rebuild if table_name in AGGREGATE_SOURCES}
+        missing = aggregates_missing(conn)
+        if aggregate_sources or missing:
+            changed = True
+            delta = not (full_aggregates or missing) and aggregate_sources <= set(PERIOD_SOURCES)
+            if delta:
+                conn.exec_driver_sql(f"CREATE TEMP TABLE IF NOT EXISTS {DELTA_PROJECTS_TABLE} (hauptprojekt TEXT PRIMARY KEY)")
+                count = conn.exec_driver_sql(f"SELECT COUNT(*) FROM temp.{DELTA_PROJECTS_TABLE}").scalar()
+                print(f"🧮 Berechne Summen-Tabellen für {count} geänderte Projekt(e)...")
+            else:
+                print("🧮 Berechne Summen-Tabellen...")
+            with metrics.stage('import.summen', 'delta' if delta else None):
+                build_aggregates(conn, f"temp.{DELTA_PROJECTS_TABLE}" if delta else None)
+
+            # Statistiken für den Query-Planer aktualisieren
+            conn.exec_driver_sql(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+            conn.exec_driver_sql("ANALYZE")
+
+        # Optional: spaltenorientierte Kopie für das Cockpit, aus dem neuen Stand dieser Transaktion.
+        # Vor Generation und Commit: wer die neue Generation sieht, findet auch schon das neue Dataset
+        # (sonst würde das Cockpit alte Parquet-Daten unter der neuen Generation cachen)
+        parquet_dir = columnar_store.parquet_dir(os.path.dirname(db_path))
+        if storage == 'parquet' and (changed or not os.path.isdir(parquet_dir)):
+            print(f"🧱 Schreibe Parquet-Dataset: {parquet_dir}")
+            columnar_store.export_from_sqlite(conn, parquet_dir)
+
+        # Import-Generation hochzählen -> das Dashboard verwirft seine Caches
+        if changed:
+            bump_import_generation(conn)
 
+    engine.dispose()
+    metrics.flush(os.path.dirname(db_path), prune=True)
     print("\n🏁 Import fertig!")
+    return stats
+
+# --- 7. Watch-Modus ---
+def is_export_file(path):
+    """Gehört die Datei zu einem bekannten SAP-Export? (Excel-Sperrdateien '~$...' nicht)"""
+    filename = os.path.basename(path or '')
+    return bool(filename) and not filename.startswith(('~$', '.')) and find_source(filename) is not None
+
+class ExportChangeHandler(FileSystemEventHandler):
+    """Merkt sich, wann zuletzt ein SAP-Export in 'data/' geschrieben, verschoben oder gelöscht wurde."""
+
+    def __init__(self):
+        super().__init__()
+        self.last_change = None
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in WATCH_EVENTS:
+            return
+        if is_export_file(event.src_path) or is_export_file(getattr(event, 'dest_path', '')):
+            self.last_change = time.monotonic()
+
+def watch(data_dir=None, db_path=None, debounce=WATCH_DEBOUNCE, stop=None, force=False, **import_options):
+    """
+    Beobachtet 'data/' und importiert neue oder geänderte Exporte automatisch.
+    Schreibt SAP (oder der Explorer) mehrere Dateien am Stück, wird erst nach 'debounce'
+    Sekunden Ruhe importiert. Das Manifest überspringt unveränderte Tabellen, ein Lauf kostet
+    also nur die geänderten Dateien. 'force' gilt nur für den ersten Import beim Start.
+    Beenden mit Strg+C (oder über das Event 'stop').
+    """
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_dir = data_dir or os.path.join(base_dir, 'data')
+    stop = stop or threading.Event()
+
+    handler = ExportChangeHandler()
+    observer = Observer()
+    observer.schedule(handler, data_dir, recursive=False)
+    observer.start()
+    print(f"👀 Beobachte '{data_dir}' (Import nach {debounce:g} s Ruhe, Strg+C beendet)")
+
+    try:
+        run_import(data_dir, db_path, force=force, **import_options)  # Stand beim Start übernehmen
+        while not stop.wait(WATCH_POLL):
+            changed_at = handler.last_change
+            if changed_at is None or time.monotonic() - changed_at < debounce:
+                continue
+            # Vor dem Import zurücksetzen: Änderungen während des Imports lösen einen weiteren Lauf aus
+            handler.last_change = None
+            print("\n📥 Änderung in 'data/' erkannt.")
+            try:
+                run_import(data_dir, db_path, **import_options)
+            except Exception as e:
+                sentry_sdk.capture_exception(e)
+                print(f"❌ Import fehlgeschlagen: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
+        print("🛑 Beobachtung beendet.")
 
 if __name__ == "__main__":
-    run_import()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Importiert SAP-Exporte aus 'data/' in finanzdaten.db")
+    parser.add_argument('--force', action='store_true',
+                        help="Alle Tabellen neu aufbauen, Manifest ignorieren (mit --watch nur beim Start)")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE,
+                        help=f"Zeilen pro CSV-Block (Standard: {CHUNK_SIZE}, 0 = ganze Datei)")
+    parser.add_argument('--workers', type=int, default=IMPORT_WORKERS,
+                        help=f"Parallele Parser-Prozesse (Standard: {IMPORT_WORKERS}, z.B. Anzahl CPU-Kerne)")
+    parser.add_argument('--watch', action='store_true',
+                        help="Dauerbetrieb: 'data/' beobachten und neue/geänderte Exporte automatisch importieren")
+    parser.add_argument('--debounce', type=float, default=WATCH_DEBOUNCE,
+                        help=f"Watch-Modus: Sekunden Ruhe vor dem Import (Standard: {WATCH_DEBOUNCE:g})")
+    args = parser.parse_args()
+    if args.watch:
+        watch(debounce=args.debounce, force=args.force, chunksize=args.chunksize, workers=args.workers)
+    else:
+        run_import(force=args.force, chunksize=args.chunksize, workers=args.workers)
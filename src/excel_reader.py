@@ -0,0 +1,226 @@
+import hashlib
+import os
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+# --- EXCEL-EXPORTE SCHNELL EINLESEN ---
+# pd.read_excel(dtype=str) wandelt jede Zelle jeder Spalte über Zell-Objekte um, hält die ganze
+# Tabelle als Listen im Speicher und schickt sie danach noch durch den CSV-Parser von Pandas.
+# Hier werden die Zeilen einer read_only-Arbeitsmappe als reine Werte gestreamt, nur die
+# benötigten Spalten behalten und blockweise als Text-Spalten geliefert (gleiches Ergebnis wie
+# read_excel mit dtype=str: leere Zellen/'NA'/'#N/A' -> NaN, ganze Zahlen ohne '.0', Datum als Text).
+# Einziger Unterschied: Zellen rechts der Kopfzeile ohne Überschrift werden ignoriert
+# (read_excel legte dafür leere 'Unnamed: n'-Spalten an).
+#
+# Zwischenspeicher: Jede eingelesene Arbeitsmappe wird als Parquet-Datei in CACHE_DIR_NAME
+# abgelegt, Schlüssel = SHA-256 des Datei-Inhalts + Kopfzeile + Spaltenauswahl. Eine unveränderte
+# Arbeitsmappe (z.B. bei --force oder einer neuen Datenbank) wird dann nur noch aus Parquet gelesen.
+# Ohne pyarrow wird einfach ohne Zwischenspeicher gelesen.
+
+CACHE_DIR_NAME = 'excel_cache'
+# Wie viele Cache-Dateien bleiben (die zuletzt benutzten)
+CACHE_MAX_FILES = 20
+# Zeilen pro Block, wenn der Importer keine Blockgröße vorgibt
+BLOCK_ROWS = 100_000
+
+# Excel-Fehlerwerte (#DIV/0! usw.) liest read_excel als NaN
+_ERROR_VALUES = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'}
+# Texte, die read_excel als leer liest (Standard-na_values von Pandas)
+_NA_VALUES = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+              '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
+
+def cache_dir(base_dir):
+    return os.path.join(base_dir, CACHE_DIR_NAME)
+
+
+def column_key(name):
+    """Spaltenname, wie er in der Datenbank heißt (klein, '_' statt Leerzeichen, ohne Punkte)."""
+    return str(name).strip().replace(' ', '_').replace('.', '').lower()
+
+
+def read_workbook(filepath, header_row, columns=None, chunksize=None, cache_base=None, file_hash=None):
+    """
+    Erstes Tabellenblatt einer .xlsx-Datei als Folge von DataFrames (nur Text-Spalten).
+      header_row: Kopfzeile (0 = erste Zeile), wie bei read_excel
+      columns:    benötigte Spalten (Namen wie column_key), None = alle
+      cache_base: Ordner für den Parquet-Zwischenspeicher, None = ohne
+      file_hash:  SHA-256 des Datei-Inhalts, falls schon bekannt (Import-Manifest), sonst wird gehasht
+    """
+    chunksize = chunksize or BLOCK_ROWS
+    cache_path = _cache_path(filepath, header_row, columns, cache_base, file_hash)
+    if cache_path is None:
+        yield from _stream_sheet(filepath, header_row, columns, chunksize)
+        return
+    if os.path.exists(cache_path):
+        os.utime(cache_path)  # zuletzt benutzt -> bleibt beim Aufräumen erhalten
+        yield from _read_cache(cache_path, chunksize)
+        return
+    yield from _stream_and_cache(filepath, header_row, columns, chunksize, cache_path)
+
+
+def read_header(filepath, header_row):
+    """Nur die Spaltennamen des ersten Tabellenblatts (wie read_excel), ohne die Daten zu lesen."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(min_row=header_row + 1, max_row=header_row + 1, values_only=True)
+        return _header_names(next(rows, ()))
+    finally:
+        workbook.close()
+
+
+def _stream_sheet(filepath, header_row, columns, chunksize):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()  # Größenangabe mancher Exporte ist falsch
+        rows = sheet.iter_rows(min_row=header_row + 1, values_only=True)
+        names = _header_names(next(rows, ()))
+        keep = [i for i, name in enumerate(names) if columns is None or column_key(name) in columns]
+        names = [names[i] for i in keep]
+        pick = _picker(keep)
+
+        block, pending_blank = [], 0
+        emitted = False
+        for row in rows:
+            # Leere Zeilen erst übernehmen, wenn danach noch Daten kommen (read_excel kürzt am Ende)
+            if not any(v is not None and v != '' for v in row):
+                pending_blank += 1
+                continue
+            block.extend([()] * pending_blank)
+            pending_blank = 0
+            block.append(pick(row))
+            if len(block) >= chunksize:
+                yield _to_frame(block, names)
+                emitted = True
+                block = []
+        if block or not emitted:
+            yield _to_frame(block, names)
+    finally:
+        workbook.close()
+
+
+def _header_names(header):
+    """Kopfzeile wie read_excel: leere Zellen -> 'Unnamed: i', doppelte Namen -> 'Name.1', 'Name.2'."""
+    header = list(header)
+    while header and header[-1] in (None, ''):
+        header.pop()
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        value = _cell_value(value)
+        name = f'Unnamed: {i}' if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            while f'{name}.{seen[name]}' in seen:
+                seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def _picker(keep):
+    """Funktion, die aus einer Zeile (Tupel) die behaltenen Spalten holt; kurze Zeilen werden aufgefüllt."""
+    if not keep:
+        return lambda row: ()
+    width = keep[-1] + 1
+    get = itemgetter(*keep)
+    if len(keep) == 1:
+        return lambda row: (get(row),) if len(row) >= width else (row[keep[0]] if keep[0] < len(row) else None,)
+    return lambda row: get(row) if len(row) >= width else tuple(row[i] if i < len(row) else None for i in keep)
+
+
+def _cell_value(value):
+    """Zelle wie der openpyxl-Reader von Pandas: ganze Zahlen als int, Fehlerwerte als leer."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if value == '' or (isinstance(value, str) and value in _ERROR_VALUES):
+        return None
+    return value
+
+
+def _to_frame(block, names):
+    """Block aus Zeilen-Tupeln -> DataFrame mit Text-Spalten (Ergebnis wie read_excel(dtype=str))."""
+    data = {}
+    for j, name in enumerate(names):
+        values = np.array([_cell_value(row[j]) if j < len(row) else None for row in block], dtype=object)
+        column = pd.Series(values, dtype=object)
+        column = column.where(~column.isin(_NA_VALUES), None)
+        data[name] = column.astype('str')
+    return pd.DataFrame(data, columns=names)
+
+
+# --- Zwischenspeicher (Parquet) ---
+
+def _cache_path(filepath, header_row, columns, cache_base, file_hash=None):
+    if cache_base is None:
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    if file_hash is None:
+        sha = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        file_hash = sha.hexdigest()
+    selection = 'alle' if columns is None else hashlib.md5(','.join(sorted(columns)).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(cache_base, f'{file_hash}_{header_row}_{selection}.parquet')
+
+
+def _read_cache(cache_path, chunksize):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(cache_path)
+    if parquet_file.metadata.num_rows == 0:
+        yield parquet_file.schema_arrow.empty_table().to_pandas()
+        return
+    for batch in parquet_file.iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def _stream_and_cache(filepath, header_row, columns, chunksize, cache_path):
+    """Liest aus der Arbeitsmappe und schreibt dabei die Cache-Datei mit (erst fertig = gültig)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    writer = None
+    try:
+        for chunk in _stream_sheet(filepath, header_row, columns, chunksize):
+            if writer is None:
+                # Feste Text-Typen, damit ein Block mit lauter leeren Zellen das Schema nicht ändert
+                schema = pa.schema([(name, pa.string()) for name in chunk.columns])
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield chunk
+        writer.close()
+        writer = None
+        os.replace(tmp_path, cache_path)
+        _prune_cache(os.path.dirname(cache_path))
+    finally:
+        # Abbruch (Fehler beim Lesen oder beim Schreiben in die Datenbank): keine halbe Cache-Datei
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _prune_cache(directory):
+    files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.parquet')]
+    files.sort(key=os.path.getmtime, reverse=True)
+    for path in files[CACHE_MAX_FILES:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # gerade von einem anderen Import in Benutzung (Windows)
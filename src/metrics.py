@@ -0,0 +1,131 @@
+import os
+import random
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+
+import pandas as pd
+
+# --- LOKALE LAUFZEIT-MESSUNG ---
+# Importer und Cockpit messen ihre Arbeitsschritte (Stufen) selbst und schreiben sie in eine
+# lokale SQLite-Datei neben der Datenbank. Nichts verlässt den Rechner.
+#   Importer: import.lesen / import.normalisieren / import.waehrung / import.schreiben (je Datei),
+#             import.summen
+#   Cockpit:  cockpit.projektdaten, abfrage.<name> (jede SQL-Abfrage), diagramm.<name>, matrix.seite,
+#             dienst.<art> (Berechnung im gemeinsamen Datenspeicher, siehe data_service.py)
+#   Export:   bericht.projekt (report_export.py, je Projekt)
+#
+# COCKPIT_METRICS_RATE steuert den Anteil gemessener Stufen (1.0 = alle, 0 = aus), Standard 0.1:
+# eine nicht gemessene Stufe kostet nur einen Zufallswert, und metriken.db wächst nicht mit jedem
+# Rerun jeder Sitzung. Importer-Stufen (import.*) laufen einmal je Datei und werden immer gemessen.
+#
+# Alte Messwerte werden nicht bei jedem flush gelöscht (das wäre wieder Arbeit in jedem Rerun),
+# sondern nach jedem Import und sonst bei jedem PRUNE_EVERY-ten flush eines Prozesses.
+
+METRICS_FILE = 'metriken.db'
+SAMPLE_RATE = float(os.environ.get('COCKPIT_METRICS_RATE', '0.1'))
+ALWAYS_MEASURED = ('import.',)
+# Wie lange Messwerte aufgehoben werden und wie viele je Stufe in die Auswertung eingehen
+KEEP_DAYS = 30
+SUMMARY_WINDOW = 1000
+PRUNE_EVERY = 200
+
+_buffer = []
+_flush_count = 0
+
+
+def metrics_path(base_dir):
+    return os.path.join(base_dir, METRICS_FILE)
+
+
+def sampled(stage_name=''):
+    if stage_name.startswith(ALWAYS_MEASURED):
+        return True
+    return SAMPLE_RATE > 0 and (SAMPLE_RATE >= 1 or random.random() < SAMPLE_RATE)
+
+
+def record(stage_name, duration_ms, rows=None, detail=None):
+    """Einen Messwert vormerken (geschrieben wird erst mit flush)."""
+    _buffer.append((time.time(), stage_name, round(duration_ms, 3), rows, detail))
+
+
+@contextmanager
+def stage(stage_name, detail=None):
+    """
+    Misst die Dauer des with-Blocks. Zeilenzahl über das gelieferte dict setzen:
+        with metrics.stage('diagramm.ampel') as m:
+            ...
+            m['zeilen'] = len(df)
+    """
+    info = {}
+    if not sampled(stage_name):
+        yield info
+        return
+    start = time.perf_counter()
+    yield info
+    record(stage_name, (time.perf_counter() - start) * 1000, info.get('zeilen'), detail)
+
+
+def drain():
+    """Vorgemerkte Messwerte abholen und den Puffer leeren (z.B. um sie aus einem Worker zurückzugeben)."""
+    records = _buffer[:]
+    _buffer.clear()
+    return records
+
+
+def extend(records):
+    _buffer.extend(records)
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=5)
+    conn.execute("""CREATE TABLE IF NOT EXISTS metriken (
+                        zeitpunkt REAL, stufe TEXT, dauer_ms REAL, zeilen INTEGER, detail TEXT)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metriken_stufe ON metriken (stufe, zeitpunkt)")
+    # Für das Aufräumen nach Alter (sonst liest das DELETE die ganze Tabelle)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metriken_zeitpunkt ON metriken (zeitpunkt)")
+    return conn
+
+
+def flush(base_dir, prune=False):
+    """
+    Schreibt alle vorgemerkten Messwerte in einem Rutsch. Alte Werte (älter als KEEP_DAYS) werden
+    mit prune=True (Importer) und bei jedem PRUNE_EVERY-ten flush abgeräumt.
+    """
+    global _flush_count
+    records = drain()
+    if not records and not prune:
+        return
+    _flush_count += 1
+    prune = prune or _flush_count % PRUNE_EVERY == 0
+    try:
+        with closing(_connect(metrics_path(base_dir))) as conn, conn:
+            conn.executemany("INSERT INTO metriken VALUES (?, ?, ?, ?, ?)", records)
+            if prune:
+                conn.execute("DELETE FROM metriken WHERE zeitpunkt < ?", (time.time() - KEEP_DAYS * 86400,))
+    except sqlite3.Error:
+        pass  # Messung darf nie den eigentlichen Ablauf stören
+
+
+def summary(base_dir):
+    """p50/p95 je Stufe über die letzten SUMMARY_WINDOW Messungen (für das Performance-Panel)."""
+    columns = ['stufe', 'anzahl', 'p50_ms', 'p95_ms', 'zeilen_median']
+    path = metrics_path(base_dir)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    with closing(_connect(path)) as conn:
+        df = pd.read_sql("""
+            SELECT stufe, dauer_ms, zeilen FROM (
+                SELECT stufe, dauer_ms, zeilen,
+                       ROW_NUMBER() OVER (PARTITION BY stufe ORDER BY zeitpunkt DESC) AS nr
+                FROM metriken)
+            WHERE nr <= ?""", conn, params=(SUMMARY_WINDOW,))
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    grouped = df.groupby('stufe')
+    return pd.DataFrame({
+        'anzahl': grouped['dauer_ms'].size(),
+        'p50_ms': grouped['dauer_ms'].quantile(0.5),
+        'p95_ms': grouped['dauer_ms'].quantile(0.95),
+        'zeilen_median': grouped['zeilen'].median(),
+    }).reset_index().sort_values('p95_ms', ascending=False)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+# --- BESTELL-MATRIX ---
+# Eine Zeile je Bestellung, eine Spalte je Periode (Ist), dazu Summe Ist, Rest-Obligo und
+# Auftragswert. Eingabe sind die Summen-Tabellen aus queries.py (agg_bestellung_ist/_obligo).
+# Alles spaltenweise: ein Gruppierungs-Durchlauf (bincount), kein apply/lambda pro Zeile.
+
+NO_ORDER_MARKER = 'Sonstiges'
+
+
+def build_order_matrix(df_orders_ist, df_orders_obligo, order=None, periods=None):
+    """
+    Baut die Bestell-Matrix für die Anzeige.
+      df_orders_ist:    bestellung, periode, wert, text
+      df_orders_obligo: bestellung, obligo_wert, text_obligo
+      order:            feste Zeilenfolge (z.B. eine in SQL sortierte Seite), sonst alle Bestellungen
+      periods:          alle Perioden des Projekts, damit jede Seite dieselben Monatsspalten hat
+    Rückgabe: bestellung, text, Monatsspalten ('1'..'12', numerisch sortiert), Summe Ist,
+    Rest-Obligo, Auftragswert (Kalk.); ohne 'order' steht "Sonstiges" unten.
+    """
+    # A) Ist je Bestellung x Periode in einem Durchlauf
+    order_codes, orders = pd.factorize(df_orders_ist['bestellung'], sort=True)
+    all_periods = pd.Index(pd.unique(df_orders_ist['periode']))
+    if periods is not None:
+        all_periods = all_periods.union(pd.Index(periods).dropna())
+    periods = all_periods.sort_values()
+    period_codes = periods.get_indexer(df_orders_ist['periode'])
+    cells = np.bincount(order_codes * len(periods) + period_codes,
+                        weights=df_orders_ist['wert'].to_numpy(dtype=float),
+                        minlength=len(orders) * len(periods)).reshape(len(orders), len(periods))
+
+    # Text = erster vorhandener Text je Bestellung
+    texts = df_orders_ist.dropna(subset=['text']).drop_duplicates('bestellung').set_index('bestellung')['text']
+
+    # B) Alle Bestellungen aus Ist und Obligo (wie ein Outer Join)
+    obligo = df_orders_obligo.drop_duplicates('bestellung').set_index('bestellung')
+    keys = pd.Index(orders).union(pd.Index(obligo.index)) if order is None else pd.Index(order)
+    rows = pd.Index(orders).get_indexer(keys)
+    has_ist = rows >= 0
+
+    matrix = pd.DataFrame({'bestellung': keys.to_numpy()})
+    ist_values = np.zeros((len(keys), len(periods)))
+    ist_values[has_ist] = cells[rows[has_ist]]
+    summe_ist = ist_values.sum(axis=1)
+
+    # Text: Ist-Text, sonst Obligo-Text (fehlende Werte bleiben wie bisher 0)
+    ist_text = texts.reindex(keys).to_numpy(dtype=object)
+    obligo_text = obligo['text_obligo'].reindex(keys).astype(object).fillna(0).to_numpy(dtype=object)
+    missing = pd.isna(ist_text) | (ist_text == '')
+    matrix['text'] = np.where(missing, obligo_text, ist_text)
+
+    month_cols = sorted([(i, p) for i, p in enumerate(periods) if str(p).isdigit()], key=lambda x: int(x[1]))
+    for i, period in month_cols:
+        matrix[period] = ist_values[:, i]
+
+    rest_obligo = obligo['obligo_wert'].reindex(keys).fillna(0).to_numpy(dtype=float)
+    matrix['Summe Ist'] = summe_ist
+    matrix['Rest-Obligo'] = rest_obligo
+    matrix['Auftragswert (Kalk.)'] = summe_ist + rest_obligo
+
+    if order is not None:
+        return matrix
+
+    # C) Sortieren: Bestellnummer, "Sonstiges" nach unten
+    sort_key = matrix['bestellung'].where(~matrix['bestellung'].str.contains(NO_ORDER_MARKER, regex=False), 'ZZZ')
+    return matrix.iloc[np.argsort(sort_key.to_numpy(dtype=object), kind='stable')]
@@ -0,0 +1,230 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+import metrics
+
+# --- SQL-ABFRAGEN DES COCKPITS ---
+# Alle Abfragen nutzen gebundene Parameter (:projekt) statt f-Strings:
+#  - gleicher SQL-Text bei jedem Projektwechsel -> SQLite kann das Statement wiederverwenden
+#  - exakte Treffer auf 'hauptprojekt' -> Index-Lookup statt LIKE-Scan
+#  - keine SQL-Injection über Projektnummern
+
+logger = logging.getLogger(__name__)
+
+# Vom Importer vorberechnete Summen (siehe db_importer.build_aggregates)
+SQL_PROJECTS = text("""
+    SELECT hauptprojekt FROM agg_projekt ORDER BY hauptprojekt
+""")
+
+# --- Projektsuche der Seitenleiste ---
+# Statt aller Projekte bekommt die Auswahl nur die besten Treffer zum Suchtext.
+# projekt_suche ist ein FTS5-Trigramm-Index über agg_projekt (siehe db_importer.build_project_search):
+# jedes Wort ab 3 Zeichen wird irgendwo in Projektnummer oder Beschreibung gesucht, Treffer in
+# der Projektnummer zählen mehr. Kürzere Eingaben (oder SQLite ohne FTS5) laufen über LIKE.
+PROJECT_SEARCH_LIMIT = 20
+
+SQL_PROJECT_SEARCH = text("""
+    SELECT hauptprojekt, beschreibung FROM projekt_suche
+    WHERE projekt_suche MATCH :suche
+    ORDER BY bm25(projekt_suche, 10.0, 1.0), hauptprojekt LIMIT :limit
+""")
+
+SQL_PROJECT_SEARCH_LIKE = text("""
+    SELECT hauptprojekt, beschreibung FROM agg_projekt
+    WHERE hauptprojekt LIKE :muster ESCAPE '\\' OR beschreibung LIKE :muster ESCAPE '\\'
+    ORDER BY hauptprojekt LIMIT :limit
+""")
+
+SQL_KPI = text("""
+    SELECT ist, obligo, budget FROM agg_projekt WHERE hauptprojekt = :projekt
+""")
+
+SQL_PSP = text("""
+    SELECT psp, ist as wert, obligo as obligo_wert
+    FROM agg_psp WHERE hauptprojekt = :projekt ORDER BY psp
+""")
+
+SQL_TIMELINE = text("""
+    SELECT periode, ist as wert FROM agg_periode WHERE hauptprojekt = :projekt
+""")
+
+PROJECT_QUERIES = {
+    'kpi': SQL_KPI,
+    'psp': SQL_PSP,
+    'timeline': SQL_TIMELINE,
+}
+
+# --- Portfolio: alle Hauptprojekte auf einen Blick ---
+# agg_projekt hat bereits eine Zeile je Hauptprojekt (Ist, Obligo, Budget in einem Durchlauf
+# beim Import gebildet); hier wird nur noch gelesen, kein Zugriff auf die Rohdaten.
+# Ampel-Grenzen in % Auslastung, wie die Budget-Ampel pro PSP-Element
+AMPEL_ROT = 100
+AMPEL_GELB = 80
+AMPEL_STATUS = ['🔴 Überschritten', '🟠 Kritisch', '🟢 OK', '⚪ Ohne Budget']
+
+SQL_PORTFOLIO = text("""
+    SELECT hauptprojekt, budget, ist, obligo,
+           budget - ist - obligo AS verfuegbar,
+           CASE WHEN budget > 0 THEN (ist + obligo) / budget * 100 END AS auslastung
+    FROM agg_projekt ORDER BY hauptprojekt
+""")
+
+# --- Bestell-Matrix seitenweise ---
+# Die Matrix kann zehntausende Bestellungen haben. Gezählt, gefiltert, sortiert und geblättert
+# wird in SQL (agg_bestellung), geladen werden nur die Bestellungen der sichtbaren Seite.
+ORDER_PAGE_SIZE = 50
+
+# ORDER BY lässt sich nicht binden -> feste Auswahl; 'sortierung' macht die Reihenfolge eindeutig
+ORDER_SORTS = {
+    'Bestellnummer': 'sortierung',
+    'Summe Ist': 'ist DESC, sortierung',
+    'Rest-Obligo': 'obligo DESC, sortierung',
+    'Auftragswert (Kalk.)': 'auftragswert DESC, sortierung',
+}
+
+_ORDER_FILTER = """hauptprojekt = :projekt
+      AND (bestellung LIKE :muster ESCAPE '\\' OR text LIKE :muster ESCAPE '\\')"""
+
+SQL_ORDER_COUNT = text(f"""
+    SELECT COUNT(*) AS anzahl FROM agg_bestellung WHERE {_ORDER_FILTER}
+""")
+
+SQL_ORDER_PAGES = {name: text(f"""
+    SELECT bestellung FROM agg_bestellung WHERE {_ORDER_FILTER}
+    ORDER BY {order_by} LIMIT :limit OFFSET :offset
+""") for name, order_by in ORDER_SORTS.items()}
+
+SQL_PAGE_IST = text("""
+    SELECT bestellung, periode, ist as wert, text
+    FROM agg_bestellung_ist WHERE hauptprojekt = :projekt AND bestellung IN :bestellungen
+""").bindparams(bindparam('bestellungen', expanding=True))
+
+SQL_PAGE_OBLIGO = text("""
+    SELECT bestellung, obligo as obligo_wert, text_obligo
+    FROM agg_bestellung_obligo WHERE hauptprojekt = :projekt AND bestellung IN :bestellungen
+""").bindparams(bindparam('bestellungen', expanding=True))
+
+# Ganze Matrix eines Projekts (Berichts-Export, siehe report_export.py): ohne Seiten und ohne IN-Liste
+SQL_ORDERS_ALL = {name: text(f"""
+    SELECT bestellung FROM agg_bestellung WHERE hauptprojekt = :projekt ORDER BY {order_by}
+""") for name, order_by in ORDER_SORTS.items()}
+
+SQL_ORDERS_IST = text("""
+    SELECT bestellung, periode, ist as wert, text FROM agg_bestellung_ist WHERE hauptprojekt = :projekt
+""")
+
+SQL_ORDERS_OBLIGO = text("""
+    SELECT bestellung, obligo as obligo_wert, text_obligo FROM agg_bestellung_obligo WHERE hauptprojekt = :projekt
+""")
+
+
+def run_query(con, name, statement, params=None):
+    """Führt eine Abfrage aus und protokolliert Dauer und Zeilenzahl (Log + metrics)."""
+    start = time.perf_counter()
+    df = pd.read_sql(statement, con, params=params)
+    duration_ms = (time.perf_counter() - start) * 1000
+    logger.info("Query %-14s %8.1f ms  %6d Zeilen  %s", name, duration_ms, len(df), params or '')
+    if metrics.sampled():
+        metrics.record(f'abfrage.{name}', duration_ms, len(df))
+    return df
+
+
+def load_projects(con):
+    """Alle Hauptprojekte für die Seitenleiste."""
+    return run_query(con, 'projects', SQL_PROJECTS)
+
+
+def load_portfolio(con):
+    """Budget, Ist, Obligo, Verfügbar, Auslastung und Ampel-Status aller Hauptprojekte."""
+    df = run_query(con, 'portfolio', SQL_PORTFOLIO)
+    df['status'] = ampel_status(df['auslastung'])
+    return df
+
+
+def ampel_status(auslastung):
+    """Ampel je Auslastung in % (leer = ohne Budget), Texte aus AMPEL_STATUS."""
+    auslastung = pd.Series(auslastung, dtype=float)
+    return np.select(
+        [auslastung.isna(), auslastung > AMPEL_ROT, auslastung > AMPEL_GELB],
+        [AMPEL_STATUS[3], AMPEL_STATUS[0], AMPEL_STATUS[1]],
+        default=AMPEL_STATUS[2])
+
+
+def project_totals(df_kpi):
+    """Kennzahlen eines Projekts aus dem KPI-Ergebnis: Budget, Ist, Obligo, Verfügbar, Auslastung (ohne Zeile 0)."""
+    row = df_kpi.iloc[0] if not df_kpi.empty else {}
+    totals = {name: float(row.get(name, 0.0)) for name in ('budget', 'ist', 'obligo')}
+    totals['verfuegbar'] = totals['budget'] - (totals['ist'] + totals['obligo'])
+    # Auslastung wie SQL_PORTFOLIO: nur mit Budget
+    totals['auslastung'] = ((totals['ist'] + totals['obligo']) / totals['budget'] * 100
+                            if totals['budget'] > 0 else None)
+    return totals
+
+
+def search_projects(con, search='', limit=PROJECT_SEARCH_LIMIT):
+    """Die besten Treffer (hauptprojekt, beschreibung) zum Suchtext; ohne Suchtext die ersten Projekte."""
+    words = (search or '').split()
+    if words and all(len(word) >= 3 for word in words):
+        # Jedes Wort als Phrase (Sonderzeichen wörtlich), mehrere Wörter = alle müssen vorkommen
+        match = ' '.join('"' + word.replace('"', '""') + '"' for word in words)
+        try:
+            return run_query(con, 'project_search', SQL_PROJECT_SEARCH, {'suche': match, 'limit': limit})
+        except OperationalError:
+            pass  # kein Suchindex in dieser Datenbank -> LIKE
+    params = {'muster': search_pattern(search), 'limit': limit}
+    return run_query(con, 'project_like', SQL_PROJECT_SEARCH_LIKE, params)
+
+
+def load_project_data(con, project):
+    """Alle Summen eines Projekts (KPI, PSP, Zeitverlauf, Bestellungen) über eine Verbindung."""
+    params = {'projekt': project}
+    if isinstance(con, Engine):
+        with con.connect() as conn:
+            return load_project_data(conn, project)
+    return {name: run_query(con, name, stmt, params) for name, stmt in PROJECT_QUERIES.items()}
+
+
+def search_pattern(search):
+    """Suchtext -> LIKE-Muster für 'enthält'; % und _ der Eingabe gelten wörtlich."""
+    escaped = (search or '').strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def count_orders(con, project, search=''):
+    """Anzahl der Bestellungen eines Projekts (nach Suchfilter) für die Seitenzahl."""
+    params = {'projekt': project, 'muster': search_pattern(search)}
+    return int(run_query(con, 'order_count', SQL_ORDER_COUNT, params)['anzahl'].iloc[0])
+
+
+def load_order_page(con, project, page=0, page_size=ORDER_PAGE_SIZE, sort='Bestellnummer', search=''):
+    """
+    Eine Seite der Bestell-Matrix: die Bestellnummern der Seite (sortiert/gefiltert in SQL)
+    und nur deren Ist je Periode und Obligo.
+    """
+    if isinstance(con, Engine):
+        with con.connect() as conn:
+            return load_order_page(conn, project, page, page_size, sort, search)
+    params = {'projekt': project, 'muster': search_pattern(search), 'limit': page_size, 'offset': page * page_size}
+    orders = run_query(con, 'order_page', SQL_ORDER_PAGES[sort], params)['bestellung'].tolist()
+    params = {'projekt': project, 'bestellungen': orders}
+    return {
+        'orders': orders,
+        'orders_ist': run_query(con, 'page_ist', SQL_PAGE_IST, params),
+        'orders_obligo': run_query(con, 'page_obligo', SQL_PAGE_OBLIGO, params),
+    }
+
+
+def load_orders(con, project, sort='Bestellnummer'):
+    """Alle Bestellungen eines Projekts in der Form von load_order_page (für Exporte statt Seiten)."""
+    params = {'projekt': project}
+    return {
+        'orders': run_query(con, 'orders_all', SQL_ORDERS_ALL[sort], params)['bestellung'].tolist(),
+        'orders_ist': run_query(con, 'orders_ist', SQL_ORDERS_IST, params),
+        'orders_obligo': run_query(con, 'orders_obligo', SQL_ORDERS_OBLIGO, params),
+    }
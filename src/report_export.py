@@ -0,0 +1,375 @@
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.request import pathname2url
+
+import pandas as pd
+import sentry_sdk
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+import metrics
+import queries
+from order_matrix import build_order_matrix
+
+# --- SENTRY MONITORING ---
+# Für Abgabe via ZIP ist der Key hardcodiert
+sentry_sdk.init(
+    dsn="https://b9a777fa97d28f7260385b4052a44486@o4510688530137088.ingest.de.sentry.io/4510688535576656",
+    # Nur Fehler melden; Laufzeiten werden lokal gemessen (metrics.py). Tracing bei Bedarf per Umgebungsvariable.
+    traces_sample_rate=float(os.environ.get('SENTRY_TRACES_SAMPLE_RATE', '0')),
+)
+
+# --- MONATSABSCHLUSS: BERICHT JE PROJEKT OHNE STREAMLIT ---
+# Je Hauptprojekt eine Datei mit Kennzahlen, PSP-Tabelle und Bestell-Matrix, aus denselben
+# Abfragen wie das Cockpit (queries.py) und derselben Matrix-Logik (order_matrix.py).
+# - Parallel: Projekte laufen in einem Prozess-Pool. Jeder Worker öffnet die Datenbank beim Start
+#   einmal schreibgeschützt und nutzt diese eine Verbindung für alle seine Projekte.
+# - Fortsetzen: Berichte landen in <ausgabe>/stand_<Import-Generation>/ und werden erst nach dem
+#   vollständigen Schreiben umbenannt. Ein erneuter Aufruf überspringt fertige Berichte und macht
+#   nach einem Abbruch dort weiter; ein neuer Import ergibt einen neuen Stand-Ordner.
+# - Formate: xlsx (openpyxl, ohne Formatvorlagen im Speicher) oder pdf (eingebauter Text-Satz in
+#   Courier, ohne weitere Bibliothek; zu breite Tabellen werden in Spaltenblöcke umbrochen).
+
+DB_NAME = 'finanzdaten.db'
+OUTPUT_DIR = 'berichte'
+FORMATS = ('xlsx', 'pdf')
+# Standard: ein Prozess je CPU-Kern (die Arbeit je Projekt ist vor allem Excel/PDF schreiben)
+EXPORT_WORKERS = os.cpu_count() or 1
+# Fortschritt alle N fertigen Projekte ausgeben
+PROGRESS_EVERY = 100
+
+# Excel-Zahlenformate
+EXCEL_AMOUNT_FORMAT = '#,##0.00 "€"'
+EXCEL_PERCENT_FORMAT = '0.0 "%"'
+
+# PDF: A4 quer in Punkt, Courier hat feste Zeichenbreite (0,6 x Schriftgröße)
+PDF_PAGE_SIZE = (842, 595)
+PDF_MARGIN = 36
+PDF_FONT_SIZE = 7
+PDF_LEADING = 8.5
+PDF_TEXT_WIDTH = 40  # Bestelltexte werden im PDF gekürzt
+
+# Verbindung des Worker-Prozesses (siehe _init_worker)
+_worker_conn = None
+
+
+def connect_readonly(db_path):
+    """Eine schreibgeschützte Verbindung (SQLite mode=ro): Exporte können die Datenbank nicht sperren oder ändern."""
+    uri = f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+    engine = create_engine('sqlite://', creator=lambda: sqlite3.connect(uri, uri=True, check_same_thread=False),
+                           poolclass=StaticPool)
+    return engine.connect()
+
+
+def _init_worker(db_path):
+    global _worker_conn
+    _worker_conn = connect_readonly(db_path)
+
+
+def db_generation(conn):
+    """Import-Generation (PRAGMA user_version), wie der Cache-Schlüssel des Cockpits."""
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def report_path(out_dir, project, fmt):
+    """Dateiname je Projekt; Zeichen außer Buchstaben, Ziffern, '.', '-' und '_' werden zu '_'."""
+    name = re.sub(r'[^\w.-]', '_', project)
+    return os.path.join(out_dir, f"{name}.{fmt}")
+
+
+# --- BERICHTSINHALT ---
+
+def build_report(conn, project):
+    """
+    Bericht eines Projekts als Tabellen (wie die Cockpit-Ansicht Einzelprojekt):
+      kennzahlen:  Kennzahl, Wert (Budget, Ist, Obligo, Verfügbar, Auslastung) und Ampel
+      psp:         PSP-Element, Ist, Obligo, Gesamtaufwand, Auslastung %
+      bestellungen: Bestell-Matrix aller Bestellungen (build_order_matrix)
+    """
+    data = queries.load_project_data(conn, project)
+    totals = queries.project_totals(data['kpi'])
+    kennzahlen = pd.DataFrame({
+        'Kennzahl': ['Budget', 'Ist-Kosten', 'Obligo', 'Verfügbar', 'Auslastung %'],
+        'Wert': [totals['budget'], totals['ist'], totals['obligo'], totals['verfuegbar'], totals['auslastung']],
+    })
+
+    psp = data['psp'].rename(columns={'psp': 'PSP-Element', 'wert': 'Ist', 'obligo_wert': 'Obligo'})
+    psp['Gesamtaufwand'] = psp['Ist'] + psp['Obligo']
+    psp['Auslastung %'] = psp['Gesamtaufwand'] / totals['budget'] * 100 if totals['budget'] > 0 else None
+
+    orders = queries.load_orders(conn, project)
+    matrix = build_order_matrix(orders['orders_ist'], orders['orders_obligo'], order=orders['orders'],
+                                periods=data['timeline']['periode'])
+    return {
+        'projekt': project,
+        'ampel': queries.ampel_status([totals['auslastung']])[0],
+        'kennzahlen': kennzahlen,
+        'psp': psp,
+        'bestellungen': matrix.rename(columns={'bestellung': 'Bestellung', 'text': 'Text'}),
+    }
+
+
+def _is_percent(column):
+    return str(column).endswith('%')
+
+
+# --- EXCEL ---
+
+def _number_cell(ws, value, number_format):
+    if pd.isna(value):
+        return None
+    cell = WriteOnlyCell(ws, value=float(value))
+    cell.number_format = number_format
+    return cell
+
+
+def _write_sheet(wb, title, df):
+    """Ein Blatt im Write-only-Modus (Zeile für Zeile, kein Zellgitter im Speicher)."""
+    ws = wb.create_sheet(title)
+    ws.freeze_panes = 'A2'
+    ws.append(list(map(str, df.columns)))
+    number_formats = [(EXCEL_PERCENT_FORMAT if _is_percent(col) else EXCEL_AMOUNT_FORMAT)
+                      if pd.api.types.is_numeric_dtype(df[col]) else None for col in df.columns]
+    for values in df.itertuples(index=False, name=None):
+        ws.append([_number_cell(ws, value, number_format) if number_format else value
+                   for value, number_format in zip(values, number_formats)])
+    return ws
+
+
+def write_excel(report, path):
+    """Drei Blätter: Kennzahlen (mit Ampel), PSP, Bestell-Matrix."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Kennzahlen')
+    ws.column_dimensions['A'].width = 16
+    ws.column_dimensions['B'].width = 22
+    ws.append(['Projekt', report['projekt']])
+    for name, value in zip(report['kennzahlen']['Kennzahl'], report['kennzahlen']['Wert']):
+        ws.append([name, _number_cell(ws, value, EXCEL_PERCENT_FORMAT if _is_percent(name) else EXCEL_AMOUNT_FORMAT)])
+    ws.append(['Ampel', report['ampel']])
+    _write_sheet(wb, 'PSP', report['psp']).column_dimensions['A'].width = 24
+    # Monate ohne Buchung bleiben leer statt 0: lesbarer und je Zelle ein Drittel der Schreibzeit
+    matrix = report['bestellungen']
+    months = [col for col in matrix.columns if str(col).isdigit()]
+    matrix = matrix.assign(**{col: matrix[col].where(matrix[col] != 0) for col in months})
+    _write_sheet(wb, 'Bestell-Matrix', matrix).column_dimensions['B'].width = PDF_TEXT_WIDTH
+    wb.save(path)
+
+
+# --- PDF ---
+
+def _german_number(value, decimals=2):
+    if pd.isna(value):
+        return ''
+    return f"{value:,.{decimals}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _text_columns(df):
+    """Jede Spalte als gleich breite Textzeilen (Kopf + Werte): Zahlen deutsch und rechtsbündig, Text gekürzt."""
+    columns = []
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            cells = [_german_number(v, 1 if _is_percent(col) else 2) for v in df[col].tolist()]
+            align = str.rjust
+        else:
+            cells = ['' if pd.isna(v) else str(v)[:PDF_TEXT_WIDTH] for v in df[col].tolist()]
+            align = str.ljust
+        width = max([len(str(col))] + [len(c) for c in cells])
+        columns.append([align(str(col), width)] + [align(c, width) for c in cells])
+    return columns
+
+
+def text_table(df, max_chars):
+    """Tabelle als Textzeilen; zu breite Tabellen in Spaltenblöcke, die erste Spalte steht in jedem Block."""
+    columns = _text_columns(df)
+    if not columns:
+        return []
+    lines, block = [], [columns[0]]
+    for column in columns[1:] + [None]:
+        width = sum(len(c[0]) + 2 for c in block) + (len(column[0]) if column else 0)
+        if column is not None and (width <= max_chars or len(block) == 1):
+            block.append(column)
+            continue
+        if lines:
+            lines.append('')
+        lines.extend('  '.join(parts) for parts in zip(*block))
+        block = [columns[0], column]
+    return lines
+
+
+def report_lines(report, max_chars):
+    totals = report['kennzahlen']
+    lines = [f"Projektbericht {report['projekt']}", '']
+    for name, value in zip(totals['Kennzahl'], totals['Wert']):
+        value = f"{_german_number(value, 1)} %" if _is_percent(name) else f"{_german_number(value)} €"
+        lines.append(f"  {name:<14} {value:>22}")
+    # Ampel-Symbol gibt es in der PDF-Standardschrift nicht, nur der Text
+    ampel = report['ampel'].encode('cp1252', errors='ignore').decode('cp1252').strip()
+    lines += [f"  {'Ampel':<14} {ampel:>22}", '', 'PSP-Elemente', '']
+    lines += text_table(report['psp'], max_chars)
+    lines += ['', f"Bestell-Matrix ({len(report['bestellungen'])} Bestellungen)", '']
+    lines += text_table(report['bestellungen'], max_chars)
+    return lines
+
+
+def _pdf_string(line):
+    raw = line.encode('cp1252', errors='replace')
+    return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def pdf_document(lines):
+    """Minimales PDF (Courier, WinAnsi für Umlaute und €) aus Textzeilen, Seitenumbruch nach Zeilenzahl."""
+    page_width, page_height = PDF_PAGE_SIZE
+    per_page = int((page_height - 2 * PDF_MARGIN) / PDF_LEADING)
+    pages = [lines[i:i + per_page] for i in range(0, len(lines), per_page)] or [[]]
+    n_pages = len(pages)
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % (4 + 2 * i) for i in range(n_pages))
+        + b'] /Count %d >>' % n_pages,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    ]
+    for i, page in enumerate(pages):
+        stream = b'BT /F1 %d Tf %g TL %d %d Td\n' % (
+            PDF_FONT_SIZE, PDF_LEADING, PDF_MARGIN, page_height - PDF_MARGIN - PDF_FONT_SIZE)
+        stream += b''.join(_pdf_string(line) + b' Tj T*\n' for line in page)
+        stream += b'ET'
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> '
+                       b'/Contents %d 0 R >>' % (page_width, page_height, 5 + 2 * i))
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+
+    out, offsets = bytearray(b'%PDF-1.4\n'), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def write_pdf(report, path):
+    """Kennzahlen, PSP-Tabelle und Bestell-Matrix als Text-PDF (A4 quer)."""
+    max_chars = int((PDF_PAGE_SIZE[0] - 2 * PDF_MARGIN) / (0.6 * PDF_FONT_SIZE))
+    with open(path, 'wb') as f:
+        f.write(pdf_document(report_lines(report, max_chars)))
+
+
+WRITERS = {'xlsx': write_excel, 'pdf': write_pdf}
+
+
+# --- EXPORT-LAUF ---
+
+def export_project(project, path, fmt, conn=None):
+    """Ein Bericht (im Worker über dessen Verbindung). Erst temporär schreiben, dann umbenennen."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with metrics.stage('bericht.projekt', detail=project) as m:
+            report = build_report(conn or _worker_conn, project)
+            WRITERS[fmt](report, tmp_path)
+            m['zeilen'] = len(report['bestellungen'])
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return project, metrics.drain()
+
+
+def run_export(db_path=None, out_dir=None, fmt='xlsx', workers=EXPORT_WORKERS, projects=None, force=False):
+    """
+    Berichte für alle (oder die angegebenen) Projekte. Fertige Berichte des aktuellen Stands werden
+    übersprungen (force=True schreibt neu). Ein fehlerhaftes Projekt bricht den Lauf nicht ab.
+    Rückgabe: {'ordner', 'erstellt', 'uebersprungen', 'fehler', 'sekunden'}
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unbekanntes Format '{fmt}', erlaubt: {', '.join(FORMATS)}")
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    db_path = db_path or os.path.join(base_dir, DB_NAME)
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Datenbank nicht gefunden: {db_path} (zuerst db_importer.py ausführen)")
+    start = time.perf_counter()
+
+    with connect_readonly(db_path) as conn:
+        generation = db_generation(conn)
+        all_projects = queries.load_projects(conn)['hauptprojekt'].tolist()
+    if projects:
+        unknown = sorted(set(projects) - set(all_projects))
+        if unknown:
+            print(f"⚠️  Unbekannte Projekte übersprungen: {', '.join(unknown)}")
+        all_projects = [p for p in all_projects if p in set(projects)]
+
+    target_dir = os.path.join(out_dir or os.path.join(base_dir, OUTPUT_DIR), f"stand_{generation}")
+    os.makedirs(target_dir, exist_ok=True)
+    # Reste eines abgebrochenen Laufs
+    for tmp_path in glob.glob(os.path.join(target_dir, '*.tmp')):
+        os.remove(tmp_path)
+
+    paths = {p: report_path(target_dir, p, fmt) for p in all_projects}
+    todo = [p for p in all_projects if force or not os.path.exists(paths[p])]
+    stats = {'ordner': target_dir, 'erstellt': 0, 'uebersprungen': len(all_projects) - len(todo), 'fehler': []}
+    print(f"📄 {len(all_projects)} Projekte, Stand {generation} -> {target_dir}")
+    if stats['uebersprungen']:
+        print(f"   ⏩ {stats['uebersprungen']} Bericht(e) schon vorhanden, übersprungen")
+
+    def finished(project, error=None, worker_metrics=None):
+        if error is not None:
+            sentry_sdk.capture_exception(error)
+            print(f"   ❌ {project}: {error}")
+            stats['fehler'].append(project)
+        else:
+            metrics.extend(worker_metrics)
+            stats['erstellt'] += 1
+        done = stats['erstellt'] + len(stats['fehler'])
+        if done % PROGRESS_EVERY == 0 and done < len(todo):
+            print(f"   … {done}/{len(todo)} ({time.perf_counter() - start:.0f} s)")
+
+    workers = max(1, min(workers, len(todo)))
+    if workers == 1:
+        with connect_readonly(db_path) as conn:
+            for project in todo:
+                try:
+                    _, worker_metrics = export_project(project, paths[project], fmt, conn=conn)
+                except Exception as e:
+                    finished(project, error=e)
+                    continue
+                finished(project, worker_metrics=worker_metrics)
+    elif todo:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_path,)) as pool:
+            futures = {pool.submit(export_project, p, paths[p], fmt): p for p in todo}
+            for future in as_completed(futures):
+                try:
+                    _, worker_metrics = future.result()
+                except Exception as e:
+                    finished(futures[future], error=e)
+                    continue
+                finished(futures[future], worker_metrics=worker_metrics)
+
+    with connect_readonly(db_path) as conn:
+        if db_generation(conn) != generation:
+            print(f"⚠️  Während des Exports lief ein Import (Stand {generation} -> {db_generation(conn)}). "
+                  "Berichte erneut erzeugen.")
+    stats['sekunden'] = time.perf_counter() - start
+    metrics.flush(os.path.dirname(db_path))
+    errors = f", {len(stats['fehler'])} Fehler" if stats['fehler'] else ''
+    print(f"✅ {stats['erstellt']} Bericht(e) in {stats['sekunden']:.1f} s erstellt{errors}.")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Erzeugt je Hauptprojekt einen Bericht aus finanzdaten.db")
+    parser.add_argument('--format', choices=FORMATS, default='xlsx', help="Dateiformat (Standard: xlsx)")
+    parser.add_argument('--out', help=f"Ausgabeordner (Standard: '{OUTPUT_DIR}/' im Projektordner)")
+    parser.add_argument('--workers', type=int, default=EXPORT_WORKERS,
+                        help=f"Parallele Prozesse mit je einer Lese-Verbindung (Standard: {EXPORT_WORKERS})")
+    parser.add_argument('--projekte', nargs='+', help="Nur diese Hauptprojekte exportieren")
+    parser.add_argument('--force', action='store_true', help="Vorhandene Berichte des Stands neu schreiben")
+    args = parser.parse_args()
+    run_export(out_dir=args.out, fmt=args.format, workers=args.workers, projects=args.projekte, force=args.force)
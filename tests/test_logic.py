@@ -3,17 +3,22 @@ import pandas as pd
 import sys
 import os
 import sqlite3
+from sqlalchemy import create_engine
 from streamlit.testing.v1 import AppTest
 
 # Pfad zu src hinzufügen
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
 # Echte Funktion importieren
 try:
-    from src.db_importer import clean_currency_string
+    from src.db_importer import clean_currency_string, clean_currency_series, run_import, watch
 except ImportError:
     # Fallback für Tests, falls Import scheitert
     def clean_currency_string(val): return 0.0
+    def clean_currency_series(col): return col.apply(clean_currency_string)
+    run_import = None
+    watch = None
 
 # --- TEST 1: Währungsumrechnung (Kritisch!) ---
 def test_currency_conversion():
@@ -23,6 +28,19 @@ def test_currency_conversion():
     assert clean_currency_string("1000.50") == 1000.50  # Englisches Format
     assert clean_currency_string(None) == 0.0
 
+# --- TEST 1b: Vektorisierte Währungsumrechnung ---
+def test_currency_series_matches_scalar():
+    """Die Spalten-Variante muss exakt dieselben Werte liefern wie clean_currency_string."""
+    values = ['1.000,00', '1000.50', '-2.500,75', ' 42 ', '', None, float('nan'),
+              'Müll', 'n.v.', '1,2,3', '1_000', 'nan', '1e3', '.5', 12, 3.5,
+              '. 5,0', ',2\x1f.\x1c ', '\x1c.\x1f ,7', '7\u066359,\x1c.']
+    col = pd.Series(values, dtype=object)
+    expected = [clean_currency_string(v) for v in values]
+    result = clean_currency_series(col).tolist()
+    assert len(result) == len(expected)
+    for got, exp in zip(result, expected):
+        assert got == exp or (pd.isna(got) and pd.isna(exp))
+
 # --- TEST 2: Budget Berechnung ---
 def test_budget_logic():
     """Prüft die Formel: Verfügbar = Budget - (Ist + Obligo)"""
@@ -59,9 +77,833 @@ def test_database_connection():
     assert df['betrag'][0] == 99.50
     conn.close()
 
+# --- TEST 4b: Inkrementeller Import ---
+def test_incremental_import(tmp_path, capsys):
+    """Unveränderte Dateien werden übersprungen, geänderte bauen nur ihre Tabelle neu."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'CJI3_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Periode\nG.011803001.02.02;1.000,50;1\n", encoding='latin1')
+    (data_dir / 'CJI5_2025.csv').write_text(
+        "Objekt;Wert/BWähr\nG.011803001.02.02;300,00\n", encoding='latin1')
+    db_file = str(tmp_path / 'test.db')
+
+    run_import(str(data_dir), db_file)
+    capsys.readouterr()
+
+    (data_dir / 'CJI5_2025.csv').write_text(
+        "Objekt;Wert/BWähr\nG.011803001.02.02;300,00\nG.011803001.02.03;50,00\n", encoding='latin1')
+    run_import(str(data_dir), db_file)
+    out = capsys.readouterr().out
+
+    assert "'ist_kosten' unverändert" in out
+    assert "CJI5_2025.csv' -> 'obligo_cji5'" in out
+
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT COUNT(*) FROM obligo_cji5").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM import_manifest").fetchone()[0] == 2
+    # Import-Generation (Cache-Schlüssel des Dashboards): zwei Importe mit Änderungen
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    conn.close()
+
+    # Ohne Änderungen bleibt die Generation stehen -> Caches bleiben gültig
+    run_import(str(data_dir), db_file)
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    conn.close()
+
+# --- TEST 4c: Streaming-Import in Blöcken ---
+def test_chunked_import_matches_full_read(tmp_path):
+    """Blockweises Einlesen muss dieselbe Tabelle ergeben wie das Einlesen am Stück."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    lines = ["Objekt;Wert/BWähr;Periode"] + [f"G.0118030{i % 3:02d}.01;{i}.000,{i % 100:02d};{i % 12 + 1}" for i in range(25)]
+    (data_dir / 'CJI3_2025.csv').write_text("\n".join(lines) + "\n", encoding='latin1')
+
+    run_import(str(data_dir), str(tmp_path / 'full.db'), chunksize=0)
+    run_import(str(data_dir), str(tmp_path / 'chunked.db'), chunksize=4)
+
+    full = pd.read_sql("SELECT * FROM ist_kosten", sqlite3.connect(tmp_path / 'full.db'))
+    chunked = pd.read_sql("SELECT * FROM ist_kosten", sqlite3.connect(tmp_path / 'chunked.db'))
+    assert len(chunked) == 25
+    pd.testing.assert_frame_equal(full, chunked)
+
+# --- TEST 4d: Paralleler Import ---
+def test_parallel_import_matches_serial(tmp_path):
+    """Der Prozess-Pool muss dieselben Tabellen schreiben wie der serielle Import."""
+    import openpyxl
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'CJI3_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Periode\nG.011803001.02.02;1.000,50;1\nG.011803002.01;200;2\n", encoding='latin1')
+    (data_dir / 'CJI5_2025.csv').write_text(
+        "Objekt;Wert/BWähr\nG.011803001.02.02;300,00\n", encoding='latin1')
+    (data_dir / 'CNB1_kaputt.csv').write_bytes(b'a;b\n"x;1\n')
+    # Excel-Quelle mit eigener Spaltenauswahl: jeder Worker bekommt die Auswahl seiner Tabelle
+    wb = openpyxl.Workbook()
+    wb.active.append(['LV-Übersicht'])
+    wb.active.append(['LV-Nummer', 'Projektnummer', 'Betrag', 'Status'])
+    wb.active.append(['LV 1', 'G.011803001', '1.000,00', 'offen'])
+    wb.save(data_dir / 'LV-Übersicht_2025.xlsx')
+
+    run_import(str(data_dir), str(tmp_path / 'serial.db'), workers=1)
+    run_import(str(data_dir), str(tmp_path / 'parallel.db'), workers=2, chunksize=1)
+
+    for table in ['ist_kosten', 'obligo_cji5', 'vertraege_uebersicht']:
+        serial = pd.read_sql(f"SELECT * FROM {table}", sqlite3.connect(tmp_path / 'serial.db'))
+        parallel = pd.read_sql(f"SELECT * FROM {table}", sqlite3.connect(tmp_path / 'parallel.db'))
+        pd.testing.assert_frame_equal(serial, parallel)
+
+# --- TEST 4e: Typisiertes Schema & Indizes ---
+def test_import_creates_typed_schema_and_indexes(tmp_path):
+    """Finanz-Spalten sind REAL, Filter-Spalten indiziert, die Cockpit-Abfragen nutzen die Indizes."""
+    from sqlalchemy import text
+    from src import queries
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    # 40 Projekte: bei nur einer Zeile je Tabelle würde der Planer nach ANALYZE zu Recht scannen
+    lines = ["Objekt;Wert/BWähr;Periode;Einkaufsbeleg"] + [
+        f"G.0118030{p:02d}.0{i % 3}.01;1.000,50;{i % 12 + 1};45{p:02d}{i % 5}" for p in range(40) for i in range(10)]
+    (data_dir / 'CJI3_2025.csv').write_text("\n".join(lines) + "\n", encoding='latin1')
+    db_file = tmp_path / 'test.db'
+    run_import(str(data_dir), str(db_file))
+
+    conn = sqlite3.connect(db_file)
+    types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(ist_kosten)")}
+    assert types['wert/bwähr'] == 'REAL'
+    assert types['objekt'] == 'TEXT'
+
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(ist_kosten)")}
+    for col in ['hauptprojekt', 'objekt', 'periode', 'einkaufsbeleg']:
+        assert f"idx_ist_kosten_{col}" in indexes
+
+    conn.close()
+
+    # Projektwechsel: die echten Abfragen aus queries.py, wie sie der Planer von sich aus ausführt
+    engine = create_engine(f'sqlite:///{db_file}')
+    params = {'projekt': 'G.011803001', 'muster': '%', 'limit': 50, 'offset': 0}
+    statements = {**queries.PROJECT_QUERIES, 'anzahl': queries.SQL_ORDER_COUNT,
+                  'seite': queries.SQL_ORDER_PAGES['Bestellnummer']}
+    with engine.connect() as con:
+        for name, statement in statements.items():
+            plan = [row[-1] for row in con.execute(text(f"EXPLAIN QUERY PLAN {statement.text}"), params)]
+            assert not any(step.startswith('SCAN') for step in plan), (name, plan)
+            assert any(step.startswith('SEARCH') and '(hauptprojekt=?)' in step for step in plan), (name, plan)
+    engine.dispose()
+
+# --- TEST 4f: Summen-Tabellen ---
+def test_import_builds_aggregates(tmp_path):
+    """Die Summen-Tabellen müssen zu den Rohdaten passen (Projekt, PSP, Periode, Bestellung)."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'CJI3_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Periode;Einkaufsbeleg;Bezeichnung\n"
+        "G.011803001.02.02;1.000,50;1;4500;Bau\n"
+        "G.011803001.02.02;500,00;2;4500;\n"
+        "G.011803001.03.01;100,00;2;;Sonstiges\n"
+        "G.011803002.01.01;50,00;1;4600;Fremd\n", encoding='latin1')
+    (data_dir / 'CJI5_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Nr_Referenzbeleg;Bezeichnung\nG.011803001.02.02;300,00;4500;Obligo\n", encoding='latin1')
+    db_file = tmp_path / 'test.db'
+    run_import(str(data_dir), str(db_file))
+
+    conn = sqlite3.connect(db_file)
+    assert conn.execute(
+        "SELECT ist, obligo FROM agg_projekt WHERE hauptprojekt = 'G.011803001'").fetchone() == (1600.5, 300.0)
+    assert conn.execute(
+        "SELECT ist, obligo FROM agg_psp WHERE psp = 'G.011803001.02.02'").fetchone() == (1500.5, 300.0)
+    assert dict(conn.execute(
+        "SELECT periode, ist FROM agg_periode WHERE hauptprojekt = 'G.011803001'").fetchall()) == {'1': 1000.5, '2': 600.0}
+    orders = conn.execute(
+        "SELECT bestellung, TOTAL(ist), MAX(text) FROM agg_bestellung_ist "
+        "WHERE hauptprojekt = 'G.011803001' GROUP BY bestellung").fetchall()
+    assert sorted(orders) == [('4500', 1500.5, 'Bau'), ('Sonstiges / Ohne Bestellung', 100.0, 'Sonstiges')]
+    conn.close()
+
+# --- TEST 4g: Parametrisierte Cockpit-Abfragen ---
+def test_queries_use_bound_parameters(tmp_path):
+    """queries.py liefert die Projektdaten; Projektnummern werden nie in den SQL-Text eingesetzt."""
+    from src.queries import load_projects, load_project_data
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'CJI3_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Periode;Einkaufsbeleg;Bezeichnung\nG.011803001.02.02;1.000,50;1;4500;Bau\n", encoding='latin1')
+    db_file = tmp_path / 'test.db'
+    run_import(str(data_dir), str(db_file))
+    engine = create_engine(f'sqlite:///{db_file}')
+
+    assert load_projects(engine)['hauptprojekt'].tolist() == ['G.011803001']
+    data = load_project_data(engine, 'G.011803001')
+    assert data['kpi']['ist'].iloc[0] == 1000.5
+    assert data['psp']['psp'].tolist() == ['G.011803001.02.02']
+
+    # Sonderzeichen sind nur ein Wert, kein SQL
+    data = load_project_data(engine, "x' OR '1'='1")
+    assert all(df.empty for df in data.values())
+    engine.dispose()
+
+# --- TEST 4h: Spaltenorientierter Speicher (Parquet) ---
+def test_parquet_store_matches_sqlite(tmp_path, monkeypatch):
+    """Das Parquet-Dataset liefert pro Projekt dieselben Summen wie die SQLite-Abfragen (eine Datei je Partition)."""
+    from src.queries import load_project_data
+    import columnar_store
+    monkeypatch.setattr(columnar_store, 'EXPORT_CHUNK_SIZE', 2)
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'CJI3_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Periode;Einkaufsbeleg;Bezeichnung\n"
+        "G.011803001.02.02;1.000,50;1;4500;Bau\n"
+        "G.011803001.02.03;200,00;2;;Reise\n"
+        "G.011803001.02.02;50,00;2;4500;Bau Nachtrag\n"
+        "G.022222222.01;7,00;1;4600;Anderes\n", encoding='latin1')
+    (data_dir / 'CJI5_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Nr. Referenzbeleg;Bezeichnung\nG.011803001.02.02;300,00;4500;Rahmen\n", encoding='latin1')
+    db_file = tmp_path / 'test.db'
+    # Das Dataset ist fertig, bevor andere Verbindungen die neue Import-Generation sehen
+    export = columnar_store.export_from_sqlite
+    seen = []
+    def export_and_check(conn, out_dir):
+        with sqlite3.connect(db_file) as other:
+            seen.append(other.execute("PRAGMA user_version").fetchone()[0])
+        export(conn, out_dir)
+    monkeypatch.setattr(columnar_store, 'export_from_sqlite', export_and_check)
+    run_import(str(data_dir), str(db_file), storage='parquet')
+    with sqlite3.connect(db_file) as conn:
+        assert seen == [0] and conn.execute("PRAGMA user_version").fetchone()[0] == 1
+    root = columnar_store.parquet_dir(str(tmp_path))
+    assert os.path.isdir(os.path.join(root, 'ist_kosten', 'hauptprojekt=G.011803001'))
+    # Mehrere Blöcke, trotzdem genau eine Datei je Projekt
+    for table_name in ['ist_kosten', 'obligo_cji5']:
+        for partition in os.listdir(os.path.join(root, table_name)):
+            assert len(os.listdir(os.path.join(root, table_name, partition))) == 1
+
+    engine = create_engine(f'sqlite:///{db_file}')
+    expected = load_project_data(engine, 'G.011803001')
+    engine.dispose()
+    actual = columnar_store.load_project_data(root, 'G.011803001')
+
+    def normalized(df, keys):
+        return df.sort_values(keys).reset_index(drop=True).astype(object)
+
+    for name, keys in [('kpi', ['ist']), ('psp', ['psp']), ('timeline', ['periode'])]:
+        pd.testing.assert_frame_equal(normalized(actual[name], keys), normalized(expected[name], keys),
+                                      check_dtype=False)
+
+# --- TEST 4i: Synthetische SAP-Exporte (Benchmark-Generator) ---
+def test_generated_exports_import_cleanly(tmp_path):
+    """Die erzeugten Exporte laufen durch run_import; Summen und Projekte stimmen mit dem Generator überein."""
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+    from sap_generator import generate_exports
+    info = generate_exports(str(tmp_path / 'data'), ist_rows=2_000, n_projects=5, n_periods=24)
+    db_file = tmp_path / 'test.db'
+    stats = run_import(str(tmp_path / 'data'), str(db_file))
+
+    assert set(stats) == {'ist_kosten', 'obligo_cji5', 'obligo_banf', 'obligo_bestell', 'vertraege_uebersicht'}
+    assert stats['ist_kosten']['zeilen'] == 2_000
+    with sqlite3.connect(db_file) as conn:
+        projekte = [row[0] for row in conn.execute("SELECT hauptprojekt FROM agg_projekt ORDER BY 1")]
+        ist, budget = conn.execute("SELECT SUM(ist), SUM(budget) FROM agg_projekt").fetchone()
+        perioden = conn.execute("SELECT COUNT(DISTINCT periode) FROM ist_kosten").fetchone()[0]
+    assert projekte == sorted(info['projekte'])
+    assert ist == pytest.approx(info['ist_summe'])
+    assert budget > 0
+    assert perioden == 12
+
+# --- TEST 4j: Bestell-Matrix (vektorisiert) ---
+def test_order_matrix_matches_legacy():
+    """build_order_matrix liefert dieselbe Matrix wie die bisherige pivot/merge/apply-Variante."""
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+    from bench_order_matrix import legacy_order_matrix, make_orders
+    from src.order_matrix import build_order_matrix
+
+    ist = pd.DataFrame({
+        'bestellung': ['4500', '4500', 'Sonstiges / Ohne Bestellung', '4600', '4700', '4500'],
+        'periode': ['1', '2', '10', '2', 'X', '1'],
+        'wert': [100.0, 50.0, 7.5, 20.0, 3.0, 1.0],
+        'text': ['Bau', 'Bau', 'Unbekannt', '', None, 'Bau'],
+    })
+    obligo = pd.DataFrame({
+        'bestellung': ['4500', '4600', '4800', ''],
+        'obligo_wert': [300.0, 10.0, 5.0, 1.0],
+        'text_obligo': ['Rahmen', 'Nachtrag', None, 'Leer'],
+    })
+    result = build_order_matrix(ist, obligo)
+    pd.testing.assert_frame_equal(result, legacy_order_matrix(ist, obligo), check_dtype=False, check_column_type=False)
+    assert result['bestellung'].iloc[-1] == 'Sonstiges / Ohne Bestellung'
+    assert list(result.columns) == ['bestellung', 'text', '1', '2', '10', 'Summe Ist', 'Rest-Obligo', 'Auftragswert (Kalk.)']
+
+    ist, obligo = make_orders(500, 24)
+    pd.testing.assert_frame_equal(build_order_matrix(ist, obligo), legacy_order_matrix(ist, obligo),
+                                  check_dtype=False, check_column_type=False)
+
+# --- TEST 4k: Bestell-Matrix seitenweise aus SQL ---
+def test_order_pages_match_full_matrix(tmp_path):
+    """Alle Seiten hintereinander ergeben die komplette Matrix; Suche und Sortierung laufen in SQL."""
+    from src import queries
+    from src.order_matrix import build_order_matrix
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    rows = ["G.011803001.01;{},00;{};{};Text {}".format(i + 1, i % 3 + 1, 4500 + i % 7 if i % 5 else '', i)
+            for i in range(40)]
+    (data_dir / 'CJI3_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Periode;Einkaufsbeleg;Bezeichnung\n" + "\n".join(rows) + "\n", encoding='latin1')
+    (data_dir / 'CJI5_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Nr. Referenzbeleg;Bezeichnung\n"
+        "G.011803001.01;900,00;4501;Rahmen\nG.011803001.01;5,00;4999;Nur Obligo\n", encoding='latin1')
+    db_file = tmp_path / 'test.db'
+    run_import(str(data_dir), str(db_file))
+    engine = create_engine(f'sqlite:///{db_file}')
+    project = 'G.011803001'
+
+    with engine.connect() as conn:
+        ist = pd.read_sql("SELECT bestellung, periode, ist AS wert, text FROM agg_bestellung_ist", conn)
+        obligo = pd.read_sql("SELECT bestellung, obligo AS obligo_wert, text_obligo FROM agg_bestellung_obligo", conn)
+    full = build_order_matrix(ist, obligo)
+
+    assert queries.count_orders(engine, project) == len(full) == 9
+    pages = []
+    for page in range(3):
+        data = queries.load_order_page(engine, project, page, page_size=4)
+        pages.append(build_order_matrix(data['orders_ist'], data['orders_obligo'], order=data['orders']))
+    paged = pd.concat(pages, ignore_index=True)
+    pd.testing.assert_frame_equal(paged, full.reset_index(drop=True), check_dtype=False)
+
+    by_value = queries.load_order_page(engine, project, sort='Auftragswert (Kalk.)')['orders']
+    assert by_value[0] == '4501'
+    assert queries.count_orders(engine, project, search='obligo') == 1
+    assert queries.count_orders(engine, project, search='100%') == 0
+    engine.dispose()
+
+# --- TEST 4l: Import bei laufendem Cockpit (WAL) ---
+def test_import_does_not_block_readers(tmp_path):
+    """Ein offener Lesezugriff blockiert den Import nicht und sieht bis zum Ende seinen alten Stand."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    csv = data_dir / 'CJI3_2025.csv'
+    csv.write_text("Objekt;Wert/BWähr\nG.011803001.01;1,00\n", encoding='latin1')
+    db_file = tmp_path / 'test.db'
+    run_import(str(data_dir), str(db_file))
+
+    reader = sqlite3.connect(db_file, isolation_level=None)
+    assert reader.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    reader.execute("BEGIN")
+    assert reader.execute("SELECT ist FROM agg_projekt").fetchone()[0] == 1.0
+
+    csv.write_text("Objekt;Wert/BWähr\nG.011803001.01;5,00\n", encoding='latin1')
+    run_import(str(data_dir), str(db_file))
+    assert reader.execute("SELECT ist FROM agg_projekt").fetchone()[0] == 1.0
+    reader.execute("COMMIT")
+    assert reader.execute("SELECT ist FROM agg_projekt").fetchone()[0] == 5.0
+    reader.close()
+
+# --- TEST 4m: Watch-Modus ---
+def test_watch_imports_new_exports_once_per_burst(tmp_path):
+    """Neue Exporte werden automatisch importiert; mehrere Schreibvorgänge kurz hintereinander = ein Import."""
+    import threading
+    import time
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'CJI3_2025.csv').write_text("Objekt;Wert/BWähr\nG.011803001.01;1,00\n", encoding='latin1')
+    db_file = tmp_path / 'test.db'
+
+    def generation():
+        if not db_file.exists():
+            return 0
+        with sqlite3.connect(db_file) as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def wait_for(condition, timeout=15):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return condition()
+
+    stop = threading.Event()
+    thread = threading.Thread(target=watch, args=(str(data_dir), str(db_file)), kwargs={'debounce': 0.5, 'stop': stop})
+    thread.start()
+    try:
+        assert wait_for(lambda: generation() == 1)
+
+        # Export wird in mehreren Schritten geschrieben (wie beim Kopieren großer Dateien)
+        with open(data_dir / 'CJI5_2025.csv', 'w', encoding='latin1') as f:
+            f.write("Objekt;Wert/BWähr\n")
+            f.flush()
+            time.sleep(0.1)
+            f.write("G.011803001.01;2,00\n")
+        (data_dir / '~$LV-Übersicht_2025.xlsx').write_text("Excel-Sperrdatei")
+
+        assert wait_for(lambda: generation() == 2)
+        time.sleep(1.5)
+        assert generation() == 2
+    finally:
+        stop.set()
+        thread.join(timeout=10)
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT obligo FROM agg_projekt").fetchone()[0] == 2.0
+
+def test_watch_forces_only_first_import(tmp_path, monkeypatch):
+    """--watch --force baut nur beim Start alles neu auf, spätere Änderungen laufen inkrementell."""
+    import threading
+    import time
+    import src.db_importer as importer
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    calls = []
+    monkeypatch.setattr(importer, 'run_import', lambda *args, **kwargs: calls.append(kwargs.get('force', False)))
+
+    stop = threading.Event()
+    thread = threading.Thread(target=importer.watch, args=(str(data_dir), str(tmp_path / 'test.db')),
+                              kwargs={'debounce': 0.2, 'stop': stop, 'force': True})
+    thread.start()
+    try:
+        deadline = time.monotonic() + 15
+        while not calls and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.3)  # Beobachter läuft
+        (data_dir / 'CJI5_2025.csv').write_text("Objekt;Wert/BWähr\nG.011803001.01;2,00\n", encoding='latin1')
+        while len(calls) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join(timeout=10)
+    assert calls == [True, False]
+
+# --- TEST 4n: Lokale Laufzeit-Messung ---
+def test_import_records_stage_metrics(tmp_path, monkeypatch):
+    """Der Import schreibt je Stufe Messwerte nach metriken.db; die Auswertung liefert p50/p95."""
+    import metrics
+    monkeypatch.setattr(metrics, 'SAMPLE_RATE', 1.0)
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'CJI3_2025.csv').write_text("Objekt;Wert/BWähr\nG.011803001.01;1,00\n", encoding='latin1')
+    run_import(str(data_dir), str(tmp_path / 'test.db'))
+
+    df = metrics.summary(str(tmp_path))
+    stages = set(df['stufe'])
+    for expected in ['import.lesen', 'import.normalisieren', 'import.waehrung', 'import.schreiben', 'import.summen']:
+        assert expected in stages
+    assert (df['p95_ms'] >= df['p50_ms']).all()
+
+    # Ohne Messrate wird nichts aufgezeichnet (Importer-Stufen schon)
+    monkeypatch.setattr(metrics, 'SAMPLE_RATE', 0.0)
+    with metrics.stage('diagramm.test') as m:
+        m['zeilen'] = 1
+    assert metrics.drain() == []
+    with metrics.stage('import.test'):
+        pass
+    assert len(metrics.drain()) == 1
+
+    # Alte Werte verschwinden nicht bei jedem flush, nur beim Aufräumen (Index auf zeitpunkt)
+    def old_rows():
+        with sqlite3.connect(tmp_path / metrics.METRICS_FILE) as conn:
+            return conn.execute("SELECT COUNT(*) FROM metriken WHERE stufe = 'alt'").fetchone()[0]
+    metrics.record('alt', 1.0)
+    metrics.extend([(0.0, 'alt', 1.0, None, None)])
+    metrics.flush(str(tmp_path))
+    assert old_rows() == 2
+    metrics.flush(str(tmp_path), prune=True)
+    assert old_rows() == 1
+    with sqlite3.connect(tmp_path / metrics.METRICS_FILE) as conn:
+        plan = conn.execute("EXPLAIN QUERY PLAN DELETE FROM metriken WHERE zeitpunkt < 1").fetchall()
+    assert 'idx_metriken_zeitpunkt' in str(plan)
+
+# --- TEST 4o: Portfolio-Übersicht ---
+def test_portfolio_matches_project_kpis(tmp_path):
+    """Eine Zeile je Projekt mit Budget, Verfügbar und Ampel; Budget-Zuordnung wie bisher per LIKE."""
+    from src.queries import load_portfolio, AMPEL_STATUS
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'CJI3_2025.csv').write_text(
+        "Objekt;Wert/BWähr\n"
+        "G.011803001.01;900,00\n"
+        "G.011803002.01;850,00\n"
+        "G.011803003.01;100,00\n"
+        "G.011803004.01;10,00\n", encoding='latin1')
+    (data_dir / 'LV-Übersicht_2025.csv').write_text(
+        "LV-Übersicht\n"
+        "LV-Nummer;Planungelement;Projektnummer;Betrag\n"
+        "LV 1;G.011803001.05;G.011803001;500,00\n"
+        "LV 2;g.011803001.02;;300,00\n"
+        "LV 3;G.011803002.01;;1.000,00\n"
+        "LV 4;;Projekt G.011803003;1.000,00\n", encoding='latin1')
+    db_file = tmp_path / 'test.db'
+    run_import(str(data_dir), str(db_file))
+    engine = create_engine(f'sqlite:///{db_file}')
+
+    df = load_portfolio(engine).set_index('hauptprojekt')
+    # LV 1 zählt einmal, obwohl beide Spalten passen; LV 2 passt trotz Kleinschreibung (wie LIKE)
+    assert df['budget'].to_dict() == {'G.011803001': 800.0, 'G.011803002': 1000.0,
+                                      'G.011803003': 1000.0, 'G.011803004': 0.0}
+    assert df.loc['G.011803001', 'verfuegbar'] == -100.0
+    assert df['status'].to_dict() == {'G.011803001': AMPEL_STATUS[0], 'G.011803002': AMPEL_STATUS[1],
+                                      'G.011803003': AMPEL_STATUS[2], 'G.011803004': AMPEL_STATUS[3]}
+    engine.dispose()
+
+# --- TEST 4p: Projektsuche (FTS5-Trigramm-Index) ---
+def test_project_search_finds_number_and_description(tmp_path):
+    """Die Suche findet Teilstücke der Projektnummer und LV-Bezeichnungen; kurze Eingaben laufen über LIKE."""
+    from src.queries import search_projects
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'CJI3_2025.csv').write_text(
+        "Objekt;Wert/BWähr\nG.011803001.01;1,00\nG.011804711.01;1,00\nG.011809999.01;1,00\n", encoding='latin1')
+    (data_dir / 'LV-Übersicht_2025.csv').write_text(
+        "LV-Übersicht\n"
+        "LV-Nummer;Bezeichnung;Planungelement;Projektnummer;Betrag\n"
+        "LV 1;Brückensanierung Los 3;G.011804711.02;;1,00\n"
+        "LV 2;Planung Oberleitung;G.011803001.01;;1,00\n", encoding='latin1')
+    db_file = tmp_path / 'test.db'
+    run_import(str(data_dir), str(db_file))
+    engine = create_engine(f'sqlite:///{db_file}')
+
+    assert search_projects(engine, '4711')['hauptprojekt'].tolist() == ['G.011804711']
+    assert search_projects(engine, 'brücken')['hauptprojekt'].tolist() == ['G.011804711']
+    assert search_projects(engine, 'G.0118 oberleitung')['hauptprojekt'].tolist() == ['G.011803001']
+    assert len(search_projects(engine, '')) == 3
+    assert search_projects(engine, '99')['hauptprojekt'].tolist() == ['G.011809999']
+    assert search_projects(engine, 'x" OR 1')['hauptprojekt'].tolist() == []
+    assert len(search_projects(engine, '', limit=2)) == 2
+    engine.dispose()
+
+# --- TEST 4q: Excel-Import (gestreamt, Zwischenspeicher) ---
+def test_excel_streaming_matches_read_excel_and_uses_cache(tmp_path, monkeypatch):
+    """Gestreamtes Lesen liefert dasselbe wie read_excel(dtype=str); unveränderte Mappen kommen aus dem Cache."""
+    import datetime
+    import openpyxl
+    import excel_reader
+
+    path = tmp_path / 'LV-Übersicht_2025.xlsx'
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(['LV-Übersicht'])
+    ws.append(['LV-Nummer', 'Bezeichnung', 'Planungelement', 'Projektnummer', 'Betrag', 'Status', 'Bezeichnung'])
+    ws.append(['LV 1', 'Bau', 'G.011803001.01', 'G.011803001', 1000.0, 'offen', 'x'])
+    ws.append([])
+    ws.append(['LV 2', 'NA', None, 'G.011803002', 2.5, datetime.datetime(2025, 3, 1), '#N/A'])
+    ws.append([3, '', 'G.011803003.02', None, '1.234,56'])
+    ws.append([])
+    wb.save(path)
+
+    expected = pd.read_excel(path, header=1, dtype=str)
+    result = pd.concat(list(excel_reader.read_workbook(str(path), 1, chunksize=2)), ignore_index=True)
+    pd.testing.assert_frame_equal(result, expected)
+
+    # Import: nur die benötigten Spalten, beim zweiten (erzwungenen) Import aus dem Cache
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    os.replace(path, data_dir / path.name)
+    db_file = tmp_path / 'test.db'
+    run_import(str(data_dir), str(db_file))
+    cache_files = os.listdir(tmp_path / excel_reader.CACHE_DIR_NAME)
+    assert len(cache_files) == 1
+
+    with sqlite3.connect(db_file) as conn:
+        first = conn.execute("SELECT * FROM vertraege_uebersicht").fetchall()
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(vertraege_uebersicht)")]
+        (manifest_hash,) = conn.execute("SELECT hash FROM import_manifest").fetchone()
+    # Cache-Schlüssel ist der Hash aus dem Manifest (Datei wird nicht zweimal gehasht)
+    assert cache_files[0].startswith(manifest_hash)
+    assert 'status' not in columns and 'bezeichnung1' not in columns
+    assert len(first) == 4
+
+    def no_excel(*args):
+        raise AssertionError("Arbeitsmappe hätte aus dem Cache kommen sollen")
+    monkeypatch.setattr(excel_reader, '_stream_sheet', no_excel)
+    stats = run_import(str(data_dir), str(db_file), force=True)
+    assert stats['vertraege_uebersicht']['zeilen'] == 4
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT * FROM vertraege_uebersicht").fetchall() == first
+    assert os.listdir(tmp_path / excel_reader.CACHE_DIR_NAME) == cache_files
+
+# --- TEST 4r: Spalten-Schema je Quelle ---
+def test_source_schema_reads_typed_columns(tmp_path):
+    """Nur Schema-Spalten werden gelesen, Kategorien als category, Beträge als REAL in der Datenbank."""
+    from src.db_importer import SOURCE_SCHEMAS, iter_clean_chunks
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    path = data_dir / 'CJI3_2025.csv'
+    path.write_text(
+        "Objekt;Kostenart;Wert/BWähr;BWähr;Periode;Einkaufsbeleg\n"
+        "G.011803001.02.02;600010;1.000,50;EUR;1;4500\n"
+        "G.011803001.02.03;600011;-20,00;EUR;1;\n"
+        "G.011803002.01;600010;5;EUR;2;4501\n", encoding='latin1')
+
+    (df,) = iter_clean_chunks(str(path), 0, schema=SOURCE_SCHEMAS['ist_kosten'])
+    assert list(df.columns) == ['objekt', 'wert/bwähr', 'periode', 'einkaufsbeleg', 'hauptprojekt']
+    for col in ['objekt', 'periode', 'einkaufsbeleg', 'hauptprojekt']:
+        assert isinstance(df[col].dtype, pd.CategoricalDtype), col
+    assert df['wert/bwähr'].tolist() == [1000.5, -20.0, 5.0]
+    assert df['hauptprojekt'].astype(object).tolist() == ['G.011803001', 'G.011803001', 'G.011803002']
+    assert list(df['hauptprojekt'].cat.categories) == ['G.011803001', 'G.011803002']
+    assert pd.isna(df['einkaufsbeleg'].iloc[1])
+
+    # Ohne Schema wie bisher: alle Spalten, 'kostenart' wird wegen 'kosten' als Betrag gelesen
+    (legacy,) = iter_clean_chunks(str(path), 0)
+    assert 'bwähr' in legacy.columns and legacy['kostenart'].dtype == float
+
+    db_file = tmp_path / 'test.db'
+    run_import(str(data_dir), str(db_file))
+    with sqlite3.connect(db_file) as conn:
+        types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(ist_kosten)")}
+        assert types == {'objekt': 'TEXT', 'wert/bwähr': 'REAL', 'periode': 'TEXT', 'einkaufsbeleg': 'TEXT',
+                         'hauptprojekt': 'TEXT', 'lieferperiode': 'TEXT', 'lieferdatei': 'TEXT'}
+        assert conn.execute("SELECT ist FROM agg_projekt WHERE hauptprojekt = 'G.011803001'").fetchone()[0] == 980.5
+
+# --- TEST 4s: Delta-Import von Perioden-Lieferungen ---
+def test_period_delta_import(tmp_path, capsys):
+    """Neue Monate werden angehängt, eine erneut gelieferte Datei ersetzt nur ihre eigenen Zeilen."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    db_file = tmp_path / 'test.db'
+
+    def cji3(name, *rows, objekt='G.011803001.01'):
+        lines = ["Objekt;Wert/BWähr;Periode"] + [f"{objekt};{wert};{periode}" for wert, periode in rows]
+        (data_dir / name).write_text("\n".join(lines) + "\n", encoding='latin1')
+
+    def ist():
+        with sqlite3.connect(db_file) as conn:
+            return dict(conn.execute("SELECT lieferperiode, SUM(\"wert/bwähr\") FROM ist_kosten GROUP BY 1"))
+
+    cji3('CJI3_2025_01.csv', ('100,00', 1), ('50,00', 1))
+    run_import(str(data_dir), str(db_file))
+    assert ist() == {'2025-01': 150.0}
+
+    # Neuer Monat: Januar bleibt unberührt (gleiche rowids), auch wenn seine Datei danach fehlt
+    with sqlite3.connect(db_file) as conn:
+        january = conn.execute("SELECT rowid FROM ist_kosten ORDER BY 1").fetchall()
+    cji3('CJI3_2025_02.csv', ('200,00', 2), objekt='G.011803002.01')
+    run_import(str(data_dir), str(db_file))
+    assert ist() == {'2025-01': 150.0, '2025-02': 200.0}
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT rowid FROM ist_kosten WHERE lieferperiode = '2025-01' ORDER BY 1").fetchall() == january
+
+    # Korrektur-Lieferung Februar ersetzt nur den Februar; G.011803002 fällt aus den Summen heraus
+    os.remove(data_dir / 'CJI3_2025_01.csv')
+    cji3('CJI3_2025_02.csv', ('250,00', 2), ('-10,00', 2))
+    capsys.readouterr()
+    run_import(str(data_dir), str(db_file))
+    out = capsys.readouterr().out
+    assert "1 alte Zeilen ersetzt" in out and "für 2 geänderte Projekt(e)" in out
+    assert ist() == {'2025-01': 150.0, '2025-02': 240.0}
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT hauptprojekt, ist FROM agg_projekt").fetchall() == [('G.011803001', 390.0)]
+
+    # Die nur für die geänderten Projekte neu berechneten Summen entsprechen einer kompletten Neuberechnung
+    from src.db_importer import create_db_engine, build_aggregates, AGGREGATE_TABLES
+    def snapshot():
+        with sqlite3.connect(db_file) as conn:
+            return {t: sorted(conn.execute(f"SELECT * FROM {t}").fetchall(), key=repr) for t in AGGREGATE_TABLES}
+    delta = snapshot()
+    engine = create_db_engine(str(db_file))
+    with engine.begin() as conn:
+        build_aggregates(conn)
+    engine.dispose()
+    assert snapshot() == delta
+
+    # März mit einer Nachbuchung für Februar: gehört zur März-Lieferung, der Februar bleibt stehen
+    cji3('CJI3_2025_03.csv', ('30,00', 3), ('5,00', 2))
+    run_import(str(data_dir), str(db_file))
+    cji3('CJI3_2025_03.csv', ('31,00', 3), ('5,00', 2))
+    capsys.readouterr()
+    run_import(str(data_dir), str(db_file))
+    assert "Lieferperiode 2025-03: 2 alte Zeilen ersetzt" in capsys.readouterr().out
+    assert ist() == {'2025-01': 150.0, '2025-02': 240.0, '2025-03': 36.0}
+
+    # Journal ohne Periode im Dateinamen: Lieferperiode ist die häufigste Periode der Zeilen,
+    # ersetzt wird nur nach Datei (auch wenn sich die häufigste Periode ändert)
+    (data_dir / 'CON_per_a.csv').write_text(
+        "Geschäftsjahr;Periode;Betrag\n2025;001;10\n2025;001;11\n", encoding='latin1')
+    (data_dir / 'CON_per_b.csv').write_text(
+        "Geschäftsjahr;Periode;Betrag\n2025;2;20\n2025;2;21\n2025;1;1\n", encoding='latin1')
+    run_import(str(data_dir), str(db_file))
+    (data_dir / 'CON_per_b.csv').write_text(
+        "Geschäftsjahr;Periode;Betrag\n2025;2;22\n2025;1;1\n2025;1;2\n", encoding='latin1')
+    run_import(str(data_dir), str(db_file))
+    with sqlite3.connect(db_file) as conn:
+        rows = conn.execute("SELECT lieferdatei, lieferperiode, SUM(betrag) FROM journal_con GROUP BY 1, 2").fetchall()
+    assert rows == [('CON_per_a.csv', '2025-01', 21.0), ('CON_per_b.csv', '2025-01', 25.0)]
+
+# --- TEST 4t: Berichts-Export je Projekt (ohne Streamlit) ---
+def test_report_export_all_projects_and_resume(tmp_path, capsys):
+    """Je Projekt ein Bericht mit den Cockpit-Zahlen; ein zweiter Lauf überspringt fertige Berichte."""
+    import openpyxl
+    from src.report_export import run_export
+    from src.queries import AMPEL_STATUS
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'CJI3_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Periode;Einkaufsbeleg;Bezeichnung\n"
+        "G.011803001.01;900,00;1;4501;Rohbau\n"
+        "G.011803001.02;100,00;2;4502;Planung\n"
+        "G.011803002.01;50,00;1;;Porto\n", encoding='latin1')
+    (data_dir / 'CJI5_2025.csv').write_text(
+        "Objekt;Wert/BWähr;Nr. Referenzbeleg;Bezeichnung\nG.011803001.01;200,00;4501;Rohbau\n", encoding='latin1')
+    (data_dir / 'LV-Übersicht_2025.csv').write_text(
+        "LV-Übersicht\nLV-Nummer;Planungelement;Projektnummer;Betrag\nLV 1;;G.011803001;1.000,00\n",
+        encoding='latin1')
+    db_file = tmp_path / 'test.db'
+    run_import(str(data_dir), str(db_file))
+    out_dir = tmp_path / 'berichte'
+
+    stats = run_export(str(db_file), str(out_dir), 'xlsx', workers=2)
+    assert stats['erstellt'] == 2 and not stats['fehler']
+    wb = openpyxl.load_workbook(os.path.join(stats['ordner'], 'G.011803001.xlsx'))
+    kpis = {row[0]: row[1] for row in wb['Kennzahlen'].iter_rows(values_only=True)}
+    assert kpis['Budget'] == 1000.0 and kpis['Ist-Kosten'] == 1000.0 and kpis['Verfügbar'] == -200.0
+    assert kpis['Ampel'] == AMPEL_STATUS[0]
+    matrix = list(wb['Bestell-Matrix'].iter_rows(values_only=True))
+    assert matrix[0][:4] == ('Bestellung', 'Text', '1', '2')
+    assert ('4501', 'Rohbau', 900.0, None, 900.0, 200.0, 1100.0) in matrix
+
+    # Abgebrochener Lauf: ein Bericht fehlt, ein halb geschriebener liegt noch herum
+    os.remove(os.path.join(stats['ordner'], 'G.011803002.xlsx'))
+    open(os.path.join(stats['ordner'], 'G.011803002.xlsx.123.tmp'), 'w').close()
+    stats = run_export(str(db_file), str(out_dir), 'xlsx', workers=1)
+    assert stats['erstellt'] == 1 and stats['uebersprungen'] == 1
+    assert sorted(os.listdir(stats['ordner'])) == ['G.011803001.xlsx', 'G.011803002.xlsx']
+
+    stats = run_export(str(db_file), str(out_dir), 'pdf', workers=1, projects=['G.011803001'])
+    with open(os.path.join(stats['ordner'], 'G.011803001.pdf'), 'rb') as f:
+        pdf = f.read()
+    assert pdf.startswith(b'%PDF-1.4') and pdf.rstrip().endswith(b'%%EOF')
+    assert b'Verf\xfcgbar' in pdf and b'-200,00' in pdf and b'4501' in pdf
+
+# --- TEST 4u: Gemeinsamer Datenspeicher für alle Sitzungen ---
+def test_data_service_shares_frames_across_sessions(tmp_path):
+    """Gleichzeitige Anfragen rechnen einmal, Sitzungen bekommen Sichten ohne Kopie, neue Generation lädt neu."""
+    import threading
+    import time
+    import numpy as np
+    from src.data_service import DataService
+    db_file = tmp_path / 'test.db'
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("PRAGMA user_version = 7")
+    service = DataService(str(db_file), max_entries={'projektdaten': 2})
+    assert service.generation() == 7
+
+    calls = []
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return {'kpi': pd.DataFrame({'ist': [100.0], 'obligo': [20.0]})}
+
+    # 8 Sitzungen fragen gleichzeitig dasselbe Projekt an
+    results = [None] * 8
+    def session(i):
+        results[i] = service.get(7, 'projektdaten', 'G.011803001', loader)
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and service.stats == {'treffer': 7, 'berechnet': 1}
+
+    # Sichten teilen die Daten; Änderungen einer Sitzung bleiben in ihrer Sicht
+    first, second = results[0]['kpi'], results[1]['kpi']
+    assert first is not second and np.shares_memory(first['ist'].to_numpy(), second['ist'].to_numpy())
+    first['gesamt'] = first['ist'] + first['obligo']
+    first.loc[0, 'ist'] = 0.0
+    fresh = service.get(7, 'projektdaten', 'G.011803001', loader)['kpi']
+    assert list(fresh.columns) == ['ist', 'obligo'] and fresh['ist'].iloc[0] == 100.0
+
+    # Älteste Projekte fallen bei voller Art heraus; ein neuer Import verwirft alles
+    service.get(7, 'projektdaten', 'G.011803002', loader)
+    service.get(7, 'projektdaten', 'G.011803003', loader)
+    assert service.size() == {'projektdaten': 2}
+    service.get(8, 'projektdaten', 'G.011803003', loader)
+    assert service.size() == {'projektdaten': 1} and len(calls) == 4
+    # Eine Sitzung mit älterem Stand bekommt Daten, der Speicher bleibt beim neuen
+    service.get(7, 'projektdaten', 'G.011803001', loader)
+    assert service.size() == {'projektdaten': 1} and len(calls) == 5
+    service.engine.dispose()
+
+# --- TEST 4v: Perioden-Quellen ohne Periode, umbenannte und weggefallene Dateien ---
+def test_period_sources_without_period_and_removed_files(tmp_path, capsys):
+    """Ohne bestimmbare Periode wird die Tabelle komplett neu aufgebaut; --force räumt Perioden fehlender Dateien ab."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    db_file = tmp_path / 'test.db'
+
+    def ist():
+        with sqlite3.connect(db_file) as conn:
+            return conn.execute("SELECT ist FROM agg_projekt").fetchone()[0]
+
+    # Umbenannte Korrektur ohne Periode im Namen: die alte Datei zählt nicht mehr mit
+    (data_dir / 'CJI3_2025.csv').write_text("Objekt;Wert/BWähr;Periode\nG.011803001.01;100,00;1\n", encoding='latin1')
+    run_import(str(data_dir), str(db_file))
+    os.remove(data_dir / 'CJI3_2025.csv')
+    (data_dir / 'CJI3_2025_korrigiert.csv').write_text(
+        "Objekt;Wert/BWähr;Periode\nG.011803001.01;120,00;1\n", encoding='latin1')
+    run_import(str(data_dir), str(db_file))
+    assert "komplett neu aufgebaut" in capsys.readouterr().out
+    assert ist() == 120.0
+    # Nur entfernt: auch dann verschwindet ihr Inhalt
+    (data_dir / 'CJI3_2025_zusatz.csv').write_text("Objekt;Wert/BWähr;Periode\nG.011803001.01;5,00;1\n", encoding='latin1')
+    run_import(str(data_dir), str(db_file))
+    assert ist() == 125.0
+    os.remove(data_dir / 'CJI3_2025_zusatz.csv')
+    run_import(str(data_dir), str(db_file))
+    assert ist() == 120.0
+
+    # Monatsdateien: ohne --force bleibt die Historie fehlender Dateien, mit --force nicht
+    os.remove(data_dir / 'CJI3_2025_korrigiert.csv')
+    for month, wert in ((1, '10,00'), (2, '20,00')):
+        (data_dir / f'CJI3_2025_{month:02d}.csv').write_text(
+            f"Objekt;Wert/BWähr;Periode\nG.011803001.01;{wert};{month}\n", encoding='latin1')
+    run_import(str(data_dir), str(db_file))
+    assert ist() == 30.0
+    os.remove(data_dir / 'CJI3_2025_01.csv')
+    run_import(str(data_dir), str(db_file))
+    assert ist() == 30.0
+    run_import(str(data_dir), str(db_file), force=True)
+    assert ist() == 20.0
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT datei FROM import_manifest WHERE tabelle = 'ist_kosten'").fetchall() == \
+            [('CJI3_2025_02.csv',)]
+
+    # Leere Datei ohne Periode im Namen: Fehler nur für diese Datei, die übrigen werden importiert
+    (data_dir / 'CJI3_2025.csv').write_text("", encoding='latin1')
+    (data_dir / 'CJI5_2025.csv').write_text("Objekt;Wert/BWähr\nG.011803001.01;7,00\n", encoding='latin1')
+    capsys.readouterr()
+    for workers in (1, 2):
+        stats = run_import(str(data_dir), str(db_file), force=True, workers=workers)
+        out = capsys.readouterr().out
+        assert "🔄 Verarbeite 'CJI3_2025.csv'" in out and "❌ Fehler" in out
+        assert stats['ist_kosten']['zeilen'] == 1 and stats['obligo_cji5']['zeilen'] == 1
+        assert ist() == 20.0
+
+# --- TEST 4w: Datenbank aus der Zeit vor dem Delta-Import ---
+def test_import_upgrades_database_without_periods(tmp_path, capsys):
+    """Eine alte Tabelle ohne Lieferperioden wird einmal komplett neu aufgebaut, statt den Import abzubrechen."""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    db_file = tmp_path / 'test.db'
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("CREATE TABLE ist_kosten (objekt TEXT, hauptprojekt TEXT)")
+        conn.execute("INSERT INTO ist_kosten VALUES ('G.011803001.01', 'G.011803001')")
+    (data_dir / 'CJI3_2025_01.csv').write_text(
+        "Objekt;Wert/BWähr;Periode\nG.011803001.01;100,00;1\n", encoding='latin1')
+    (data_dir / 'CJI5_2025.csv').write_text("Objekt;Wert/BWähr\nG.011803001.01;20,00\n", encoding='latin1')
+
+    stats = run_import(str(data_dir), str(db_file))
+    assert "noch ohne Lieferperioden" in capsys.readouterr().out
+    assert stats['ist_kosten']['zeilen'] == 1 and stats['obligo_cji5']['zeilen'] == 1
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT ist, obligo FROM agg_projekt").fetchall() == [(100.0, 20.0)]
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+
+    # Tabelle aus dem ersten Delta-Stand (Perioden je Buchung, ohne Lieferdatei): ebenfalls einmal neu
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("DROP INDEX idx_ist_kosten_lieferdatei")
+        conn.execute("ALTER TABLE ist_kosten DROP COLUMN lieferdatei")
+    run_import(str(data_dir), str(db_file))
+    assert "noch ohne Lieferperioden" in capsys.readouterr().out
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT lieferdatei FROM ist_kosten").fetchall() == [('CJI3_2025_01.csv',)]
+
 # --- TEST 5: UI Smoke Test ---
 def test_app_starts():
     """Prüft, ob die App ohne Absturz startet."""
-    at = AppTest.from_file("src/app.py")
+    at = AppTest.from_file("../src/app.py")
     at.run()
     assert not at.exception
\ No newline at end of file